@@ -0,0 +1 @@
+'''Benchmarks for the raster-create lambdas'''
@@ -0,0 +1,658 @@
+'''
+In-process fakes of the services which the lambdas depend upon: CMR, GRQ,
+Mozart, S3, SNS, DynamoDB and Step Functions, along with the SQS queue of
+HySDS job status notifications. The fakes share a single simulated SDS whose
+jobs progress against a virtual clock, and each call sleeps for a tunable
+latency
+'''
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from itertools import count
+import json
+from random import Random
+from threading import RLock
+from time import sleep
+from uuid import uuid4
+
+JobProfile = namedtuple('JobProfile', ('queued', 'runtime'))
+
+INGEST_JOB_NAME = 'job-INGEST_STAGED'
+EVALUATE_JOB_NAME = 'job-SUBMIT_L2_HR_Raster'
+RASTER_JOB_NAME = 'job-SCIFLO_L2_HR_Raster'
+
+DEFAULT_PROFILES = {
+    INGEST_JOB_NAME: JobProfile(queued=10, runtime=60),
+    EVALUATE_JOB_NAME: JobProfile(queued=10, runtime=120),
+    RASTER_JOB_NAME: JobProfile(queued=30, runtime=900)
+}
+DEFAULT_LATENCIES = {
+    'cmr': 0.2,
+    'grq': 0.02,
+    'mozart': 0.05,
+    's3': 0.02,
+    'sns': 0.02,
+    'sqs': 0.02,
+    'dynamodb': 0.01,
+    'stepfunctions': 0.02
+}
+
+# Virtual time zero; the SDS reports job times as ISO 8601 UTC strings
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+SDS_BUCKET = 'sds-rs-bucket'
+# Product URLs carry the bucket in their path rather than the host
+SDS_PRODUCTS_URL = f's3://s3-us-west-2.amazonaws.com:80/{SDS_BUCKET}/products'
+ORBIT_CONCEPT_IDS = ('C0000000003-POCLOUD', 'C0000000004-POCLOUD')
+
+
+@dataclass
+class FakeSDSJob:  # pylint: disable=too-many-instance-attributes
+    '''Job submitted to the simulated SDS'''
+    job_id: str
+    job_name: str
+    tag: str
+    params: dict
+    dataset: dict
+    submitted: float
+    profile: JobProfile
+    finished: bool = field(default=False)
+
+
+class FakeSDS:  # pylint: disable=too-many-instance-attributes
+    '''
+    Simulated SDS holding the CMR and GRQ catalogues, Mozart's jobs and the
+    S3 objects generated by raster jobs. Completed jobs take effect lazily
+    the next time that any of the fakes are called
+    '''
+
+    def __init__(self, clock, profiles=None, latencies=None, jitter=0):
+        self.clock = clock
+        self.profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+        # Each job's runtime is stretched by up to this fraction to produce
+        # stragglers
+        self.jitter = jitter
+        self._random = Random(0)
+        self.latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+        self.calls = {service: 0 for service in self.latencies}
+
+        self.cmr_granules = {}
+        self.grq_docs = {}
+        self.jobs = {}
+        self.s3_objects = {}
+        self.sns_messages = []
+        # Job status notifications awaiting receipt from SQS
+        self.job_statuses = []
+
+        self.lock = RLock()
+        self._orbit_granules()
+
+    def call(self, service):
+        '''
+        Simulates the latency of a call to a service and applies the effects
+        of any jobs which have finished since the last call
+        '''
+        sleep(self.latencies[service])
+
+        with self.lock:
+            self.calls[service] += 1
+            now = self.clock.now()
+
+            for job in self.jobs.values():
+                if not job.finished and self._finish_time(job) <= now:
+                    job.finished = True
+                    self._complete(job)
+
+    def add_scene(self, cycle, passe, scene, ingested=False):
+        '''
+        Catalogues the PIXC and PIXCVec granules of a scene's tiles in CMR,
+        optionally as having been ingested into GRQ already
+        '''
+        with self.lock:
+            for tile in range((scene * 2) - 1, (scene * 2) + 3):
+                for side in 'LR':
+                    for dataset in ('L2_HR_PIXC', 'L2_HR_PIXCVec'):
+                        name = f'SWOT_{dataset}_{cycle:03}_{passe:03}_' \
+                            f'{tile:03}{side}_20240101T000000_PIC0_01'
+                        granule = self._granule(name, metadata={
+                            'CycleID': f'{cycle:03}',
+                            'PassID': f'{passe:03}',
+                            'TileID': f'{tile:03}'
+                        }, dataset_type='SDP', dataset=dataset)
+
+                        self.cmr_granules[name] = granule
+                        if ingested:
+                            self.grq_docs[name] = granule
+
+    def get_job(self, job_id):
+        '''Retrieves a job's current status and info'''
+        with self.lock:
+            job = self.jobs[job_id]
+            now = self.clock.now()
+
+            if job.finished:
+                status = 'job-completed'
+            elif now >= job.submitted + job.profile.queued:
+                status = 'job-started'
+            else:
+                status = 'job-queued'
+
+            started = status != 'job-queued'
+            return status, {
+                'status': status,
+                'tags': [job.tag],
+                'job': {'job_info': {
+                    'time_queued': format_time(job.submitted),
+                    'time_start': format_time(
+                        job.submitted + job.profile.queued
+                    ) if started else None,
+                    'time_end': format_time(self._finish_time(job))
+                    if job.finished else None
+                }}
+            }
+
+    def next_finish(self):
+        '''Virtual time at which the next unfinished job finishes, if any'''
+        with self.lock:
+            return min((
+                self._finish_time(job) for job in self.jobs.values()
+                if not job.finished
+            ), default=None)
+
+    def receive_job_statuses(self):
+        '''
+        Receives every pending job status notification as SQS records whose
+        bodies are SNS notifications
+        '''
+        self.call('sqs')
+
+        with self.lock:
+            statuses, self.job_statuses = self.job_statuses, []
+
+        return [{
+            'messageId': str(uuid4()),
+            'body': json.dumps({
+                'Type': 'Notification',
+                'Message': json.dumps(status)
+            })
+        } for status in statuses]
+
+    def submit(self, job_name, tag, params, dataset):
+        '''Queues a job on the simulated SDS'''
+        with self.lock:
+            profile = self.profiles[job_name.split(':', 1)[0]]
+            profile = profile._replace(runtime=profile.runtime * (
+                1 + self._random.uniform(0, self.jitter)
+            ))
+            job = FakeSDSJob(
+                job_id=str(uuid4()), job_name=job_name, tag=tag,
+                params=params, dataset=dataset, submitted=self.clock.now(),
+                profile=profile
+            )
+            self.jobs[job.job_id] = job
+            return job
+
+    def _complete(self, job):
+        name = job.job_name.split(':', 1)[0]
+        self.job_statuses.append({
+            'uuid': job.job_id,
+            'status': 'job-completed',
+            'tags': [job.tag]
+        })
+
+        if name == INGEST_JOB_NAME:
+            url = job.params['data_url']
+            for granule in self.cmr_granules.values():
+                if granule['metadata']['ISL_urls'] == url:
+                    self.grq_docs[granule['id']] = granule
+        elif name == EVALUATE_JOB_NAME:
+            metadata = job.dataset['metadata']
+            scene = (int(metadata['TileID']) + 1) // 2
+            config_id = f'L2_HR_Raster_{metadata["CycleID"]}_' \
+                f'{metadata["PassID"]}_{scene:03}-state-config'
+            self.grq_docs[config_id] = {
+                'id': config_id,
+                'dataset_type': 'SDP',
+                'dataset': 'L2_HR_Raster-state-config',
+                'metadata': {'id': config_id}
+            }
+        elif name == RASTER_JOB_NAME:
+            key = f'products/{job.job_id}/SWOT_L2_HR_Raster_{job.job_id}.nc'
+            self.s3_objects[(SDS_BUCKET, key)] = b''
+
+    def _finish_time(self, job):
+        return job.submitted + job.profile.queued + job.profile.runtime
+
+    def _orbit_granules(self):
+        for concept_id in ORBIT_CONCEPT_IDS:
+            name = f'SWOT_XDF_ORBIT_REV_{concept_id}'
+            granule = self._granule(
+                name, metadata={}, dataset_type='AUX',
+                dataset='XDF_ORBIT_REV_FILE'
+            )
+            granule['collection_concept_id'] = concept_id
+            self.cmr_granules[name] = granule
+
+    @staticmethod
+    def _granule(name, metadata, dataset_type, dataset):
+        url = f's3://{SDS_BUCKET}/{dataset}/{name}.nc'
+        return {
+            'id': name,
+            'dataset_type': dataset_type,
+            'dataset': dataset,
+            'metadata': {**metadata, 'id': name, 'ISL_urls': url}
+        }
+
+
+def format_time(seconds):
+    '''Formats a virtual time the way the SDS reports job times'''
+    return (EPOCH + timedelta(seconds=seconds)) \
+        .strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class FakeCMRClient:
+    '''Stands in for CMRClient'''
+
+    def __init__(self, sds):
+        self.sds = sds
+
+    def query(self, _query, variables):
+        '''Answers each aliased granules query in the variables'''
+        self.sds.call('cmr')
+        return {
+            alias: self._granules(params)
+            for alias, params in variables.items()
+        }
+
+    def iter_granules(self, params, page=None):
+        '''Iterates over a query's granules; the fake never pages'''
+        if page is None:
+            page = self.query(None, {'granules': params})['granules']
+
+        yield from page['items']
+
+    def _granules(self, params):
+        with self.sds.lock:
+            granules = list(self.sds.cmr_granules.values())
+
+        if 'collectionConceptId' in params:
+            items = [
+                granule for granule in granules
+                if granule.get('collection_concept_id')
+                == params['collectionConceptId']
+            ][:1]
+        else:
+            spec = params['passes']['0']
+            tiles = {tile[:-1].zfill(3) for tile in spec['tiles'].split(',')}
+            items = [
+                granule for granule in granules
+                if granule['dataset_type'] == 'SDP'
+                and granule['metadata'].get('CycleID')
+                == f'{params["cycle"]:03}'
+                and granule['metadata'].get('PassID') == f'{spec["pass"]:03}'
+                and granule['metadata'].get('TileID') in tiles
+            ]
+
+        return {
+            'count': len(items),
+            'cursor': None,
+            'items': [{
+                'granuleUr': granule['id'],
+                'relatedUrls': [{
+                    'type': 'GET DATA VIA DIRECT ACCESS',
+                    'url': granule['metadata']['ISL_urls']
+                }]
+            } for granule in items]
+        }
+
+
+class FakeGRQClient:
+    '''Stands in for GRQ's elasticsearch client'''
+
+    def __init__(self, sds):
+        self.sds = sds
+        self.tasks = self
+        self._task_ids = count(1)
+
+    def search(self, index=None, body=None):  # pylint: disable=unused-argument
+        '''Searches GRQ's documents'''
+        self.sds.call('grq')
+        return self._search(body)
+
+    def msearch(self, body):
+        '''Performs each header/body pair's search'''
+        self.sds.call('grq')
+        return {'responses': [
+            self._search(search) for search in body[1::2]
+        ]}
+
+    # pylint: disable-next=unused-argument
+    def delete_by_query(self, index, body, **_kwargs):
+        '''Deletes documents by id'''
+        self.sds.call('grq')
+
+        with self.sds.lock:
+            for doc_id in body['query']['ids']['values']:
+                self.sds.grq_docs.pop(doc_id, None)
+
+        return {'task': f'grq:{next(self._task_ids)}'}
+
+    def get(self, task_id):  # pylint: disable=unused-argument
+        '''Retrieves a task; deletes complete immediately'''
+        self.sds.call('grq')
+        return {'completed': True, 'response': {'deleted': 0, 'failures': []}}
+
+    def get_dataset(self, dataset_id):
+        '''Retrieves a dataset's source by id'''
+        self.sds.call('grq')
+        with self.sds.lock:
+            return self.sds.grq_docs.get(dataset_id)
+
+    def get_datasets(self, dataset_ids):
+        '''Retrieves the sources of each dataset found by id'''
+        self.sds.call('grq')
+        with self.sds.lock:
+            return {
+                dataset_id: self.sds.grq_docs[dataset_id]
+                for dataset_id in dataset_ids
+                if dataset_id in self.sds.grq_docs
+            }
+
+    def _search(self, body):
+        filters = body['query']['bool']['filter']
+
+        with self.sds.lock:
+            docs = sorted(
+                (doc for doc in self.sds.grq_docs.values()
+                 if all(self._matches(doc, filter_) for filter_ in filters)),
+                key=lambda doc: doc['id']
+            )
+
+        if 'search_after' in body:
+            docs = [doc for doc in docs if doc['id'] > body['search_after'][0]]
+
+        return {'hits': {'hits': [
+            {'_id': doc['id'], '_source': doc, 'sort': [doc['id']]}
+            for doc in docs[:body.get('size', 10)]
+        ]}}
+
+    @staticmethod
+    def _matches(doc, filter_):
+        (kind, clause), = filter_.items()
+        (path, expected), = clause.items()
+
+        value = doc
+        for key in path.removesuffix('.keyword').split('.'):
+            value = value.get(key) if isinstance(value, dict) else None
+
+        if kind == 'term':
+            return value == expected
+        return value in expected
+
+
+class FakeJob:
+    '''Stands in for an otello Job'''
+
+    def __init__(self, sds, job_id):
+        self.sds = sds
+        self.job_id = job_id
+
+    @property
+    def status(self):
+        '''The job's current status'''
+        return self.sds.get_job(self.job_id)[0]
+
+    def get_info(self):
+        '''Retrieves the job's info'''
+        self.sds.call('mozart')
+        return self.sds.get_job(self.job_id)[1]
+
+    def get_generated_products(self):
+        '''Retrieves the products generated by the job'''
+        self.sds.call('mozart')
+        return [{
+            'dataset': 'L2_HR_Raster',
+            'urls': [f'{SDS_PRODUCTS_URL}/{self.job_id}']
+        }]
+
+
+class FakeJobType:
+    '''Stands in for an otello JobType'''
+
+    def __init__(self, sds, job_name):
+        self.sds = sds
+        self.job_name = job_name
+        self.params = {}
+        self.dataset = None
+
+    def set_input_params(self, params):
+        '''Sets the job's input params'''
+        self.params = params
+
+    def set_input_dataset(self, dataset):
+        '''Sets the job's input dataset'''
+        self.dataset = dataset
+
+    def submit_job(self, tag, **_kwargs):
+        '''Submits a job to the simulated SDS'''
+        self.sds.call('mozart')
+        job = self.sds.submit(self.job_name, tag, self.params, self.dataset)
+        return FakeJob(self.sds, job.job_id)
+
+    def __deepcopy__(self, _memo):
+        job_type = FakeJobType(self.sds, self.job_name)
+        job_type.params = dict(self.params)
+        job_type.dataset = self.dataset
+        return job_type
+
+
+class FakeMozart:
+    '''Stands in for the otello Mozart client'''
+
+    def __init__(self, sds):
+        self.sds = sds
+
+    def get_job_type(self, job_name):
+        '''Retrieves an initialized job type'''
+        self.sds.call('mozart')
+        return FakeJobType(self.sds, job_name)
+
+    def get_job_by_id(self, job_id):
+        '''Retrieves a job by id'''
+        return FakeJob(self.sds, job_id)
+
+    def get_job_infos(self, job_ids):
+        '''Retrieves the info of every job by id in one request'''
+        self.sds.call('mozart')
+        return {
+            job_id: self.sds.get_job(job_id)[1] for job_id in job_ids
+        }
+
+
+class FakeS3:
+    '''Stands in for the boto3 S3 client'''
+
+    def __init__(self, sds):
+        self.sds = sds
+
+    # pylint: disable-next=invalid-name
+    def list_objects_v2(self, Bucket, Prefix):
+        '''Lists the objects under a prefix'''
+        self.sds.call('s3')
+
+        with self.sds.lock:
+            return {'Contents': [
+                {'Key': key} for bucket, key in self.sds.s3_objects
+                if bucket == Bucket and key.startswith(Prefix)
+            ]}
+
+    # pylint: disable-next=invalid-name
+    def copy(self, CopySource, Bucket, Key):
+        '''Copies an object between buckets'''
+        self.sds.call('s3')
+
+        with self.sds.lock:
+            data = self.sds.s3_objects[
+                (CopySource['Bucket'], CopySource['Key'])
+            ]
+            self.sds.s3_objects[(Bucket, Key)] = data
+
+
+class FakeSNS:  # pylint: disable=too-few-public-methods
+    '''Stands in for the boto3 SNS client'''
+
+    def __init__(self, sds):
+        self.sds = sds
+
+    # pylint: disable-next=invalid-name
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        '''Publishes a batch of messages'''
+        self.sds.call('sns')
+
+        with self.sds.lock:
+            self.sds.sns_messages.extend(
+                (TopicArn, entry['Message'])
+                for entry in PublishBatchRequestEntries
+            )
+
+        return {
+            'Successful': [
+                {'Id': entry['Id']} for entry in PublishBatchRequestEntries
+            ],
+            'Failed': []
+        }
+
+
+class FakeDynamoDB:
+    '''
+    Stands in for the boto3 DynamoDB client. Condition expressions are limited
+    to equality and contains() joined by AND, and update expressions to
+    removing elements from sets, as used by the callback table
+    '''
+
+    # pylint: disable-next=invalid-name,too-few-public-methods
+    class exceptions:
+        '''Errors raised for failed conditions'''
+
+        class ConditionalCheckFailedException(Exception):
+            '''The item didn't meet the condition'''
+
+    def __init__(self, sds):
+        self.sds = sds
+        self._items = {}
+
+    # pylint: disable-next=invalid-name,unused-argument
+    def put_item(self, TableName, Item):
+        '''Stores an item, replacing any with the same keys'''
+        self.sds.call('dynamodb')
+
+        with self.sds.lock:
+            self._items[self._key(Item)] = Item
+
+    # pylint: disable=invalid-name,unused-argument,too-many-arguments
+    def delete_item(self, TableName, Key, ConditionExpression=None,
+                    ExpressionAttributeValues=None):
+        '''Deletes an item by its keys'''
+        self.sds.call('dynamodb')
+
+        with self.sds.lock:
+            key = self._key(Key)
+            self._check(
+                self._items.get(key), ConditionExpression,
+                ExpressionAttributeValues
+            )
+            self._items.pop(key, None)
+
+    def update_item(self, *, TableName, Key, UpdateExpression,
+                    ConditionExpression, ExpressionAttributeValues,
+                    ReturnValues):
+        '''Removes elements from a set attribute of an item'''
+        self.sds.call('dynamodb')
+
+        with self.sds.lock:
+            key = self._key(Key)
+            item = self._items.get(key)
+            self._check(item, ConditionExpression, ExpressionAttributeValues)
+
+            action, name, value = UpdateExpression.split()
+            if action != 'DELETE':
+                raise NotImplementedError(UpdateExpression)
+
+            item = dict(item)
+            remaining = set(item[name]['SS']) \
+                - set(ExpressionAttributeValues[value]['SS'])
+            if remaining:
+                item[name] = {'SS': sorted(remaining)}
+            else:
+                del item[name]
+
+            self._items[key] = item
+            return {'Attributes': item}
+    # pylint: enable=invalid-name,unused-argument,too-many-arguments
+
+    def get_paginator(self, _operation):
+        '''Retrieves the query paginator; the fake never pages'''
+        return self
+
+    # pylint: disable-next=invalid-name,unused-argument
+    def paginate(self, ExpressionAttributeValues, **_kwargs):
+        '''Queries the items of a job_id'''
+        self.sds.call('dynamodb')
+        job_id = ExpressionAttributeValues[':job_id']['S']
+
+        with self.sds.lock:
+            yield {'Items': [
+                item for (item_job_id, _), item in self._items.items()
+                if item_job_id == job_id
+            ]}
+
+    def _check(self, item, condition, values):
+        if condition is None:
+            return
+
+        for clause in condition.split(' AND '):
+            if clause.startswith('contains('):
+                name, value = clause[len('contains('):-1].split(', ')
+                met = item is not None and name in item \
+                    and values[value]['S'] in item[name]['SS']
+            else:
+                name, value = clause.split(' = ')
+                met = item is not None and item.get(name) == values[value]
+
+            if not met:
+                raise self.exceptions.ConditionalCheckFailedException(clause)
+
+    @staticmethod
+    def _key(item):
+        return item['job_id']['S'], item['jobset_id']['S']
+
+
+class FakeStepFunctions:  # pylint: disable=too-few-public-methods
+    '''
+    Stands in for the boto3 Step Functions client, handing task tokens back
+    to the runner which issued them
+    '''
+
+    class exceptions:  # pylint: disable=invalid-name
+        '''Errors raised for task tokens which can't be resumed'''
+
+        class TaskTimedOut(Exception):
+            '''The task has already timed out'''
+
+        class TaskDoesNotExist(Exception):
+            '''The task has already finished'''
+
+        class InvalidToken(Exception):
+            '''The token was never issued'''
+
+    def __init__(self, sds, resume):
+        self.sds = sds
+        self.resume = resume
+
+    # pylint: disable-next=invalid-name,unused-argument
+    def send_task_success(self, taskToken, output):
+        '''Resumes the task paused on a token'''
+        self.sds.call('stepfunctions')
+
+        if not self.resume(taskToken):
+            raise self.exceptions.TaskTimedOut(taskToken)
@@ -0,0 +1,228 @@
+'''
+Measures the cold start cost of every lambda entry point by importing each
+handler module in a fresh interpreter against local service stand-ins
+
+Usage: python -m benchmarks.import_time [--save] [--repeat N] [module ...]
+'''
+from argparse import ArgumentParser
+from collections import defaultdict
+import json
+import os
+from pathlib import Path
+from statistics import median
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from .standins import StandInServer
+
+PACKAGE = 'podaac.swodlr_raster_create'
+MODULES = [
+    'bootstrap',
+    'preflight',
+    'split_jobset',
+    'submit_evaluate',
+    'submit_raster',
+    'wait_for_complete',
+    'register_callback',
+    'completion_listener',
+    'publish_data',
+    'notify_update'
+]
+BASELINE_PATH = Path(__file__).parent.joinpath('baselines', 'import_time.json')
+
+# Executed in the child interpreter; reports the module's import wall-clock
+# and the process' peak RSS once the import has finished
+IMPORT_SCRIPT = '''
+import json, resource, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+wall = time.perf_counter() - start
+print(json.dumps({
+    'import_ms': wall * 1000,
+    'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+}))
+'''
+
+
+def measure(module, standins, tmp_dir):
+    '''
+    Imports a module in a fresh interpreter and returns its import and
+    process wall-clock, peak RSS, self import time per top-level package and
+    the requests made to each stand-in service
+    '''
+    env = {
+        key: value for key, value in os.environ.items()
+        if not key.startswith('SWODLR_')
+    }
+    env.update(standins.environ())
+    env.update({
+        'TMPDIR': tmp_dir,
+        'SWODLR_PARAM_CACHE_KEY_ID': 'benchmark-key',
+        # The lambda package is read-only so no bytecode is written there
+        'PYTHONDONTWRITEBYTECODE': '1'
+    })
+
+    standins.reset()
+    start = perf_counter()
+    result = subprocess.run(
+        [
+            sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT,
+            f'{PACKAGE}.{module}'
+        ],
+        env=env, capture_output=True, text=True, check=False
+    )
+    process_ms = (perf_counter() - start) * 1000
+
+    if result.returncode != 0:
+        raise RuntimeError(f'Failed to import {module}:\n{result.stderr}')
+
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    stats['process_ms'] = process_ms
+    stats['packages_ms'] = parse_importtime(result.stderr)
+    stats['requests'] = dict(standins.requests)
+    return stats
+
+
+def parse_importtime(output):
+    '''
+    Sums the self time reported by -X importtime for each top-level package
+    '''
+    packages = defaultdict(float)
+
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Header line
+
+        package = fields[2].strip().split('.', 1)[0]
+        packages[package] += int(fields[0]) / 1000
+
+    return dict(packages)
+
+
+def summarize(runs):
+    '''Takes the median of each measurement across runs'''
+    packages = {name for run in runs for name in run['packages_ms']}
+
+    return {
+        'import_ms': median(run['import_ms'] for run in runs),
+        'process_ms': median(run['process_ms'] for run in runs),
+        'peak_rss_kb': median(run['peak_rss_kb'] for run in runs),
+        'packages_ms': {
+            name: median(run['packages_ms'].get(name, 0) for run in runs)
+            for name in sorted(packages)
+        },
+        'requests': runs[-1]['requests']
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    '''
+    Returns the modules whose import time regressed beyond the tolerance
+    relative to the baseline
+    '''
+    regressions = []
+
+    for module, stats in results.items():
+        if module not in baseline:
+            continue
+
+        previous = baseline[module]['import_ms']
+        delta = stats['import_ms'] - previous
+        if delta > min_delta and delta > previous * tolerance:
+            regressions.append((module, previous, stats['import_ms']))
+
+    return regressions
+
+
+def report(results, top):
+    '''Prints a summary table followed by each module's slowest packages'''
+    print(f'{"module":<20}{"import ms":>12}{"process ms":>12}'
+          f'{"peak RSS MB":>13}  requests')
+    for module, stats in results.items():
+        requests = ', '.join(
+            f'{service}={count}'
+            for service, count in sorted(stats['requests'].items())
+        ) or '-'
+        print(f'{module:<20}{stats["import_ms"]:>12.1f}'
+              f'{stats["process_ms"]:>12.1f}'
+              f'{stats["peak_rss_kb"] / 1024:>13.1f}  {requests}')
+
+    for module, stats in results.items():
+        packages = sorted(
+            stats['packages_ms'].items(), key=lambda item: -item[1]
+        )
+        print(f'\n{module}:')
+        for name, time_ms in packages[:top]:
+            print(f'  {name:<30}{time_ms:>10.1f} ms')
+
+
+def main():
+    '''
+    Main entry point for the script
+    '''
+    parser = ArgumentParser()
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--latency', type=float, default=0,
+        help='seconds of latency added to each stand-in response'
+    )
+    parser.add_argument(
+        '--warm-tmp', action='store_true',
+        help='keep /tmp between runs to simulate runtime restarts'
+    )
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        '--save', action='store_true', help='write results as the baseline'
+    )
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--min-delta', type=float, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    with StandInServer(args.latency) as standins:
+        for module in args.modules:
+            runs = []
+            with TemporaryDirectory() as warm_tmp_dir:
+                for _ in range(args.repeat):
+                    if args.warm_tmp:
+                        runs.append(measure(module, standins, warm_tmp_dir))
+                        continue
+
+                    with TemporaryDirectory() as tmp_dir:
+                        runs.append(measure(module, standins, tmp_dir))
+
+            results[module] = summarize(runs)
+
+    report(results, args.top)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with args.baseline.open('w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'\nSaved baseline: {args.baseline}')
+        return
+
+    if not args.baseline.exists():
+        return
+
+    with args.baseline.open('r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    for module, previous, current in regressions:
+        print(f'REGRESSION: {module} {previous:.1f} ms -> {current:.1f} ms')
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
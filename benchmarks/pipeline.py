@@ -0,0 +1,920 @@
+'''
+In-process runner for the raster-create step function which executes the
+lambdas against fake services on a virtual clock, benchmarking throughput
+against jobset size and concurrency
+
+Usage: python -m benchmarks.pipeline [--sizes 1,10] [--concurrency 1,4]
+'''
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from importlib import import_module
+import json
+import logging
+import os
+from tempfile import TemporaryDirectory
+from threading import Condition, Event, Lock, Thread
+from statistics import mean
+from time import monotonic, perf_counter
+from unittest.mock import PropertyMock, patch
+from uuid import uuid4
+
+from podaac.swodlr_raster_create.cache import TTLCache
+from podaac.swodlr_raster_create.callbacks import CallbackTable
+from .fakes import (
+    DEFAULT_LATENCIES, DEFAULT_PROFILES, EPOCH, FakeCMRClient,
+    FakeDynamoDB, FakeGRQClient, FakeMozart, FakeS3, FakeSDS, FakeSNS,
+    FakeStepFunctions, JobProfile
+)
+from .standins import gen_parameters
+
+PACKAGE = 'podaac.swodlr_raster_create'
+# Timeout of every lambda, less wait_for_complete's long polling
+LAMBDA_TIMEOUT = 30
+# Longest that SQS is long polled for job status notifications
+LISTEN_SECONDS = 20
+# Records handed to completion_listener per invocation
+LISTEN_BATCH_SIZE = 10
+CALLBACK_RESOURCE = 'arn:aws:states:::lambda:invoke.waitForTaskToken'
+
+WAITING_CHOICE = {
+    'And': [
+        {'Variable': '$.waiting', 'IsPresent': True},
+        {'Variable': '$.waiting', 'BooleanEquals': True}
+    ]
+}
+
+# Pauses until the jobs' completion is notified or wait_seconds elapses
+AWAIT_JOBS = {
+    'Type': 'Task',
+    'Resource': CALLBACK_RESOURCE,
+    'Parameters': {
+        'FunctionName': 'register_callback',
+        'Payload': {
+            'jobset.$': '$',
+            'task_token.$': '$$.Task.Token'
+        }
+    },
+    'TimeoutSecondsPath': '$.wait_seconds',
+    'ResultPath': None
+}
+# Failing to wait only means polling sooner
+AWAIT_JOBS_CATCH = {
+    'ErrorEquals': ['States.ALL'],
+    'ResultPath': None
+}
+
+# Mirrors terraform/stepfunction.tf with sds_job_status_topic_arn set and
+# resources named by lambda module
+STATE_MACHINE = {
+    'StartAt': 'Preflight',
+    'States': {
+        'Preflight': {
+            'Type': 'Task',
+            'Resource': 'preflight',
+            'Next': 'WaitForPreflightComplete'
+        },
+        'WaitForPreflightComplete': {
+            'Type': 'Task',
+            'Resource': 'wait_for_complete',
+            'Next': 'CheckPreflightJobs'
+        },
+        'CheckPreflightJobs': {
+            'Type': 'Choice',
+            'Choices': [{**WAITING_CHOICE, 'Next': 'AwaitPreflightJobs'}],
+            'Default': 'SplitJobset'
+        },
+        'AwaitPreflightJobs': {
+            **AWAIT_JOBS,
+            'Catch': [{
+                **AWAIT_JOBS_CATCH, 'Next': 'WaitForPreflightComplete'
+            }],
+            'Next': 'WaitForPreflightComplete'
+        },
+        'SplitJobset': {
+            'Type': 'Task',
+            'Resource': 'split_jobset',
+            'Next': 'ProcessScenes'
+        },
+        'ProcessScenes': {
+            'Type': 'Map',
+            'ItemsPath': '$.jobsets',
+            'ItemProcessor': {
+                'ProcessorConfig': {'Mode': 'INLINE'},
+                'StartAt': 'SubmitEvaluate',
+                'States': {
+                    'SubmitEvaluate': {
+                        'Type': 'Task',
+                        'Resource': 'submit_evaluate',
+                        'Next': 'WaitForEvaluateComplete'
+                    },
+                    'WaitForEvaluateComplete': {
+                        'Type': 'Task',
+                        'Resource': 'wait_for_complete',
+                        'Next': 'CheckEvaluateJobs'
+                    },
+                    'CheckEvaluateJobs': {
+                        'Type': 'Choice',
+                        'Choices': [
+                            {**WAITING_CHOICE, 'Next': 'AwaitEvaluateJobs'}
+                        ],
+                        'Default': 'NotifyEvaluateUpdate'
+                    },
+                    'AwaitEvaluateJobs': {
+                        **AWAIT_JOBS,
+                        'Catch': [{
+                            **AWAIT_JOBS_CATCH,
+                            'Next': 'WaitForEvaluateComplete'
+                        }],
+                        'Next': 'WaitForEvaluateComplete'
+                    },
+                    'NotifyEvaluateUpdate': {
+                        'Type': 'Task',
+                        'Resource': 'notify_update',
+                        'Next': 'SubmitRaster'
+                    },
+                    'SubmitRaster': {
+                        'Type': 'Task',
+                        'Resource': 'submit_raster',
+                        'Next': 'WaitForRasterComplete'
+                    },
+                    'WaitForRasterComplete': {
+                        'Type': 'Task',
+                        'Resource': 'wait_for_complete',
+                        'Next': 'CheckRasterJobs'
+                    },
+                    'CheckRasterJobs': {
+                        'Type': 'Choice',
+                        'Choices': [
+                            {**WAITING_CHOICE, 'Next': 'AwaitRasterJobs'}
+                        ],
+                        'Default': 'PublishData'
+                    },
+                    'AwaitRasterJobs': {
+                        **AWAIT_JOBS,
+                        'Catch': [{
+                            **AWAIT_JOBS_CATCH,
+                            'Next': 'WaitForRasterComplete'
+                        }],
+                        'Next': 'WaitForRasterComplete'
+                    },
+                    'PublishData': {
+                        'Type': 'Task',
+                        'Resource': 'publish_data',
+                        'Next': 'NotifyRasterUpdate'
+                    },
+                    'NotifyRasterUpdate': {
+                        'Type': 'Task',
+                        'Resource': 'notify_update',
+                        'End': True
+                    }
+                }
+            },
+            'End': True
+        }
+    }
+}
+
+
+class VirtualClock:
+    '''
+    Clock which follows real time while any execution is running a task and
+    jumps straight to the next wake-up once every execution is in a Wait
+    state, so that Wait states cost no real time
+    '''
+
+    def __init__(self):
+        self._condition = Condition()
+        self._start = monotonic()
+        self._offset = 0
+        self._actors = 0
+        self._sleepers = {}
+        self._idlers = {}
+
+    def now(self):
+        '''Current virtual time in seconds'''
+        with self._condition:
+            return self._now()
+
+    @contextmanager
+    def actor(self):
+        '''
+        Registers the calling thread as an execution which the clock must
+        wait upon before skipping ahead
+        '''
+        with self._condition:
+            self._actors += 1
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._actors -= 1
+                self._advance()
+
+    @contextmanager
+    def handoff(self, count):
+        '''
+        Hands the calling actor's turn over to a number of threads started on
+        its behalf. They're registered up front so that the clock can't skip
+        ahead before they've started, and must each call release once done
+        '''
+        with self._condition:
+            self._actors += count - 1
+            self._advance()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._actors += 1
+
+    def enlist(self):
+        '''
+        Registers a background thread as an actor before it's started; it
+        must call release once done
+        '''
+        with self._condition:
+            self._actors += 1
+
+    def release(self):
+        '''Unregisters a thread which was handed off to or enlisted'''
+        with self._condition:
+            self._actors -= 1
+            self._advance()
+
+    def sleep(self, seconds, interrupt=None):
+        '''
+        Blocks an execution until the virtual time has elapsed or, when
+        given an event, until it's set through interrupt. Returns whether the
+        sleep was interrupted
+        '''
+        with self._condition:
+            if interrupt is not None and interrupt.is_set():
+                return True
+
+            token = object() if interrupt is None else interrupt
+            wake = self._now() + seconds
+            self._sleepers[token] = wake
+            self._advance()
+
+            while token in self._sleepers and self._now() < wake:
+                self._condition.wait(wake - self._now())
+
+            self._sleepers.pop(token, None)
+            return interrupt is not None and interrupt.is_set()
+
+    def interrupt(self, event):
+        '''Sets an event, waking the execution sleeping upon it'''
+        with self._condition:
+            event.set()
+            # Removed here so that the clock can't skip ahead before the
+            # execution has woken
+            self._sleepers.pop(event, None)
+            self._condition.notify_all()
+
+    def idle(self, seconds, interrupt=None):
+        '''
+        Blocks an enlisted thread until the virtual time has elapsed or the
+        event is set through interrupt. Unlike sleep, an idle thread doesn't
+        hold back the clock while no execution is running
+        '''
+        with self._condition:
+            token = object()
+            self._idlers[token] = self._now() + seconds
+            self._actors -= 1
+            self._advance()
+
+            while token in self._idlers:
+                if interrupt is not None and interrupt.is_set():
+                    del self._idlers[token]
+                    self._actors += 1
+                    break
+
+                self._condition.wait(
+                    max(self._idlers[token] - self._now(), 0)
+                )
+                self._wake_idlers()
+
+    def _now(self):
+        return monotonic() - self._start + self._offset
+
+    def _advance(self):
+        self._wake_idlers()
+        if len(self._sleepers) == 0 or len(self._sleepers) < self._actors:
+            return
+
+        wakes = [*self._sleepers.values(), *self._idlers.values()]
+        skip = min(wakes) - self._now()
+        if skip > 0:
+            self._offset += skip
+
+        self._wake_idlers()
+        self._condition.notify_all()
+
+    def _wake_idlers(self):
+        # Idlers which are due become actors straight away so that the clock
+        # can't skip past them before they've run
+        now = self._now()
+        for token, wake in list(self._idlers.items()):
+            if wake <= now:
+                del self._idlers[token]
+                self._actors += 1
+
+
+class LambdaContext:  # pylint: disable=too-few-public-methods
+    '''Lambda context whose remaining time follows the virtual clock'''
+
+    def __init__(self, clock, timeout):
+        self.clock = clock
+        self.deadline = clock.now() + timeout
+
+    def get_remaining_time_in_millis(self):
+        '''Milliseconds until the invocation times out'''
+        return int((self.deadline - self.clock.now()) * 1000)
+
+
+@dataclass
+class ExecutionStats:  # pylint: disable=too-many-instance-attributes
+    '''Timings of a single state machine execution in virtual seconds'''
+    products: int
+    started: float = 0
+    finished: float = 0
+    task_seconds: dict = field(default_factory=dict)
+    wait_seconds: float = 0
+    polls: int = 0
+    # Callback tasks resumed by notifications and timed out to polling
+    resumed: int = 0
+    timeouts: int = 0
+    # Seconds from the start of the execution until each product finished
+    product_seconds: dict = field(default_factory=dict)
+
+
+class PipelineRunner:  # pylint: disable=too-many-instance-attributes
+    '''
+    Executes the state machine against the fake services. Lambda modules are
+    shared between executions, much like warm lambdas being reused
+    '''
+
+    def __init__(self, sds, definition=None, long_poll=0):
+        self.sds = sds
+        self.clock = sds.clock
+        self.definition = definition or STATE_MACHINE
+        self.long_poll = long_poll
+        self.modules = {}
+        self._stats_lock = Lock()
+        # Events of the callback tasks awaiting their tokens
+        self._callbacks = {}
+        self._callbacks_lock = Lock()
+
+    @contextmanager
+    def patched(self):
+        '''
+        Imports the lambda modules and swaps their service clients for the
+        fakes for the duration of the context
+        '''
+        with ExitStack() as stack:
+            tmp_dir = stack.enter_context(TemporaryDirectory())
+            environ = {
+                f'SWODLR_{name}': value
+                for name, value in gen_parameters('http://sds.invalid').items()
+            }
+            environ.update(
+                SWODLR_ENV='dev', TMPDIR=tmp_dir,
+                AWS_DEFAULT_REGION=os.environ.get(
+                    'AWS_DEFAULT_REGION', 'us-west-2'
+                )
+            )
+            stack.enter_context(patch.dict(os.environ, environ))
+
+            for _, state in iter_states(self.definition):
+                if state['Type'] == 'Task':
+                    self._import(_function_name(state))
+                    if state['Resource'] == CALLBACK_RESOURCE:
+                        self._import('completion_listener')
+
+            utils = import_module(f'{PACKAGE}.utilities').utils
+            mozart = FakeMozart(self.sds)
+            grq = FakeGRQClient(self.sds)
+
+            stack.enter_context(patch.object(
+                type(utils), 'mozart_client', new_callable=PropertyMock,
+                return_value=mozart
+            ))
+            stack.enter_context(patch.object(
+                utils, 'get_job_type', side_effect=mozart.get_job_type
+            ))
+            stack.enter_context(patch.object(
+                utils, 'get_grq_es_client', return_value=grq
+            ))
+            stack.enter_context(patch.object(
+                utils, 'search_datasets',
+                side_effect=lambda dataset_id, _wildcard=True:
+                    grq.get_dataset(dataset_id)
+            ))
+            stack.enter_context(patch.object(
+                utils, 'get_datasets', side_effect=grq.get_datasets
+            ))
+            stack.enter_context(patch.object(
+                utils, 'get_job_infos', side_effect=mozart.get_job_infos
+            ))
+
+            clients = {
+                'cmr_client': FakeCMRClient(self.sds),
+                'grq_es_client': grq,
+                's3': FakeS3(self.sds),
+                'sns': FakeSNS(self.sds),
+                # Shared by register_callback and completion_listener
+                'callback_table': CallbackTable(
+                    FakeDynamoDB(self.sds),
+                    FakeStepFunctions(self.sds, self._resume),
+                    utils.get_param('callback_table_name'),
+                    int(utils.get_param('callback_ttl'))
+                )
+            }
+            for module in self.modules.values():
+                for name, client in clients.items():
+                    if hasattr(module, name):
+                        stack.enter_context(
+                            patch.object(module, name, client)
+                        )
+
+            # Each run starts from cold caches
+            preflight = self.modules['preflight']
+            stack.enter_context(patch.object(
+                preflight, 'orbit_cache', TTLCache(preflight.ORBIT_CACHE_TTL)
+            ))
+
+            # Jobs are timed against the virtual clock, and stage durations
+            # are learned afresh
+            wait_for_complete = self.modules['wait_for_complete']
+            stack.enter_context(patch.object(
+                wait_for_complete, '_now',
+                side_effect=lambda: EPOCH.timestamp() + self.clock.now()
+            ))
+            stack.enter_context(patch.object(
+                wait_for_complete, 'stage_durations',
+                json.loads(utils.get_param('wait_stage_durations'))
+            ))
+            stack.enter_context(patch.object(
+                wait_for_complete, 'LONG_POLL_MAX_SECONDS', self.long_poll
+            ))
+            stack.enter_context(patch.object(
+                wait_for_complete, 'monotonic', side_effect=self.clock.now
+            ))
+            stack.enter_context(patch.object(
+                wait_for_complete, 'sleep', side_effect=self.clock.sleep
+            ))
+
+            yield self
+
+    @contextmanager
+    def listening(self):
+        '''
+        Delivers SDS job status notifications to completion_listener for the
+        duration of the context, as its SQS event source mapping would
+        '''
+        if 'completion_listener' not in self.modules:
+            yield self
+            return
+
+        stop = Event()
+        thread = Thread(target=self._listen, args=(stop,))
+        self.clock.enlist()
+        thread.start()
+
+        try:
+            yield self
+        finally:
+            self.clock.interrupt(stop)
+            thread.join()
+
+    def execute(self, event):
+        '''Runs a single execution of the state machine to completion'''
+        stats = ExecutionStats(products=len(event['Records']))
+
+        with self.clock.actor():
+            stats.started = self.clock.now()
+            data = self._run(self.definition, event, stats)
+            stats.finished = self.clock.now()
+
+        return data, stats
+
+    def _run(self, definition, data, stats):
+        states = definition['States']
+        name = definition['StartAt']
+
+        while True:
+            state = states[name]
+
+            if state.get('Resource') == CALLBACK_RESOURCE:
+                data, name = self._callback_task(name, state, data, stats)
+                continue
+            if state['Type'] == 'Task':
+                start = self.clock.now()
+                data = self._invoke(state['Resource'], data)
+
+                elapsed = self.clock.now() - start
+                with self._stats_lock:
+                    stats.task_seconds[name] = \
+                        stats.task_seconds.get(name, 0) + elapsed
+                    if state['Resource'] == 'wait_for_complete':
+                        stats.polls += 1
+            elif state['Type'] == 'Choice':
+                name = next((
+                    choice['Next'] for choice in state['Choices']
+                    if _evaluate_choice(choice, data)
+                ), state['Default'])
+                continue
+            elif state['Type'] == 'Wait':
+                seconds = _wait_seconds(state, data)
+                with self._stats_lock:
+                    stats.wait_seconds += seconds
+                self.clock.sleep(seconds)
+            elif state['Type'] == 'Map':
+                data = self._map(state, data, stats)
+            else:
+                raise ValueError(f'Unsupported state: {state["Type"]}')
+
+            if state.get('End', False):
+                if isinstance(data, dict) and 'inputs' in data:
+                    with self._stats_lock:
+                        stats.product_seconds.update(dict.fromkeys(
+                            data['inputs'], self.clock.now() - stats.started
+                        ))
+                return data
+
+            name = state['Next']
+
+    def _map(self, state, data, stats):
+        present, items = _resolve_path(state.get('ItemsPath', '$'), data)
+        if not present:
+            raise ValueError(f'Missing map items: {state["ItemsPath"]}')
+        if len(items) == 0:
+            return []
+
+        def run_item(item):
+            try:
+                return self._run(state['ItemProcessor'], item, stats)
+            finally:
+                self.clock.release()
+
+        # Inline map iterations all run concurrently
+        with (
+            ThreadPoolExecutor(len(items)) as executor,
+            self.clock.handoff(len(items))
+        ):
+            return list(executor.map(run_item, items))
+
+    def _callback_task(self, name, state, data, stats):
+        # Runs a callback task, which is never an end state; returns its
+        # output and the next state
+        start = self.clock.now()
+        resumed = self._await_callback(state, data)
+
+        with self._stats_lock:
+            stats.task_seconds[name] = \
+                stats.task_seconds.get(name, 0) + self.clock.now() - start
+            if resumed:
+                stats.resumed += 1
+            else:
+                stats.timeouts += 1
+
+        if not resumed:
+            catch = _catch(state, 'States.Timeout')
+            return _apply_result(catch, data, None), catch['Next']
+
+        return _apply_result(state, data, {}), state['Next']
+
+    def _await_callback(self, state, data):
+        # Invokes the task's lambda with a new task token and sleeps until
+        # the token is resumed or the task times out; returns whether it was
+        # resumed
+        task_token = str(uuid4())
+        event = Event()
+        with self._callbacks_lock:
+            self._callbacks[task_token] = event
+
+        try:
+            parameters = _resolve_parameters(
+                state['Parameters'], data, {'Task': {'Token': task_token}}
+            )
+            present, timeout = _resolve_path(state['TimeoutSecondsPath'], data)
+            if not present:
+                raise ValueError(
+                    f'Missing timeout: {state["TimeoutSecondsPath"]}'
+                )
+
+            self._invoke(parameters['FunctionName'], parameters['Payload'])
+            return self.clock.sleep(timeout, event)
+        finally:
+            with self._callbacks_lock:
+                del self._callbacks[task_token]
+
+    def _resume(self, task_token):
+        # Resumes a callback task; returns False when the task has finished
+        with self._callbacks_lock:
+            event = self._callbacks.get(task_token)
+            if event is None or event.is_set():
+                return False
+
+            self.clock.interrupt(event)
+            return True
+
+    def _listen(self, stop):
+        # Receives job status notifications as each job finishes, waking at
+        # least as often as SQS is long polled to notice newly queued jobs
+        try:
+            while True:
+                finish = self.sds.next_finish()
+                seconds = LISTEN_SECONDS if finish is None else \
+                    min(max(finish - self.clock.now(), 0), LISTEN_SECONDS)
+                self.clock.idle(seconds, stop)
+                if stop.is_set():
+                    return
+
+                records = self.sds.receive_job_statuses()
+                for i in range(0, len(records), LISTEN_BATCH_SIZE):
+                    self._invoke('completion_listener', {
+                        'Records': records[i:i + LISTEN_BATCH_SIZE]
+                    })
+        finally:
+            self.clock.release()
+
+    def _import(self, name):
+        self.modules[name] = import_module(f'{PACKAGE}.{name}')
+
+    def _invoke(self, resource, data):
+        # Inputs and outputs are serialized between states
+        event = json.loads(json.dumps(data))
+        timeout = LAMBDA_TIMEOUT
+        if resource == 'wait_for_complete':
+            timeout += self.long_poll
+
+        output = self.modules[resource].lambda_handler(
+            event, LambdaContext(self.clock, timeout)
+        )
+        return json.loads(json.dumps(output))
+
+
+def iter_states(definition):
+    '''
+    Iterates over the name and definition of every state, including those
+    nested within Map states
+    '''
+    for name, state in definition['States'].items():
+        yield name, state
+        if 'ItemProcessor' in state:
+            yield from iter_states(state['ItemProcessor'])
+
+
+def _function_name(state):
+    if state['Resource'] == CALLBACK_RESOURCE:
+        return state['Parameters']['FunctionName']
+    return state['Resource']
+
+
+def _resolve_parameters(parameters, data, context):
+    # Keys suffixed with .$ are paths into the input, or into the context
+    # object when prefixed with $$
+    resolved = {}
+
+    for key, value in parameters.items():
+        if isinstance(value, dict):
+            resolved[key] = _resolve_parameters(value, data, context)
+        elif key.endswith('.$'):
+            if value.startswith('$$'):
+                present, resolved_value = _resolve_path(value[1:], context)
+            else:
+                present, resolved_value = _resolve_path(value, data)
+            if not present:
+                raise ValueError(f'Missing parameter: {value}')
+            resolved[key.removesuffix('.$')] = resolved_value
+        else:
+            resolved[key] = value
+
+    return resolved
+
+
+def _catch(state, error):
+    for catch in state.get('Catch', []):
+        if error in catch['ErrorEquals'] \
+                or 'States.ALL' in catch['ErrorEquals']:
+            return catch
+
+    raise TimeoutError(f'Uncaught error: {error}')
+
+
+def _apply_result(state, data, result):
+    # Only discarding results is supported
+    if state.get('ResultPath', '$') is None:
+        return data
+    return result
+
+
+def _wait_seconds(state, data):
+    if 'SecondsPath' not in state:
+        return state['Seconds']
+
+    present, value = _resolve_path(state['SecondsPath'], data)
+    if not present:
+        raise ValueError(f'Missing wait seconds: {state["SecondsPath"]}')
+    return value
+
+
+def _resolve_path(path, data):
+    if path == '$':
+        return True, data
+
+    value = data
+    for key in path.removeprefix('$.').split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return False, None
+        value = value[key]
+
+    return True, value
+
+
+def _evaluate_choice(rule, data):
+    if 'And' in rule:
+        return all(_evaluate_choice(rule_, data) for rule_ in rule['And'])
+    if 'Or' in rule:
+        return any(_evaluate_choice(rule_, data) for rule_ in rule['Or'])
+    if 'Not' in rule:
+        return not _evaluate_choice(rule['Not'], data)
+
+    present, value = _resolve_path(rule['Variable'], data)
+
+    if 'IsPresent' in rule:
+        return present == rule['IsPresent']
+    if 'BooleanEquals' in rule:
+        return present and value == rule['BooleanEquals']
+
+    raise ValueError(f'Unsupported choice rule: {rule}')
+
+
+def gen_event(sds, size, execution, ingested=False):
+    '''
+    Generates the SQS event of an execution's products, cataloguing their
+    scenes in the fake SDS
+    '''
+    records = []
+
+    for index in range(size):
+        cycle, passe, scene = 1 + execution, 1 + index // 50, 1 + index % 50
+        sds.add_scene(cycle, passe, scene, ingested)
+
+        records.append({'body': json.dumps({
+            'product_id': f'product-{execution}-{index}',
+            'cycle': cycle,
+            'pass': passe,
+            'scene': scene,
+            'output_granule_extent_flag': True,
+            'output_sampling_grid_type': 'UTM',
+            'raster_resolution': 100,
+            'utm_zone_adjust': 0,
+            'mgrs_band_adjust': 0
+        })})
+
+    return {'Records': records}
+
+
+# pylint: disable-next=too-many-arguments
+def benchmark(size, concurrency, executions, *, profiles=None, latencies=None,
+              ingested=False, long_poll=0, jitter=0):
+    '''
+    Runs a number of executions of a jobset size with a given concurrency and
+    reports throughput in products per virtual minute
+    '''
+    sds = FakeSDS(VirtualClock(), profiles, latencies, jitter)
+    runner = PipelineRunner(sds, long_poll=long_poll)
+    events = [
+        gen_event(sds, size, execution, ingested)
+        for execution in range(executions)
+    ]
+
+    start = perf_counter()
+    with (
+        runner.patched(),
+        runner.listening(),
+        ThreadPoolExecutor(concurrency) as executor
+    ):
+        results = list(executor.map(runner.execute, events))
+    wall_seconds = perf_counter() - start
+
+    stats = [execution_stats for _, execution_stats in results]
+    # Executions output the jobset of each scene
+    published = sum(
+        1 for output, _ in results
+        for jobset in (output if isinstance(output, list) else [output])
+        for job in jobset['jobs'] if len(job.get('granules', [])) > 0
+    )
+    makespan = max(execution.finished for execution in stats)
+    task_seconds = {}
+    for execution in stats:
+        for name, seconds in execution.task_seconds.items():
+            task_seconds[name] = task_seconds.get(name, 0) + seconds
+
+    return {
+        'size': size,
+        'concurrency': concurrency,
+        'executions': executions,
+        'long_poll': long_poll,
+        'jitter': jitter,
+        'products': size * executions,
+        'published': published,
+        'makespan_seconds': makespan,
+        'products_per_minute': size * executions / (makespan / 60),
+        'wall_seconds': wall_seconds,
+        'mean_product_seconds': mean(
+            seconds for execution in stats
+            for seconds in execution.product_seconds.values()
+        ),
+        'polls': sum(execution.polls for execution in stats),
+        'resumed': sum(execution.resumed for execution in stats),
+        'timeouts': sum(execution.timeouts for execution in stats),
+        'task_seconds': task_seconds,
+        'sds_calls': dict(sds.calls)
+    }
+
+
+def _parse_mapping(value, parse):
+    mapping = {}
+    for item in filter(None, value.split(',')):
+        key, _, setting = item.partition('=')
+        mapping[key] = parse(setting)
+    return mapping
+
+
+def main():
+    '''
+    Main entry point for the script
+    '''
+    parser = ArgumentParser()
+    parser.add_argument('--sizes', default='1,10')
+    parser.add_argument('--concurrency', default='1,4')
+    parser.add_argument('--executions', type=int, default=4)
+    parser.add_argument(
+        '--latency', default='',
+        help='per service latency in seconds; eg: cmr=0.2,mozart=0.05 '
+             f'(defaults: {DEFAULT_LATENCIES})'
+    )
+    parser.add_argument(
+        '--runtime', default='',
+        help='virtual SDS job queue:run seconds by job name; eg: '
+             'job-SCIFLO_L2_HR_Raster=30:900'
+    )
+    parser.add_argument(
+        '--ingested', action='store_true',
+        help='start with every granule already ingested into GRQ'
+    )
+    parser.add_argument(
+        '--jitter', type=float, default=0,
+        help='fraction by which SDS job runtimes may randomly overrun'
+    )
+    parser.add_argument(
+        '--long-poll', type=int, default=0,
+        help='seconds that wait_for_complete may long poll for'
+    )
+    parser.add_argument('--output', help='path to write the results as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    latencies = _parse_mapping(args.latency, float)
+    profiles = _parse_mapping(args.runtime, lambda setting: JobProfile(
+        *(float(seconds) for seconds in setting.split(':'))
+    ))
+    unknown = set(profiles) - set(DEFAULT_PROFILES)
+    if unknown:
+        parser.error(f'Unknown job names: {", ".join(sorted(unknown))}')
+
+    results = []
+    print(f'{"size":>6}{"concurrency":>13}{"products":>10}{"published":>11}'
+          f'{"makespan s":>12}{"mean product s":>16}{"products/min":>14}'
+          f'{"wall s":>9}')
+
+    for size in (int(size) for size in args.sizes.split(',')):
+        for concurrency in (int(c) for c in args.concurrency.split(',')):
+            result = benchmark(
+                size, concurrency, args.executions, profiles=profiles,
+                latencies=latencies, ingested=args.ingested,
+                long_poll=args.long_poll, jitter=args.jitter
+            )
+            results.append(result)
+
+            print(f'{size:>6}{concurrency:>13}{result["products"]:>10}'
+                  f'{result["published"]:>11}'
+                  f'{result["makespan_seconds"]:>12.0f}'
+                  f'{result["mean_product_seconds"]:>16.0f}'
+                  f'{result["products_per_minute"]:>14.2f}'
+                  f'{result["wall_seconds"]:>9.1f}')
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
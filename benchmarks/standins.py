@@ -0,0 +1,238 @@
+'''
+Local HTTP stand-ins for the services which the lambdas reach: SSM and KMS
+(through boto3's AWS_ENDPOINT_URL_* overrides), Mozart, GRQ and CMR
+'''
+from base64 import b64decode, b64encode
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Lock, Thread
+from time import sleep
+
+SSM_PATH = '/service/swodlr/raster-create/'
+SSM_PAGE_SIZE = 10
+
+
+def gen_parameters(base_url):
+    '''
+    Generates the SSM parameters read by the lambdas, pointing every service
+    endpoint at the stand-in server
+    '''
+    return {
+        'log_level': 'WARNING',
+        'edl_token': 'benchmark-edl-token',
+        'cmr_graphql_endpoint': f'{base_url}/cmr',
+        'pixc_concept_id': 'C0000000001-POCLOUD',
+        'pixcvec_concept_id': 'C0000000002-POCLOUD',
+        'xdf_orbit_1.0_concept_id': 'C0000000003-POCLOUD',
+        'xdf_orbit_2.0_concept_id': 'C0000000004-POCLOUD',
+        'sds_host': f'{base_url}/',
+        'sds_username': 'benchmark',
+        'sds_password': 'benchmark',
+        'sds_ca_cert': '',
+        'sds_pcm_release_tag': '1.0.0',
+        'sds_grq_es_path': '/grq_es',
+        'sds_grq_es_index': 'grq',
+        'sds_mozart_es_path': '/mozart_es',
+        'sds_mozart_es_index': 'job_status-current',
+        'sds_submit_max_attempts': '1',
+        'sds_submit_timeout': '0',
+        'sds_submit_max_workers': '4',
+        'preflight_max_workers': '8',
+        'orbit_cache_ttl': '300',
+        'job_type_cache_ttl': '3600',
+        'wait_min_seconds': '5',
+        'wait_max_seconds': '600',
+        'wait_stage_durations': json.dumps({
+            'preflight': {'queued': 10, 'runtime': 60},
+            'submit_evaluate': {'queued': 10, 'runtime': 120},
+            'submit_raster': {'queued': 30, 'runtime': 900}
+        }),
+        'long_poll_max_seconds': '0',
+        'callback_table_name': 'benchmark-callbacks',
+        'callback_ttl': '86400',
+        'update_max_attempts': '5',
+        'publish_bucket': 'benchmark-publish-bucket',
+        'stepfunction_arn': 'arn:aws:states:us-west-2:000000000000:'
+                            'stateMachine:benchmark',
+        'update_topic_arn': 'arn:aws:sns:us-west-2:000000000000:benchmark'
+    }
+
+
+class StandInServer:
+    '''
+    Threaded HTTP server which answers every stand-in service, optionally
+    delaying each response to simulate network latency. Requests are counted
+    per service so that the network work done by a lambda can be reported
+    '''
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.requests = Counter()
+        self._lock = Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.standins = self
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self.parameters = gen_parameters(self.url)
+
+    @property
+    def url(self):
+        '''Base URL of the server'''
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def environ(self):
+        '''
+        Environment variables which point boto3 at the stand-ins and supply
+        dummy credentials
+        '''
+        return {
+            'AWS_ACCESS_KEY_ID': 'benchmark',
+            'AWS_SECRET_ACCESS_KEY': 'benchmark',
+            'AWS_DEFAULT_REGION': 'us-west-2',
+            'AWS_ENDPOINT_URL_SSM': self.url,
+            'AWS_ENDPOINT_URL_KMS': self.url
+        }
+
+    def count(self, service):
+        '''Records a request made to a service'''
+        with self._lock:
+            self.requests[service] += 1
+
+    def reset(self):
+        '''Clears the request counts'''
+        with self._lock:
+            self.requests.clear()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        '''Handles GET requests'''
+        self._dispatch()
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        '''Handles HEAD requests'''
+        self._dispatch()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        '''Handles POST requests'''
+        self._dispatch()
+
+    def do_DELETE(self):  # pylint: disable=invalid-name
+        '''Handles DELETE requests'''
+        self._dispatch()
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _dispatch(self):
+        standins = self.server.standins
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+
+        if standins.latency:
+            sleep(standins.latency)
+
+        target = self.headers.get('X-Amz-Target')
+        if target is not None:
+            service, _, action = target.partition('.')
+            standins.count(service)
+            response = self._aws(action, json.loads(body or b'{}'))
+        elif self.path.startswith('/cmr'):
+            standins.count('cmr')
+            response = {'data': {}}
+        elif self.path.startswith('/grq_es'):
+            standins.count('grq')
+            response = self._grq(body)
+        else:
+            standins.count('mozart')
+            response = {'success': True, 'result': []}
+
+        self._respond(response)
+
+    def _aws(self, action, request):
+        parameters = self.server.standins.parameters
+
+        if action == 'GetParametersByPath':
+            names = sorted(parameters)
+            start = int(request.get('NextToken', 0))
+            end = start + min(request.get('MaxResults', 10), SSM_PAGE_SIZE)
+
+            response = {'Parameters': [
+                self._ssm_parameter(name, parameters[name])
+                for name in names[start:end]
+            ]}
+            if end < len(names):
+                response['NextToken'] = str(end)
+            return response
+        if action == 'GetParameter':
+            name = request['Name'][len(SSM_PATH):]
+            return {'Parameter': self._ssm_parameter(name, parameters[name])}
+        if action == 'GetParameters':
+            names = [name[len(SSM_PATH):] for name in request['Names']]
+            return {'Parameters': [
+                self._ssm_parameter(name, parameters[name])
+                for name in names if name in parameters
+            ]}
+        if action == 'Encrypt':
+            # The stand-in's "ciphertext" is the reversed plaintext
+            plaintext = b64decode(request['Plaintext'])
+            return {
+                'CiphertextBlob': b64encode(plaintext[::-1]).decode(),
+                'KeyId': request['KeyId']
+            }
+        if action == 'Decrypt':
+            ciphertext = b64decode(request['CiphertextBlob'])
+            return {
+                'Plaintext': b64encode(ciphertext[::-1]).decode(),
+                'KeyId': request.get('KeyId')
+            }
+
+        return {}
+
+    def _grq(self, body):
+        path = self.path.split('?', 1)[0]
+
+        if path.endswith('/_msearch'):
+            count = len(body.splitlines()) // 2
+            return {'responses': [
+                {'hits': {'hits': []}} for _ in range(count)
+            ]}
+        if path.endswith('/_search'):
+            return {'hits': {'hits': []}}
+
+        return {
+            'version': {'number': '7.10.2'},
+            'tagline': 'You Know, for Search'
+        }
+
+    @staticmethod
+    def _ssm_parameter(name, value):
+        return {
+            'Name': f'{SSM_PATH}{name}',
+            'Type': 'String',
+            'Value': value,
+            'Version': 1
+        }
+
+    def _respond(self, response):
+        data = json.dumps(response).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.end_headers()
+
+        if self.command != 'HEAD':
+            self.wfile.write(data)
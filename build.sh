@@ -16,10 +16,27 @@ ZIP_PATH="$ROOT_PATH/dist/$PACKAGE_NAME-$VERSION.zip"
 
 poetry bundle venv --clear --without=dev --python=$(which python3.9) build
 
-cd build/lib/python3.*/site-packages
+SITE_PACKAGES_PATH=$(echo "$ROOT_PATH"/build/lib/python3.*/site-packages)
+VALIDATORS_PATH="$SITE_PACKAGES_PATH/podaac/swodlr_raster_create/validators"
+
+# Generate the JSON schema validators ahead of time rather than on cold start.
+# The output path is explicit as -m would otherwise resolve the package from
+# the source tree in the working directory
+build/bin/python -m podaac.swodlr_raster_create.compile_validators \
+  "$VALIDATORS_PATH"
+if [ ! -f "$VALIDATORS_PATH/__init__.py" ]; then
+  echo "Validators weren't generated in $VALIDATORS_PATH"
+  exit 1
+fi
+
+cd "$SITE_PACKAGES_PATH"
 touch podaac/__init__.py
 rm -rf *.dist-info _virtualenv.*
 find . -type d -name __pycache__ -exec rm -rf {} \+
+# Ship bytecode for the generated validators so they aren't parsed at runtime;
+# unchecked hashes as zip timestamps are too coarse to validate against
+"$ROOT_PATH/build/bin/python" -m compileall -q \
+  --invalidation-mode unchecked-hash podaac/swodlr_raster_create/validators
 
 mkdir -p "$ROOT_PATH/dist/"
 rm -f "$ZIP_PATH"
@@ -0,0 +1,83 @@
+'''Caches which persist across warm lambda invocations'''
+from os import getpid, replace
+from pathlib import Path
+from tempfile import gettempdir
+from threading import Lock, get_ident
+from time import monotonic, time
+from urllib.parse import quote
+
+
+class TTLCache:
+    '''Thread-safe, in-memory cache which expires entries after a set TTL'''
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        '''
+        Retrieves a value from the cache, returning the default when the key
+        is missing or has expired
+        '''
+        with self._lock:
+            if key not in self._entries:
+                return default
+
+            expiration, value = self._entries[key]
+            if monotonic() >= expiration:
+                del self._entries[key]
+                return default
+
+            return value
+
+    def set(self, key, value):
+        '''Stores a value in the cache until the TTL elapses'''
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+
+    def clear(self):
+        '''Invalidates every entry in the cache'''
+        with self._lock:
+            self._entries.clear()
+
+
+class FileCache:
+    '''
+    Cache which persists values to the lambda's /tmp storage, expiring them
+    after a set TTL. Entries outlive the python process, surviving runtime
+    restarts within the same execution environment
+    '''
+    DIRECTORY = Path(gettempdir(), 'swodlr-raster-create')
+
+    def __init__(self, name, ttl):
+        self.name = name
+        self.ttl = ttl
+
+    def get(self, key):
+        '''
+        Retrieves the bytes stored for a key, returning None when the key is
+        missing or has expired
+        '''
+        path = self._get_path(key)
+
+        try:
+            if time() - path.stat().st_mtime >= self.ttl:
+                return None
+
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def set(self, key, data):
+        '''Stores bytes for a key until the TTL elapses'''
+        path = self._get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write then rename so that readers never see a partial entry
+        tmp_path = path.with_name(f'{path.name}.{getpid()}.{get_ident()}')
+        tmp_path.write_bytes(data)
+        replace(tmp_path, path)
+
+    def _get_path(self, key):
+        return FileCache.DIRECTORY.joinpath(self.name, quote(key, safe=''))
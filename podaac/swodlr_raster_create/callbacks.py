@@ -0,0 +1,166 @@
+'''
+Task tokens of step function executions which are paused until an SDS job
+finishes, stored in DynamoDB against the IDs of the jobs they're waiting on
+'''
+from time import time
+
+# Job ID of the item tracking the jobs which a jobset is still waiting on;
+# HySDS job IDs are UUIDs so can't collide with it
+JOBSET_KEY = '#jobset'
+
+
+class CallbackTable:
+    '''
+    DynamoDB table of task tokens keyed by SDS job ID and the jobset waiting
+    on the job. Each jobset also has an item listing the jobs it's still
+    waiting on, so that its execution is resumed once the last of them has
+    finished or as soon as one of them fails. A jobset only has one token per
+    job, each registration replacing the token of its last wait, and items
+    expire after a set TTL so that tokens orphaned by failed executions are
+    reaped
+    '''
+
+    def __init__(self, dynamodb, stepfunctions, table_name, ttl):
+        self.dynamodb = dynamodb
+        self.stepfunctions = stepfunctions
+        self.table_name = table_name
+        self.ttl = ttl
+
+    def register(self, task_token, jobset_id, job_ids):
+        '''Stores a jobset's task token against each of the given job IDs'''
+        expires = str(int(time()) + self.ttl)
+
+        # The jobset's item is stored first so that it's in place by the time
+        # any of its jobs can be found
+        self.dynamodb.put_item(
+            TableName=self.table_name,
+            Item={
+                **self._jobset_key(jobset_id),
+                'task_token': {'S': task_token},
+                'pending': {'SS': list(job_ids)},
+                'expires': {'N': expires}
+            }
+        )
+
+        for job_id in job_ids:
+            self.dynamodb.put_item(
+                TableName=self.table_name,
+                Item={
+                    'job_id': {'S': job_id},
+                    'jobset_id': {'S': jobset_id},
+                    'task_token': {'S': task_token},
+                    'expires': {'N': expires}
+                }
+            )
+
+    def resume(self, job_id, succeeded=True):
+        '''
+        Marks a job as finished for every jobset waiting on it and removes
+        its tokens. Returns the number of executions which were resumed
+        '''
+        items = self._query(job_id)
+        resumed = 0
+
+        for item in items:
+            if self.finish(
+                job_id, item['jobset_id']['S'], item['task_token']['S'],
+                succeeded
+            ):
+                resumed += 1
+
+            self.dynamodb.delete_item(
+                TableName=self.table_name,
+                Key={
+                    'job_id': {'S': job_id},
+                    'jobset_id': item['jobset_id']
+                }
+            )
+
+        return resumed
+
+    def finish(self, job_id, jobset_id, task_token, succeeded=True):
+        '''
+        Removes a finished job from those its jobset is waiting on, resuming
+        the jobset's execution once none remain or straight away when the job
+        didn't succeed. Returns whether the execution was resumed
+        '''
+        if succeeded:
+            exceptions = self.dynamodb.exceptions
+
+            try:
+                response = self.dynamodb.update_item(
+                    TableName=self.table_name,
+                    Key=self._jobset_key(jobset_id),
+                    UpdateExpression='DELETE pending :job_ids',
+                    ConditionExpression='task_token = :task_token '
+                                        'AND contains(pending, :job_id)',
+                    ExpressionAttributeValues={
+                        ':job_ids': {'SS': [job_id]},
+                        ':job_id': {'S': job_id},
+                        ':task_token': {'S': task_token}
+                    },
+                    ReturnValues='ALL_NEW'
+                )
+            except exceptions.ConditionalCheckFailedException:
+                # The job was already marked as finished, or the token is
+                # from an earlier wait
+                return False
+
+            # DynamoDB removes sets once they're emptied
+            if 'pending' in response['Attributes']:
+                return False
+
+        self.send_success(task_token)
+        self._delete_jobset(jobset_id, task_token)
+        return True
+
+    def send_success(self, task_token):
+        '''
+        Resumes the execution paused on a task token; tokens whose task has
+        already finished are ignored
+        '''
+        exceptions = self.stepfunctions.exceptions
+
+        try:
+            self.stepfunctions.send_task_success(
+                taskToken=task_token, output='{}'
+            )
+        except (
+            exceptions.TaskTimedOut,
+            exceptions.TaskDoesNotExist,
+            exceptions.InvalidToken
+        ):
+            # The execution has already moved on; eg: the task timed out and
+            # the jobs were polled, or another job resumed it first
+            pass
+
+    def _delete_jobset(self, jobset_id, task_token):
+        # A jobset re-registered by its next wait keeps its new item
+        exceptions = self.dynamodb.exceptions
+
+        try:
+            self.dynamodb.delete_item(
+                TableName=self.table_name,
+                Key=self._jobset_key(jobset_id),
+                ConditionExpression='task_token = :task_token',
+                ExpressionAttributeValues={
+                    ':task_token': {'S': task_token}
+                }
+            )
+        except exceptions.ConditionalCheckFailedException:
+            pass
+
+    def _query(self, job_id):
+        paginator = self.dynamodb.get_paginator('query')
+        pages = paginator.paginate(
+            TableName=self.table_name,
+            KeyConditionExpression='job_id = :job_id',
+            ExpressionAttributeValues={':job_id': {'S': job_id}},
+            ProjectionExpression='jobset_id, task_token'
+        )
+
+        return [item for page in pages for item in page['Items']]
+
+    @staticmethod
+    def _jobset_key(jobset_id):
+        return {'job_id': {'S': JOBSET_KEY}, 'jobset_id': {'S': jobset_id}}
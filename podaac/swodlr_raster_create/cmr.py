@@ -0,0 +1,101 @@
+'''Client for the CMR GraphQL API'''
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+GRANULES_QUERY = '''
+query($params: GranulesInput) {
+    granules(params: $params) {
+        count
+        cursor
+        items {
+            granuleUr
+            relatedUrls
+        }
+    }
+}
+'''
+
+
+class CMRClient:
+    '''
+    CMR GraphQL client which holds a pooled, keep-alive session so that
+    connections are reused across requests and warm lambda invocations
+    '''
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(
+        self, endpoint, token, *, pool_size=10, max_retries=3,
+        backoff_factor=0.5, timeout=15
+    ):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=CMRClient.RETRY_STATUSES,
+            # GraphQL queries are read-only so POSTs are safe to retry
+            allowed_methods=frozenset({'POST'}),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=retry
+        )
+
+        self.session = Session()
+        self.session.headers['Authorization'] = f'Bearer {token}'
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def query(self, query, variables):
+        '''
+        Performs a GraphQL query against CMR and returns the response's data
+        '''
+        response = self.session.post(
+            self.endpoint,
+            timeout=self.timeout,
+            json={
+                'query': query,
+                'variables': variables
+            }
+        )
+
+        if not response.ok:
+            raise RuntimeError(
+                'Experienced network error attempting to reach CMR'
+            )
+
+        body = response.json()
+        if 'errors' in body:
+            raise RuntimeError(f'CMR query returned errors: {body["errors"]}')
+
+        return body['data']
+
+    def iter_granules(self, params, page=None):
+        '''
+        Lazily iterates over every granule matching the search params,
+        following CMR's cursor from one page to the next. A page which has
+        already been retrieved (eg: from a batched query) may be passed in to
+        continue on from
+        '''
+        retrieved = 0
+
+        while True:
+            if page is None:
+                data = self.query(GRANULES_QUERY, {'params': params})
+                page = data['granules']
+
+            yield from page['items']
+            retrieved += len(page['items'])
+
+            cursor = page.get('cursor')
+            if cursor is None or len(page['items']) == 0 \
+                    or retrieved >= page.get('count', retrieved):
+                return
+
+            params = {**params, 'cursor': cursor}
+            page = None
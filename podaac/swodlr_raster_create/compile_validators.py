@@ -0,0 +1,78 @@
+'''
+Build step which generates python validator modules for the JSON schemas so
+that lambdas can import them instead of compiling the schemas on cold start
+'''
+from argparse import ArgumentParser
+from importlib import resources
+import json
+import logging
+from pathlib import Path
+import fastjsonschema
+
+import podaac.swodlr_common
+import podaac.swodlr_raster_create
+
+VALIDATORS_PATH = Path(__file__).parent.joinpath('validators')
+
+
+def find_schemas():
+    '''
+    Locates every JSON schema available to the lambdas; schemas in this
+    package take precedence over swodlr-common's, matching the lookup order
+    of Utilities.load_json_schema
+    '''
+    schemas = {}
+
+    for package in (podaac.swodlr_common, podaac.swodlr_raster_create):
+        schemas_dir = resources.files(package).joinpath('schemas')
+        if not schemas_dir.is_dir():
+            continue
+
+        for schema_resource in schemas_dir.iterdir():
+            name, _, ext = schema_resource.name.rpartition('.')
+            if ext == 'json':
+                schemas[name] = schema_resource
+
+    return schemas
+
+
+def compile_validators(output_path=VALIDATORS_PATH):
+    '''
+    Generates a validator module per schema in the output directory and
+    returns the names of the compiled schemas
+    '''
+    output_path.mkdir(parents=True, exist_ok=True)
+    init_path = output_path.joinpath('__init__.py')
+    if not init_path.exists():
+        init_path.write_text(
+            "'''Validators generated from the JSON schemas at build time'''\n",
+            encoding='utf-8'
+        )
+
+    schemas = find_schemas()
+    for name, schema_resource in sorted(schemas.items()):
+        with schema_resource.open('r', encoding='utf-8') as schema_json:
+            code = fastjsonschema.compile_to_code(json.load(schema_json))
+
+        output_path.joinpath(f'{name}.py').write_text(code, encoding='utf-8')
+        logging.info('Compiled validator: %s', name)
+
+    return sorted(schemas)
+
+
+def main():
+    '''
+    Main entry point for the script
+    '''
+    parser = ArgumentParser()
+    # Required so that the build can't write into whichever copy of the
+    # package happens to be first on sys.path
+    parser.add_argument('output_path', type=Path)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    compile_validators(args.output_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+'''
+Lambda which receives SDS job status notifications from SQS and resumes the
+step function executions waiting on jobs which have finished
+'''
+import json
+import boto3
+from podaac.swodlr_common import sds_statuses
+from .callbacks import CallbackTable
+from .utilities import utils
+
+CALLBACK_TABLE_NAME = utils.get_param('callback_table_name')
+CALLBACK_TTL = int(utils.get_param('callback_ttl'))
+
+logger = utils.get_logger(__name__)
+
+callback_table = CallbackTable(
+    boto3.client('dynamodb'), boto3.client('stepfunctions'),
+    CALLBACK_TABLE_NAME, CALLBACK_TTL
+)
+
+
+def lambda_handler(event, _context):
+    '''
+    Lambda handler which accepts a batch of SQS records, each carrying a
+    HySDS job status document either directly or within a SNS notification,
+    and resumes the executions whose last waiting job has finished or whose
+    job failed. Records which couldn't be processed are reported back to SQS
+    to be retried
+    '''
+    failures = []
+    finished = {}
+
+    for record in event['Records']:
+        try:
+            job_id, job_status = _parse_status(record['body'])
+        except (KeyError, TypeError, ValueError):
+            # Retrying a malformed notification won't fix it
+            logger.exception('Malformed notification: %s', record['messageId'])
+            continue
+
+        if job_status in sds_statuses.WAITING:
+            logger.debug('Ignoring job %s; status: %s', job_id, job_status)
+            continue
+
+        # Jobs notified more than once in a batch are only resumed once
+        finished.setdefault(job_id, (job_status, []))[1].append(
+            record['messageId']
+        )
+
+    for job_id, (job_status, message_ids) in finished.items():
+        try:
+            resumed = callback_table.resume(
+                job_id, job_status in sds_statuses.SUCCESS
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception('Failed to resume executions for job %s', job_id)
+            failures.extend(
+                {'itemIdentifier': message_id} for message_id in message_ids
+            )
+            continue
+
+        logger.info('Job %s finished; resumed %d executions', job_id, resumed)
+
+    return {'batchItemFailures': failures}
+
+
+def _parse_status(body):
+    # Returns the job ID and status of a notification
+    message = json.loads(body)
+    if message.get('Type') == 'Notification':
+        message = json.loads(message['Message'])  # SNS envelope
+
+    # Mozart's job status documents identify the job by its uuid
+    job_id = message['uuid'] if 'uuid' in message else message['job_id']
+    job_status = message['status']
+
+    if job_status == 'job-offline' and 'timedout' in message.get('tags', []):
+        job_status = 'job-timedout'  # Custom Swodlr status
+
+    return job_id, job_status
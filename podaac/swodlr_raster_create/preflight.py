@@ -1,32 +1,59 @@
 '''Performs input granule checks prior to raster product generation'''
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import json
 from pathlib import PurePath
 from urllib.parse import urlparse
-import requests
 
+from .cache import TTLCache
 from .utilities import utils
 
 STAGE = __name__.rsplit('.', 1)[1]
-EDL_TOKEN = utils.get_param('edl_token')
-GRAPHQL_ENDPOINT = utils.get_param('cmr_graphql_endpoint')
+INGEST_JOB_NAME = 'job-INGEST_STAGED'
 PIXC_CONCEPT_ID = utils.get_param('pixc_concept_id')
 PIXCVEC_CONCEPT_ID = utils.get_param('pixcvec_concept_id')
 XDF_ORBIT_1_0_CONCEPT_ID = utils.get_param('xdf_orbit_1.0_concept_id')
 XDF_ORBIT_2_0_CONCEPT_ID = utils.get_param('xdf_orbit_2.0_concept_id')
+MAX_WORKERS = int(utils.get_param('preflight_max_workers'))
+ORBIT_CACHE_TTL = int(utils.get_param('orbit_cache_ttl'))
+SUBMIT_MAX_WORKERS = int(utils.get_param('sds_submit_max_workers'))
+# Batches of inputs are split across multiple CMR requests past this size
+CMR_MAX_REQUEST_SIZE = 16384
+
+CMR_GRANULES_SELECTION = '''
+    {alias}: granules(params: ${alias}) {{
+        count
+        cursor
+        items {{
+            granuleUr
+            relatedUrls
+        }}
+    }}
+'''
+
+GRQ_PAGE_SIZE = 100
+GRQ_SOURCE_FIELDS = ['metadata.id', 'metadata.ISL_urls']
+GRQ_ORBIT_DATASET = 'XDF_ORBIT_REV_FILE'
+GRQ_ORBIT_QUERY = utils.gen_grq_query(
+    [
+        {'term': {'dataset_type.keyword': 'AUX'}},
+        {'term': {'dataset.keyword': GRQ_ORBIT_DATASET}}
+    ],
+    source=GRQ_SOURCE_FIELDS,
+    size=1,
+    sort=[{'endtime': {'order': 'desc'}}]
+)
 
+cmr_client = utils.cmr_client
 grq_es_client = utils.get_grq_es_client()
+# Latest orbit granules keyed by CMR concept ID or GRQ dataset
+orbit_cache = TTLCache(ORBIT_CACHE_TTL)
 
 logger = utils.get_logger(__name__)
 
 validate_input = utils.load_json_schema('input')
 validate_jobset = utils.load_json_schema('jobset')
 
-ingest_job_type = utils.mozart_client.get_job_type(
-    utils.get_latest_job_version('job-INGEST_STAGED')
-)
-ingest_job_type.initialize()
-
 Granule = namedtuple('Granule', ('name', 'url'))
 
 
@@ -49,16 +76,14 @@ def lambda_handler(event, _context):
         body = validate_input(json.loads(record['body']))
         inputs[body['product_id']] = body
 
-        cycle = body['cycle']
-        passe = body['pass']
-        scene = body['scene']
+    lookups = _find_granules(inputs)
+    product_granules = {}
+    to_delete = set()
+    orbit_ingested = False
 
-        # pylint: disable-next=unbalanced-tuple-unpacking
-        cmr_pixc_granules, cmr_orbit_granules \
-            = _find_cmr_granules(cycle, passe, scene)
-        # pylint: disable-next=unbalanced-tuple-unpacking
-        grq_pixc_granules, grq_orbit_results \
-            = _find_grq_granules(cycle, passe, scene)
+    for product_id, results in lookups.items():
+        cmr_pixc_granules, cmr_orbit_granules, \
+            grq_pixc_granules, grq_orbit_results = results
 
         logger.debug('CMR PIXC results: %s', cmr_pixc_granules)
         logger.debug('CMR Orbit results: %s', cmr_orbit_granules)
@@ -69,50 +94,157 @@ def lambda_handler(event, _context):
         to_ingest = (cmr_pixc_granules | cmr_orbit_granules) \
             - (grq_pixc_granules | grq_orbit_results)
         # Don't delete orbit files
-        to_delete = grq_pixc_granules - cmr_pixc_granules
+        to_delete |= grq_pixc_granules - cmr_pixc_granules
+
+        product_granules[product_id] = to_ingest
+        orbit_ingested |= len(to_ingest & cmr_orbit_granules) > 0
 
-        ingest_jobs = _ingest_granules(to_ingest)
-        _delete_grq_granules(to_delete)
+    # Granules shared between products (eg: orbit files, adjacent scenes)
+    # are only ingested once with the job being shared between products
+    ingest_jobs = _ingest_granules(set().union(*product_granules.values()))
 
-        for job in ingest_jobs:
-            job['product_id'] = body['product_id']
-            jobs.append(job)
+    for product_id, granules in product_granules.items():
+        for granule in sorted(granules):
+            jobs.append({**ingest_jobs[granule], 'product_id': product_id})
 
-    jobset = validate_jobset({
+    if orbit_ingested:
+        logger.info('New orbit file ingested; invalidating orbit cache')
+        orbit_cache.clear()
+
+    jobset = {
         'jobs': jobs,
         'inputs': inputs
-    })
+    }
+
+    delete_task = _delete_grq_granules(to_delete)
+    if delete_task is not None:
+        # Confirmed by wait_for_complete before moving on from preflight
+        jobset['grq_delete_task'] = delete_task
+
+    jobset = validate_jobset(jobset)
 
     return jobset
 
 
-def _find_cmr_granules(cycle, passe, scene) -> tuple[Granule, Granule]:
-    query = '''
-    query($tileParams: GranulesInput, $orbitParams: GranulesInput) {
-        tiles: granules(params: $tileParams) {
-            items {
-                granuleUr
-                relatedUrls
-            }
-        }
+def _find_granules(inputs):
+    if len(inputs) == 0:
+        return {}
 
-        orbit: granules(params: $orbitParams) {
-            items {
-                granuleUr
-                relatedUrls
-            }
-        }
+    orbit_concept_ids = {
+        _get_orbit_concept_id(input_['pass']) for input_ in inputs.values()
     }
-    '''
+    orbits = {}
+
+    for key in (*orbit_concept_ids, GRQ_ORBIT_DATASET):
+        cached = orbit_cache.get(key)
+        if cached is not None:
+            orbits[key] = cached
+
+    missing_orbit_ids = sorted(
+        concept_id for concept_id in orbit_concept_ids
+        if concept_id not in orbits
+    )
+    logger.debug('Orbit cache misses: %s', missing_orbit_ids)
+
+    # CMR batches and the GRQ multi-search are overlapped with one another
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        cmr_futures = [
+            (batch, executor.submit(_find_cmr_granules, batch, orbit_ids))
+            for batch, orbit_ids
+            in _batch_cmr_inputs(inputs, missing_orbit_ids)
+        ]
+
+        grq_future = executor.submit(
+            _find_grq_granules, inputs, GRQ_ORBIT_DATASET not in orbits
+        )
+
+    cmr_results = {}
+
+    for batch, future in cmr_futures:
+        try:
+            tiles, cmr_orbits = future.result()
+        except Exception:
+            logger.exception(
+                'CMR lookup failed: product_ids=%s', ', '.join(batch)
+            )
+            raise
+
+        cmr_results.update(tiles)
+
+        for concept_id, granules in cmr_orbits.items():
+            orbit_cache.set(concept_id, granules)
+            orbits[concept_id] = granules
+
+    try:
+        grq_results, grq_orbit = grq_future.result()
+    except Exception:
+        logger.exception(
+            'GRQ lookup failed: product_ids=%s', ', '.join(inputs)
+        )
+        raise
+
+    if grq_orbit is not None:
+        orbit_cache.set(GRQ_ORBIT_DATASET, grq_orbit)
+        orbits[GRQ_ORBIT_DATASET] = grq_orbit
+
+    results = {}
+
+    for product_id, input_ in inputs.items():
+        results[product_id] = (
+            cmr_results[product_id],
+            orbits[_get_orbit_concept_id(input_['pass'])],
+            grq_results[product_id],
+            orbits[GRQ_ORBIT_DATASET]
+        )
 
-    tile_ids = ''.join([
-        # Tiles are doubled up with 0-padding to duct tape over a collection
-        # bug. Remove once the collection is fixed
-        f'{i}L,{i}R,{i:03}L,{i:03}R,'
-        for i in range((scene * 2) - 1, (scene * 2) + 3)
-    ])
-    variables = {
-        'tileParams': {
+    return results
+
+
+def _get_orbit_concept_id(passe):
+    return XDF_ORBIT_1_0_CONCEPT_ID if passe >= 400 \
+        else XDF_ORBIT_2_0_CONCEPT_ID
+
+
+def _batch_cmr_inputs(inputs, orbit_concept_ids):
+    # Orbit lookups are only carried by the first batch
+    batch = {}
+
+    for product_id, input_ in inputs.items():
+        candidate = {**batch, product_id: input_}
+        size = len(json.dumps(
+            _gen_cmr_request(candidate, orbit_concept_ids)[0]
+        ))
+
+        if len(batch) > 0 and size > CMR_MAX_REQUEST_SIZE:
+            yield batch, orbit_concept_ids
+            candidate = {product_id: input_}
+            orbit_concept_ids = []
+
+        batch = candidate
+
+    if len(batch) > 0:
+        yield batch, orbit_concept_ids
+
+
+def _gen_cmr_request(inputs, orbit_concept_ids):
+    variables = {}
+    aliases = {}
+
+    for index, (product_id, input_) in enumerate(inputs.items()):
+        cycle = input_['cycle']
+        passe = input_['pass']
+        scene = input_['scene']
+
+        tile_ids = ''.join([
+            # Tiles are doubled up with 0-padding to duct tape over a
+            # collection bug. Remove once the collection is fixed
+            f'{i}L,{i}R,{i:03}L,{i:03}R,'
+            for i in range((scene * 2) - 1, (scene * 2) + 3)
+        ])
+
+        alias = f'tiles_{index}'
+        aliases[alias] = product_id
+        variables[alias] = {
             'collectionConceptIds': [PIXC_CONCEPT_ID, PIXCVEC_CONCEPT_ID],
             'cycle': cycle,
             'passes': {
@@ -122,112 +254,139 @@ def _find_cmr_granules(cycle, passe, scene) -> tuple[Granule, Granule]:
                 }
             },
             'limit': 100
-        },
+        }
 
-        'orbitParams': {
-            'collectionConceptId': XDF_ORBIT_1_0_CONCEPT_ID if passe >= 400
-            else XDF_ORBIT_2_0_CONCEPT_ID,
+    for index, concept_id in enumerate(orbit_concept_ids):
+        alias = f'orbit_{index}'
+        aliases[alias] = concept_id
+        variables[alias] = {
+            'collectionConceptId': concept_id,
             'sortKey': '-end_date',
             'limit': 1
         }
-    }
+
+    definitions = ', '.join(
+        f'${alias}: GranulesInput' for alias in variables
+    )
+    selections = ''.join(
+        CMR_GRANULES_SELECTION.format(alias=alias) for alias in variables
+    )
 
     body = {
-        'query': query,
+        'query': f'query({definitions}) {{{selections}}}',
         'variables': variables
     }
-    logger.debug('CMR request body: %s', str(body))
 
-    response = requests.post(
-        GRAPHQL_ENDPOINT,
-        headers={'Authorization': f'Bearer {EDL_TOKEN}'},
-        timeout=15,
-        json=body
-    )
+    return body, aliases
 
-    if not response.ok:
-        raise RuntimeError('Experienced network error attempting to reach CMR')
 
-    body = response.json()
-    logger.debug('CMR response body: %s', str(body))
+def _find_cmr_granules(inputs, orbit_concept_ids) -> tuple[dict, dict]:
+    body, aliases = _gen_cmr_request(inputs, orbit_concept_ids)
+    logger.debug('CMR request body: %s', str(body))
 
-    tiles = body['data']['tiles']['items']
-    orbit = body['data']['orbit']['items']
+    data = cmr_client.query(body['query'], body['variables'])
+    logger.debug('CMR response data: %s', str(data))
 
-    results = []
+    tiles = {}
+    orbits = {}
 
-    for dataset in (tiles, orbit):
+    for alias, key in aliases.items():
         granules = set()
 
-        for granule in dataset:
+        if alias.startswith('tiles_'):
+            # Tiles can span multiple pages once reprocessed versions exist
+            items = cmr_client.iter_granules(
+                body['variables'][alias], data[alias]
+            )
+        else:
+            items = data[alias]['items']
+
+        for granule in items:
             s3_link = _find_s3_link(granule['relatedUrls'])
             if s3_link is None:
                 logger.warning('No s3 link found: %s', granule['granuleUr'])
                 continue
 
             granules.add(Granule(granule['granuleUr'], s3_link))
-        results.append(granules)
 
-    return tuple(results)
+        if alias.startswith('tiles_'):
+            tiles[key] = granules
+        else:
+            orbits[key] = frozenset(granules)
 
+    return tiles, orbits
 
-def _find_grq_granules(cycle, passe, scene) -> tuple[Granule, Granule]:
-    collection_ids = ['L2_HR_PIXC', 'L2_HR_PIXCVec']
-    tile_ids = [
-        str(tile).rjust(3, '0') for tile in range(scene * 2 - 1, scene * 2 + 3)
+
+def _find_grq_granules(inputs, include_orbit) -> tuple[dict, frozenset]:
+    pixc_filters = [
+        _gen_grq_pixc_filters(input_['cycle'], input_['pass'], input_['scene'])
+        for input_ in inputs.values()
     ]
+    searches = []
 
-    # pylint: disable-next=unexpected-keyword-arg
-    pixc_results = grq_es_client.search(
-        index='grq',
-        size=100,
-        body={
-            'query': {
-                'bool': {
-                    'must': [
-                        {'term': {'dataset_type.keyword': 'SDP'}},
-                        {'terms': {'dataset.keyword': collection_ids}},
-                        {'term': {'metadata.CycleID': f'{cycle:03}'}},
-                        {'term': {'metadata.PassID': f'{passe:03}'}},
-                        {'terms': {'metadata.TileID': tile_ids}}
-                    ]
-                }
-            }
-        }
-    )
+    for filters in pixc_filters:
+        searches.extend(({'index': 'grq'}, utils.gen_grq_query(
+            filters, GRQ_SOURCE_FIELDS, GRQ_PAGE_SIZE, utils.GRQ_PAGE_SORT
+        )))
 
-    # pylint: disable-next=unexpected-keyword-arg
-    orbit_results = grq_es_client.search(
-        index='grq',
-        size=1,
-        body={
-            'query': {
-                'bool': {
-                    'must': [
-                        {'term': {'dataset_type.keyword': 'AUX'}},
-                        {'term': {'dataset.keyword': 'XDF_ORBIT_REV_FILE'}}
-                    ]
-                }
-            },
-            'sort': {'endtime': {'order': 'desc'}}
-        }
-    )
+    if include_orbit:
+        searches.extend(({'index': 'grq'}, GRQ_ORBIT_QUERY))
 
-    logger.debug('PIXC grq results: %s', pixc_results)
-    logger.debug('Orbit grq results: %s', orbit_results)
+    responses = grq_es_client.msearch(body=searches)['responses']
+    logger.debug('GRQ msearch results: %s', responses)
 
-    output = []
+    for product_id, response in zip(inputs, responses):
+        if 'error' in response:
+            raise RuntimeError(
+                f'GRQ search failed: product_id={product_id}, '
+                f'error={response["error"]}'
+            )
 
-    for dataset in (pixc_results, orbit_results):
-        granules = set()
+    if include_orbit and 'error' in responses[-1]:
+        raise RuntimeError(
+            f'GRQ orbit search failed: error={responses[-1]["error"]}'
+        )
+
+    pixc_results = {}
 
-        for result in dataset['hits']['hits']:  # pylint: disable=unsubscriptable-object # noqa: E501
-            metadata = result['_source']['metadata']
-            granules.add(Granule(metadata['id'], metadata['ISL_urls']))
+    for product_id, filters, response in zip(inputs, pixc_filters, responses):
+        # Continue paging past the multi-search's page when it's been filled
+        hits = utils.search_grq(
+            grq_es_client, filters, GRQ_SOURCE_FIELDS, GRQ_PAGE_SIZE,
+            first_page=response
+        )
+        pixc_results[product_id] = _parse_grq_granules(hits)
 
-        output.append(granules)
+    orbit_results = frozenset(
+        _parse_grq_granules(responses[-1]['hits']['hits'])
+    ) if include_orbit else None
 
-    return tuple(output)
+    return pixc_results, orbit_results
+
+
+def _parse_grq_granules(hits):
+    granules = set()
+
+    for result in hits:
+        metadata = result['_source']['metadata']
+        granules.add(Granule(metadata['id'], metadata['ISL_urls']))
+
+    return granules
+
+
+def _gen_grq_pixc_filters(cycle, passe, scene):
+    collection_ids = ['L2_HR_PIXC', 'L2_HR_PIXCVec']
+    tile_ids = [
+        str(tile).rjust(3, '0') for tile in range(scene * 2 - 1, scene * 2 + 3)
+    ]
+
+    return [
+        {'term': {'dataset_type.keyword': 'SDP'}},
+        {'terms': {'dataset.keyword': collection_ids}},
+        {'term': {'metadata.CycleID': f'{cycle:03}'}},
+        {'term': {'metadata.PassID': f'{passe:03}'}},
+        {'terms': {'metadata.TileID': tile_ids}}
+    ]
 
 
 def _find_s3_link(related_urls):
@@ -247,39 +406,69 @@ def _find_s3_link(related_urls):
 
 
 def _ingest_granules(granules):
-    jobs = []
+    granules = sorted(granules)
+    if len(granules) == 0:
+        return {}
 
-    for granule in granules:
-        logger.info('Ingesting: %s', granule)
+    with ThreadPoolExecutor(max_workers=SUBMIT_MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(_ingest_granule, granule) for granule in granules
+        ]
 
-        filename = PurePath(urlparse(granule.url).path).name
-        ingest_job_type.set_input_params(_gen_mozart_job_params(
-            filename, granule.url
-        ))
+    jobs = {}
 
-        job = ingest_job_type.submit_job(
-            tag=f'ingest_file_otello__{granule.name}',
-            publish_overwrite_ok=True
-        )
+    for granule, future in zip(granules, futures):
+        try:
+            job = future.result()
+        except Exception:
+            logger.exception('Ingest submission failed: %s', granule.name)
+            raise
 
-        jobs.append({
+        jobs[granule] = {
             'job_id': job.job_id,
             'job_status': 'job-queued',
             'stage': STAGE
-        })
+        }
 
     return jobs
 
 
+def _ingest_granule(granule):
+    logger.info('Ingesting: %s', granule)
+
+    filename = PurePath(urlparse(granule.url).path).name
+    ingest_job_type = utils.get_worker_job_type(INGEST_JOB_NAME)
+    ingest_job_type.set_input_params(_gen_mozart_job_params(
+        filename, granule.url
+    ))
+
+    return ingest_job_type.submit_job(
+        tag=f'ingest_file_otello__{granule.name}',
+        publish_overwrite_ok=True
+    )
+
+
 def _delete_grq_granules(granules):
+    if len(granules) == 0:
+        return None
+
     for granule in granules:
         logger.info('Deleting: %s', granule)
 
-    grq_es_client.delete_by_query(index='grq', body={
-        'query': {
-            'ids': {'values': [granule.name for granule in granules]}
-        }
-    })
+    # pylint: disable-next=unexpected-keyword-arg
+    response = grq_es_client.delete_by_query(
+        index='grq',
+        body={
+            'query': {
+                'ids': {'values': sorted(granule.name for granule in granules)}
+            }
+        },
+        wait_for_completion=False,
+        conflicts='proceed'
+    )
+
+    logger.info('GRQ delete task started: %s', response['task'])
+    return response['task']
 
 
 def _gen_mozart_job_params(filename, url):
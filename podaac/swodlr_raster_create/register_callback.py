@@ -0,0 +1,80 @@
+'''
+Lambda which pauses a step function execution until the SDS jobs that its
+jobset is waiting on have finished, by registering the execution's task token
+against the jobs for completion_listener to resume
+'''
+import boto3
+from podaac.swodlr_common import sds_statuses
+from .callbacks import CallbackTable
+from .utilities import utils
+
+CALLBACK_TABLE_NAME = utils.get_param('callback_table_name')
+CALLBACK_TTL = int(utils.get_param('callback_ttl'))
+
+logger = utils.get_logger(__name__)
+validate_jobset = utils.load_json_schema('jobset')
+
+callback_table = CallbackTable(
+    boto3.client('dynamodb'), boto3.client('stepfunctions'),
+    CALLBACK_TABLE_NAME, CALLBACK_TTL
+)
+
+
+def lambda_handler(event, _context):
+    '''
+    Lambda handler invoked by a waitForTaskToken task with the jobset and the
+    task's token. The execution stays paused until the token is resumed or
+    the task times out, after which the jobs are polled as usual. Errors are
+    logged rather than raised, leaving the task's timeout to resume the
+    execution
+    '''
+    try:
+        jobset = validate_jobset(event['jobset'])
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception('Invalid jobset; relying upon timeout')
+        return
+
+    task_token = event['task_token']
+
+    job_ids = sorted({
+        job['job_id'] for job in jobset['jobs']
+        if job['job_status'] in sds_statuses.WAITING
+    })
+    if not job_ids:
+        # Nothing to be notified about; eg: only the GRQ delete is pending.
+        # The task's timeout resumes the execution
+        logger.info('No waiting jobs; relying upon timeout')
+        return
+
+    # Product IDs are unique, so a jobset is identified by its first product
+    jobset_id = min(job['product_id'] for job in jobset['jobs'])
+    try:
+        callback_table.register(task_token, jobset_id, job_ids)
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception('Unable to register callback; relying upon timeout')
+        return
+
+    logger.info('Registered callback for jobs: %s', ', '.join(job_ids))
+
+    # Jobs which finished before the token was stored have already had
+    # their notifications, so their statuses are checked once more
+    try:
+        job_infos = utils.get_job_infos(job_ids)
+
+        finished = sorted(
+            (job_id, job_info['status'])
+            for job_id, job_info in job_infos.items()
+            if job_info['status'] not in sds_statuses.WAITING
+        )
+        if finished:
+            logger.info('Jobs finished before registration: %s',
+                        ', '.join(job_id for job_id, _ in finished))
+
+        for job_id, job_status in finished:
+            if callback_table.finish(
+                job_id, jobset_id, task_token,
+                job_status in sds_statuses.SUCCESS
+            ):
+                break
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception('Unable to check job statuses; relying upon timeout')
@@ -0,0 +1,50 @@
+'''
+Lambda which splits a jobset into a jobset per scene so that each scene's
+products move through the remaining stages without waiting on other scenes
+'''
+from podaac.swodlr_common.decorators import bulk_job_handler
+from .utilities import utils
+
+logger = utils.get_logger(__name__)
+validate_jobset = utils.load_json_schema('jobset')
+
+
+@bulk_job_handler(returns_jobset=False)
+def handle_jobset(jobset):
+    '''
+    Handler which groups a jobset's products by scene and outputs a jobset for
+    each scene once its ingest jobs have finished. Products of the same scene
+    stay together as they share their evaluate job
+    '''
+    scenes = {}
+    for product_id, input_ in jobset['inputs'].items():
+        key = (input_['cycle'], input_['pass'], input_['scene'])
+        scenes.setdefault(key, []).append(product_id)
+
+    product_jobs = {}
+    for job in jobset['jobs']:
+        product_jobs.setdefault(job['product_id'], []).append(job)
+
+    # Everything besides the jobs and inputs (eg: the GRQ delete task) is
+    # carried along by every scene
+    shared = {
+        key: value for key, value in jobset.items()
+        if key not in ('jobs', 'inputs')
+    }
+
+    jobsets = []
+    for product_ids in scenes.values():
+        jobsets.append(validate_jobset({
+            **shared,
+            'jobs': [
+                job for product_id in product_ids
+                for job in product_jobs.get(product_id, [])
+            ],
+            'inputs': {
+                product_id: jobset['inputs'][product_id]
+                for product_id in product_ids
+            }
+        }))
+
+    logger.info('Split jobset into %d scenes', len(jobsets))
+    return {'jobsets': jobsets}
@@ -2,6 +2,7 @@
 Lambda which processes the SQS message for inputs, submits the job(s) to the
 SDS, and returns a jobset
 '''
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from time import sleep
 
@@ -13,20 +14,17 @@ from .utilities import utils
 
 STAGE = __name__.rsplit('.', 1)[1]
 DATASET_NAME = 'SWOT_L2_HR_PIXCVec'
+RASTER_EVAL_JOB_NAME = 'job-SUBMIT_L2_HR_Raster'
 PCM_RELEASE_TAG = utils.get_param('sds_pcm_release_tag')
 MAX_ATTEMPTS = int(utils.get_param('sds_submit_max_attempts'))
 TIMEOUT = int(utils.get_param('sds_submit_timeout'))
+SUBMIT_MAX_WORKERS = int(utils.get_param('sds_submit_max_workers'))
 
 grq_es_client = utils.get_grq_es_client()
 
 logger = utils.get_logger(__name__)
 validate_jobset = utils.load_json_schema('jobset')
 
-raster_eval_job_type = utils.mozart_client.get_job_type(
-    utils.get_latest_job_version('job-SUBMIT_L2_HR_Raster')
-)
-raster_eval_job_type.initialize()
-
 
 @bulk_job_handler(returns_jobset=True)
 def handle_bulk_job(jobset):
@@ -35,7 +33,49 @@ def handle_bulk_job(jobset):
     submits jobs to the SDS, and returns a jobset
     '''
     inputs = deepcopy(jobset['inputs'])
-    jobs = [_process_input(input_) for input_ in jobset['inputs'].values()]
+
+    # Evaluation only depends upon the scene, so products which differ by
+    # their raster parameters alone share a single evaluate job
+    scenes = {}
+    for input_ in jobset['inputs'].values():
+        key = (input_['cycle'], input_['pass'], input_['scene'])
+        scenes.setdefault(key, []).append(input_)
+
+    # Scenes evaluated by earlier requests needn't be evaluated again unless
+    # a product asks for it
+    evaluated = _find_evaluated_scenes([
+        key for key, members in scenes.items()
+        if not any(input_.get('force_reevaluate') for input_ in members)
+    ])
+    to_evaluate = [key for key in scenes if key not in evaluated]
+
+    # Scenes are processed concurrently so that a scene stuck retrying its
+    # submission doesn't hold up the rest of the jobset
+    with ThreadPoolExecutor(max_workers=SUBMIT_MAX_WORKERS) as executor:
+        outputs = dict(zip(to_evaluate, executor.map(
+            _process_input, [scenes[key][0] for key in to_evaluate]
+        )))
+
+    scene_jobs = {}
+    for key, members in scenes.items():
+        if key in evaluated:
+            logger.info('State config exists; skipping evaluation: %s', key)
+            output = {'stage': STAGE, 'job_status': 'job-completed'}
+        else:
+            output = outputs[key]
+
+        if len(members) > 1:
+            logger.info(
+                'Sharing evaluate job between products: %s',
+                ', '.join(input_['product_id'] for input_ in members)
+            )
+
+        for input_ in members:
+            scene_jobs[input_['product_id']] = {
+                **output, 'product_id': input_['product_id']
+            }
+
+    jobs = [scene_jobs[product_id] for product_id in jobset['inputs']]
 
     job_set = {
         'jobs': jobs,
@@ -44,6 +84,22 @@ def handle_bulk_job(jobset):
     return job_set
 
 
+def _find_evaluated_scenes(scenes):
+    if len(scenes) == 0:
+        return set()
+
+    config_ids = {utils.gen_state_config_id(*scene): scene for scene in scenes}
+
+    try:
+        found = utils.get_datasets(list(config_ids))
+    except RequestException:
+        # Evaluating again is safe, only slower
+        logger.exception('State config lookup failed; evaluating all scenes')
+        return set()
+
+    return {config_ids[config_id] for config_id in found}
+
+
 def _process_input(input_):
     output = {
         'stage': STAGE,
@@ -60,23 +116,15 @@ def _process_input(input_):
     ]
 
     try:
-        # pylint: disable-next=unexpected-keyword-arg
         results: dict = grq_es_client.search(
             index='grq',
-            size=10,
-            body={
-                'query': {
-                    'bool': {
-                        'must': [
-                            {'term': {'dataset_type.keyword': 'SDP'}},
-                            {'term': {'dataset.keyword': 'L2_HR_PIXC'}},
-                            {'term': {'metadata.CycleID': f'{cycle:03}'}},
-                            {'term': {'metadata.PassID': f'{passe:03}'}},
-                            {'terms': {'metadata.TileID': tiles}}
-                        ]
-                    }
-                }
-            }
+            body=utils.gen_grq_query([
+                {'term': {'dataset_type.keyword': 'SDP'}},
+                {'term': {'dataset.keyword': 'L2_HR_PIXC'}},
+                {'term': {'metadata.CycleID': f'{cycle:03}'}},
+                {'term': {'metadata.PassID': f'{passe:03}'}},
+                {'terms': {'metadata.TileID': tiles}}
+            ], size=1)  # Only the first hit is used as the input dataset
         )
     except RequestException:
         logger.exception('ES request failed')
@@ -100,6 +148,7 @@ def _process_input(input_):
         )
         return output
 
+    raster_eval_job_type = utils.get_worker_job_type(RASTER_EVAL_JOB_NAME)
     raster_eval_job_type.set_input_dataset(hits[0]['_source'])
 
     for i in range(1, MAX_ATTEMPTS + 1):
@@ -3,34 +3,68 @@ Lambda which accepts a evaluate jobset, utilizes the generated config from the
 evaluate job, submits a raster job to the SDS, and outputs a new jobset
 consisting of raster jobs
 '''
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from time import sleep
 
 from requests import RequestException
 from podaac.swodlr_common.logging import JobMetadataInjector
-from podaac.swodlr_common.decorators import job_handler
+from podaac.swodlr_common.decorators import bulk_job_handler
 from podaac.swodlr_common import sds_statuses
 
 from .utilities import utils
 
 STAGE = __name__.rsplit('.', 1)[1]
+RASTER_JOB_NAME = 'job-SCIFLO_L2_HR_Raster'
 PCM_RELEASE_TAG = utils.get_param('sds_pcm_release_tag')
 MAX_ATTEMPTS = int(utils.get_param('sds_submit_max_attempts'))
 TIMEOUT = int(utils.get_param('sds_submit_timeout'))
+SUBMIT_MAX_WORKERS = int(utils.get_param('sds_submit_max_workers'))
 
 logger = utils.get_logger(__name__)
 validate_jobset = utils.load_json_schema('jobset')
-raster_job_type = utils.mozart_client.get_job_type(
-    utils.get_latest_job_version('job-SCIFLO_L2_HR_Raster')
-)
-raster_job_type.initialize()
 
 
-@job_handler
-def handle_job(eval_job, job_logger, input_params):
+@bulk_job_handler(returns_jobset=True)
+def handle_bulk_job(jobset):
     '''
-    Handler which retrieves the configuration for the evaluate job,
-    submits the raster job, and outputs a new raster job object
+    Handler which retrieves the configurations for the jobset's evaluate jobs
+    with a single request, concurrently submits the raster jobs, and outputs
+    a new jobset consisting of the raster jobs
     '''
+    inputs = deepcopy(jobset['inputs'])
+
+    state_config_ids = []
+    for eval_job in jobset['jobs']:
+        if eval_job['job_status'] in sds_statuses.SUCCESS:
+            input_ = inputs[eval_job['product_id']]
+            state_config_ids.append(utils.gen_state_config_id(
+                input_['cycle'], input_['pass'], input_['scene']
+            ))
+
+    try:
+        state_configs = utils.get_datasets(state_config_ids)
+    except RequestException:
+        logger.exception('ES request failed')
+        state_configs = None
+
+    def process_job(eval_job):
+        job_logger = JobMetadataInjector(logger, eval_job)
+        return _process_job(
+            eval_job, job_logger, inputs[eval_job['product_id']],
+            state_configs
+        )
+
+    with ThreadPoolExecutor(max_workers=SUBMIT_MAX_WORKERS) as executor:
+        jobs = list(executor.map(process_job, jobset['jobs']))
+
+    return {
+        'jobs': jobs,
+        'inputs': inputs
+    }
+
+
+def _process_job(eval_job, job_logger, input_params, state_configs):
     if eval_job['job_status'] not in sds_statuses.SUCCESS:
         job_logger.debug(
             f'Passing through job: product_id={eval_job["product_id"]}')
@@ -42,21 +76,17 @@ def handle_job(eval_job, job_logger, input_params):
         'product_id': eval_job['product_id']
     }
 
-    cycle = str(input_params['cycle']).rjust(3, '0')
-    passe = str(input_params['pass']).rjust(3, '0')
-    scene = str(input_params['scene']).rjust(3, '0')
-    state_config_id = f'L2_HR_Raster_{cycle}_{passe}_{scene}-state-config'
-
-    try:
-        state_config = utils.search_datasets(state_config_id, False)
-    except RequestException:
-        job_logger.exception('ES request failed')
+    if state_configs is None:
         raster_job.update(
             job_status='job-failed',
             errors=['ES request failed']
         )
         return raster_job
 
+    state_config_id = utils.gen_state_config_id(
+        input_params['cycle'], input_params['pass'], input_params['scene']
+    )
+    state_config = state_configs.get(state_config_id)
     if state_config is None:
         job_logger.error('State config is missing: %s', state_config_id)
         raster_job.update(
@@ -80,6 +110,7 @@ def handle_job(eval_job, job_logger, input_params):
     input_params['output_granule_extent_flag'] = \
         1 if input_params['output_granule_extent_flag'] else 0
 
+    raster_job_type = utils.get_worker_job_type(RASTER_JOB_NAME)
     raster_job_type.set_input_dataset(state_config)
     raster_job_type.set_input_params(input_params)
 
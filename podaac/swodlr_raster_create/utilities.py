@@ -1,25 +1,146 @@
 '''Shared utilities for raster-create lambdas'''
-from importlib import resources
+from copy import deepcopy
+from importlib import import_module, resources
 import json
+import logging
+from os import getenv
 from pathlib import Path, PurePath
+from threading import Lock, local
 from urllib.parse import urljoin
+import zlib
+import boto3
 import fastjsonschema
 from otello.mozart import Mozart
+from requests import RequestException
 
 import podaac.swodlr_raster_create
 from podaac.swodlr_common.utilities import BaseUtilities
+from .cache import FileCache, TTLCache
+from .cmr import CMRClient
 
 
+# pylint: disable-next=too-many-instance-attributes
 class Utilities(BaseUtilities):
     '''Utility functions implemented as a singleton'''
     APP_NAME = 'swodlr'
     SERVICE_NAME = 'raster-create'
     SCHEMAS_PATH = Path(__file__, '..', 'schemas')
+    # Deterministic sort required for paging through GRQ with search_after
+    GRQ_PAGE_SORT = [{'id.keyword': 'asc'}]
+    JOB_TYPE_CACHE_TTL = 3600
+    PARAM_CACHE_TTL = 300
 
     def __init__(self):
+        # Parameters may be read while the base class initializes
+        self._is_dev = getenv(f'{Utilities.APP_NAME.upper()}_ENV') == 'dev'
+        self._params_lock = Lock()
+        self._job_types_lock = Lock()
+        self._worker_job_types = local()
         super().__init__(Utilities.APP_NAME, Utilities.SERVICE_NAME)
 
+    def get_param(self, name):
+        '''
+        Retrieves a parameter from the environment in development; otherwise
+        every parameter under the service's SSM path is prefetched together
+        and cached in memory and, encrypted, in /tmp until the parameter
+        cache TTL elapses. Raises a KeyError for parameters missing from SSM
+        '''
+        if self._is_dev:
+            return super().get_param(name)
+
+        with self._params_lock:
+            if not hasattr(self, '_params'):
+                app_name = Utilities.APP_NAME.upper()
+                ttl = getenv(f'{app_name}_PARAM_CACHE_TTL')
+                ttl = Utilities.PARAM_CACHE_TTL if ttl is None else int(ttl)
+
+                # pylint: disable=attribute-defined-outside-init
+                self._params = TTLCache(ttl)
+                self._params_file_cache = FileCache('params', ttl)
+                self._params_key_id = getenv(f'{app_name}_PARAM_CACHE_KEY_ID')
+                # pylint: enable=attribute-defined-outside-init
+
+            params = self._params.get('params')
+            if params is None:
+                params = self._load_params()
+                if params is None:
+                    params = self._fetch_params()
+                    self._store_params(params)
+
+                self._params.set('params', params)
+
+        if name not in params:
+            raise KeyError(f'Missing parameter: {self._ssm_path}{name}')
+
+        return params[name]
+
+    @property
+    def _ssm_path(self):
+        return f'/service/{Utilities.APP_NAME}/{Utilities.SERVICE_NAME}/'
+
+    def _fetch_params(self):
+        paginator = boto3.client('ssm').get_paginator('get_parameters_by_path')
+        pages = paginator.paginate(Path=self._ssm_path, WithDecryption=True)
+
+        return {
+            param['Name'][len(self._ssm_path):]: param['Value']
+            for page in pages
+            for param in page['Parameters']
+        }
+
+    def _load_params(self):
+        if self._params_key_id is None:
+            return None
+
+        data = self._params_file_cache.get(self._ssm_path)
+        if data is None:
+            return None
+
+        try:
+            response = boto3.client('kms').decrypt(
+                CiphertextBlob=data,
+                KeyId=self._params_key_id,
+                EncryptionContext={'path': self._ssm_path}
+            )
+            return json.loads(zlib.decompress(response['Plaintext']))
+        except Exception:  # pylint: disable=broad-exception-caught
+            # get_logger reads parameters itself so can't be used here
+            logging.getLogger(__name__).warning(
+                'Failed to load cached parameters', exc_info=True
+            )
+            return None
+
+    def _store_params(self, params):
+        if self._params_key_id is None:
+            return
+
+        try:
+            response = boto3.client('kms').encrypt(
+                KeyId=self._params_key_id,
+                Plaintext=zlib.compress(json.dumps(params).encode('utf-8')),
+                EncryptionContext={'path': self._ssm_path}
+            )
+            self._params_file_cache.set(
+                self._ssm_path, response['CiphertextBlob']
+            )
+        except Exception:  # pylint: disable=broad-exception-caught
+            logging.getLogger(__name__).warning(
+                'Failed to cache parameters', exc_info=True
+            )
+
     def load_json_schema(self, name):
+        '''
+        Loads a schema's validator, preferring the module generated at build
+        time by compile_validators and falling back to compiling the schema
+        at runtime when none was generated
+        '''
+        module_name = f'{__package__}.validators.{name}'
+        try:
+            return import_module(module_name).validate
+        except ModuleNotFoundError as ex:
+            if ex.name not in (module_name, f'{__package__}.validators'):
+                raise
+
         schemas = resources.files(podaac.swodlr_raster_create) \
             .joinpath('schemas')
         schema_resource = schemas.joinpath(f'{name}.json')
@@ -30,22 +151,71 @@ class Utilities(BaseUtilities):
         with schema_resource.open('r', encoding='utf-8') as schema_json:
             return fastjsonschema.compile(json.load(schema_json))
 
+    @staticmethod
+    def gen_state_config_id(cycle, passe, scene):
+        '''
+        Generates the id of the state config dataset produced by evaluating a
+        scene
+        '''
+        return f'L2_HR_Raster_{cycle:03}_{passe:03}_{scene:03}-state-config'
+
+    @staticmethod
+    def gen_grq_query(filters, source=None, size=100, sort=None):
+        '''
+        Generates a GRQ search body with the filters placed in filter context
+        so that no scoring is performed, optionally restricting the returned
+        _source fields
+        '''
+        body = {
+            'size': size,
+            'query': {
+                'bool': {
+                    'filter': filters
+                }
+            }
+        }
+
+        if source is not None:
+            body['_source'] = source
+        if sort is not None:
+            body['sort'] = sort
+
+        return body
+
+    def search_grq(
+        self, es_client, filters, source=None, page_size=100, first_page=None
+    ):
+        '''
+        Lazily iterates over every GRQ hit matching the filters, paging with
+        search_after rather than relying on a fixed result size. A response
+        which has already been retrieved for the first page (eg: from a
+        multi-search) may be passed in to continue on from
+        '''
+        body = self.gen_grq_query(
+            filters, source, page_size, Utilities.GRQ_PAGE_SORT
+        )
+        response = first_page
+
+        while True:
+            if response is None:
+                response = es_client.search(index='grq', body=body)
+
+            hits = response['hits']['hits']
+            yield from hits
+
+            if len(hits) < page_size:
+                return
+
+            body = {**body, 'search_after': hits[-1]['sort']}
+            response = None
+
     def search_datasets(self, dataset_id, wildcard=True):
         '''
         Searches for datasets by id using a lazily created session, supporting
         wildcard searches by default
         '''
-        if not hasattr(self, '_grq_es_path'):
-            host = self.get_param('sds_host')
-            path = self.get_param('sds_grq_es_path')
-            index = self.get_param('sds_grq_es_index')
-
-            search_path = str(PurePath(host, path, index, '_search'))
-            es_path = urljoin(host, search_path)
-            self._grq_es_path = es_path  # noqa: E501 # pylint: disable=attribute-defined-outside-init
-
         session = self._get_sds_session()
-        es_path = self._grq_es_path
+        es_path = self._get_grq_es_path()
         query_type = 'wildcard' if wildcard else 'term'
 
         res = session.get(es_path, json={
@@ -63,6 +233,208 @@ class Utilities(BaseUtilities):
 
         return body['hits']['hits'][0]['_source']
 
+    def get_datasets(self, dataset_ids):
+        '''
+        Retrieves datasets by exact id with a single terms query, returning a
+        dict of id to dataset. Ids which aren't found are left out of the
+        result. Raises a RequestException when GRQ returns an error
+        '''
+        dataset_ids = sorted(set(dataset_ids))
+        if len(dataset_ids) == 0:
+            return {}
+
+        session = self._get_sds_session()
+        es_path = self._get_grq_es_path()
+
+        query = self.gen_grq_query(
+            [{'terms': {'id.keyword': dataset_ids}}], size=len(dataset_ids)
+        )
+        # A dataset may have copies in more than one of the indices behind
+        # the grq alias; collapsing returns one hit per id so that the size
+        # can't cut off other ids
+        query['collapse'] = {'field': 'id.keyword'}
+
+        res = session.get(es_path, json=query)
+        res.raise_for_status()
+
+        body = res.json()
+        if 'hits' not in body:
+            raise RequestException(
+                f'GRQ search failed: {body.get("error", body)}', response=res
+            )
+
+        return {
+            hit['_source']['id']: hit['_source']
+            for hit in body['hits']['hits']
+        }
+
+    def get_job_infos(self, job_ids):
+        '''
+        Retrieves the info of jobs by id from Mozart's job status index with
+        a single ids query, returning a dict of job id to job info in the
+        same shape as otello's Job.get_info. Ids which aren't found are left
+        out of the result. Raises a RequestException when Mozart returns an
+        error
+        '''
+        job_ids = sorted(set(job_ids))
+        if len(job_ids) == 0:
+            return {}
+
+        session = self._get_sds_session()
+        es_path = self._get_mozart_es_path()
+
+        res = session.get(es_path, json={
+            'size': len(job_ids),
+            'query': {
+                'ids': {
+                    'values': job_ids
+                }
+            }
+        })
+        res.raise_for_status()
+
+        body = res.json()
+        if 'hits' not in body:
+            raise RequestException(
+                f'Mozart search failed: {body.get("error", body)}',
+                response=res
+            )
+
+        return {hit['_id']: hit['_source'] for hit in body['hits']['hits']}
+
+    def _get_grq_es_path(self):
+        if not hasattr(self, '_grq_es_path'):
+            self._grq_es_path = self._gen_es_path(  # noqa: E501 # pylint: disable=attribute-defined-outside-init
+                'sds_grq_es_path', 'sds_grq_es_index'
+            )
+
+        return self._grq_es_path
+
+    def _get_mozart_es_path(self):
+        if not hasattr(self, '_mozart_es_path'):
+            self._mozart_es_path = self._gen_es_path(  # noqa: E501 # pylint: disable=attribute-defined-outside-init
+                'sds_mozart_es_path', 'sds_mozart_es_index'
+            )
+
+        return self._mozart_es_path
+
+    def _gen_es_path(self, path_param, index_param):
+        host = self.get_param('sds_host')
+        path = self.get_param(path_param)
+        index = self.get_param(index_param)
+
+        search_path = str(PurePath(host, path, index, '_search'))
+        return urljoin(host, search_path)
+
+    def get_job_type(self, job_name):
+        '''
+        Lazily resolves the latest version of a job type and initializes it on
+        first use. Initialized job types are cached in memory, and the job
+        spec, hysds-io and queues fetched by their initialization are cached
+        as JSON in /tmp, until the job type cache TTL elapses so that Mozart
+        isn't consulted on every cold start
+        '''
+        with self._job_types_lock:
+            if not hasattr(self, '_job_types'):
+                ttl = self.get_param('job_type_cache_ttl')
+                ttl = Utilities.JOB_TYPE_CACHE_TTL if ttl is None else int(ttl)
+
+                # pylint: disable=attribute-defined-outside-init
+                self._job_types = TTLCache(ttl)
+                self._job_types_file_cache = FileCache('job_types', ttl)
+                # pylint: enable=attribute-defined-outside-init
+
+            job_type = self._job_types.get(job_name)
+            if job_type is not None:
+                return job_type
+
+            job_type = self._load_job_type(job_name)
+            if job_type is None:
+                version = self.get_latest_job_version(job_name)
+                job_type = self.mozart_client.get_job_type(version)
+                blank = self._job_type_state(job_type)
+                job_type.initialize()
+                self._store_job_type(job_name, version, job_type, blank)
+
+            self._job_types.set(job_name, job_type)
+            return job_type
+
+    def _load_job_type(self, job_name):
+        # Rebuilds a job type from the cached results of its initialization
+        data = self._job_types_file_cache.get(job_name)
+        if data is None:
+            return None
+
+        try:
+            cached = json.loads(data)
+            job_type = self.mozart_client.get_job_type(cached['version'])
+            state = vars(job_type)
+
+            unknown = set(cached['spec']) - set(state)
+            if unknown:
+                # Cached by another version of otello
+                raise ValueError(f'Unknown attributes: {sorted(unknown)}')
+
+            state.update(cached['spec'])
+            return job_type
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.get_logger(__name__).warning(
+                'Failed to load cached job type: %s', job_name, exc_info=True
+            )
+            return None
+
+    def _store_job_type(self, job_name, version, job_type, blank):
+        # Only the attributes set by initialization are cached; the job type
+        # is otherwise rebuilt with the current configuration and session
+        spec = {
+            name: value
+            for name, value in self._job_type_state(job_type).items()
+            if name not in blank or blank[name] != value
+        }
+
+        try:
+            data = json.dumps({'version': version, 'spec': spec})
+            self._job_types_file_cache.set(job_name, data.encode('utf-8'))
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.get_logger(__name__).warning(
+                'Failed to cache job type: %s', job_name, exc_info=True
+            )
+
+    def _job_type_state(self, job_type):
+        session = self._get_sds_session()
+        return {
+            name: deepcopy(value) for name, value in vars(job_type).items()
+            if value is not session
+        }
+
+    def copy_job_type(self, job_type):
+        '''
+        Creates an independent copy of an initialized job type so that inputs
+        can be set and jobs submitted concurrently; the SDS session is shared
+        between copies rather than duplicated
+        '''
+        session = self._get_sds_session()
+        return deepcopy(job_type, {id(session): session})
+
+    def get_worker_job_type(self, job_name):
+        '''
+        Retrieves the calling thread's own copy of a job type so that
+        concurrent workers never share the inputs they set; a thread's copy
+        is remade once the cached job type is refreshed
+        '''
+        job_type = self.get_job_type(job_name)
+
+        if not hasattr(self._worker_job_types, 'copies'):
+            self._worker_job_types.copies = {}
+        copies = self._worker_job_types.copies
+
+        source, copy = copies.get(job_name, (None, None))
+        if source is not job_type:
+            copy = self.copy_job_type(job_type)
+            copies[job_name] = (job_type, copy)
+
+        return copy
+
     @property
     def mozart_client(self):
         '''
@@ -82,5 +454,19 @@ class Utilities(BaseUtilities):
 
         return self._mozart_client
 
+    @property
+    def cmr_client(self):
+        '''
+        Lazily creates a CMR GraphQL client
+        '''
+        if not hasattr(self, '_cmr_client'):
+            # pylint: disable=attribute-defined-outside-init
+            self._cmr_client = CMRClient(
+                self.get_param('cmr_graphql_endpoint'),
+                self.get_param('edl_token')
+            )
+
+        return self._cmr_client
+
 
 utils = Utilities()
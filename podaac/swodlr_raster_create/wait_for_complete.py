@@ -2,25 +2,107 @@
 Lambda which retrieves the job statuses from the SDS and updates the waiting
 flag
 '''
+from datetime import datetime, timezone
 import json
-from podaac.swodlr_common.decorators import bulk_job_handler
+from math import ceil
+import re
+from time import monotonic, sleep
 from podaac.swodlr_common.logging import JobMetadataInjector
 from podaac.swodlr_common import sds_statuses
 from .utilities import utils
 
 
+DEFAULT_WAIT_SECONDS = 60
+WAIT_MIN_SECONDS = int(utils.get_param('wait_min_seconds'))
+WAIT_MAX_SECONDS = int(utils.get_param('wait_max_seconds'))
+# Weight given to a finished job's durations when updating the history
+DURATION_SMOOTHING = 0.2
+# Fraction of a stage's expected duration to wait on overdue jobs
+OVERDUE_WAIT_FRACTION = 0.1
+# Long polling is disabled unless given a maximum duration
+LONG_POLL_MAX_SECONDS = int(utils.get_param('long_poll_max_seconds'))
+LONG_POLL_INITIAL_DELAY = 1
+LONG_POLL_MAX_DELAY = 30
+# Time kept back from the lambda's timeout to return the jobset in
+LONG_POLL_MARGIN_SECONDS = 5
+ISO_TIME_PATTERN = re.compile(
+    r'(?P<time>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})'
+    r'(?:\.(?P<fraction>\d+))?(?P<offset>Z|[+-]\d{2}:\d{2})?'
+)
+
 logger = utils.get_logger(__name__)
 validate_jobset = utils.load_json_schema('jobset')
+grq_es_client = utils.get_grq_es_client()
+
+# Typical queued and run times of the jobs submitted by each stage, refined
+# by finished jobs for as long as the lambda is warm
+stage_durations = json.loads(utils.get_param('wait_stage_durations'))
 
 
-@bulk_job_handler(returns_jobset=True)
-def handle_jobs(jobset):
+def lambda_handler(event, context):
     '''
     Lambda handler which accepts a jobset, updates the statuses from the SDS,
     appends a waiting flag if the jobset still has jobs that haven't completed,
-    and returns the updated jobset
+    and returns the updated jobset along with the recommended number of
+    seconds to wait before checking again. Long polling returns ahead of the
+    lambda's timeout, which is taken from the context
+    '''
+    jobset = validate_jobset(event)
+
+    deadline = None
+    if context is not None:
+        deadline = monotonic() + context.get_remaining_time_in_millis() / 1000
+
+    return handle_jobs(jobset, deadline)
+
+
+def handle_jobs(jobset, deadline=None):
+    '''
+    Updates a jobset's statuses from the SDS, long polling the waiting jobs
+    until they've finished or up until the given deadline on the monotonic
+    clock, and returns the updated jobset
     '''
+    waiting, wait_estimates = _poll_jobs(jobset)
+
+    deadline = _long_poll_deadline(deadline)
+    delay = LONG_POLL_INITIAL_DELAY
+    # Long polling re-polls the outstanding jobs with exponential backoff,
+    # returning early once they've all finished
+    while waiting and deadline is not None:
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            break
+
+        sleep(min(delay, remaining))
+        delay = min(delay * 2, LONG_POLL_MAX_DELAY)
+        waiting, wait_estimates = _poll_jobs(jobset)
+
+    if waiting:
+        jobset['waiting'] = True
+        jobset['wait_seconds'] = _recommend_wait(wait_estimates)
+        logger.info('Waiting %d seconds', jobset['wait_seconds'])
+    else:
+        jobset.pop('waiting', None)
+        jobset.pop('wait_seconds', None)
+
+    output = validate_jobset(jobset)
+    return output
+
+
+def _poll_jobs(jobset):
+    # Updates the waiting jobs' statuses from the SDS; returns whether the
+    # jobset is still waiting and the estimated seconds until each waiting
+    # job finishes
     waiting = False
+    wait_estimates = []
+    # Every waiting job is polled with one request; jobs shared between
+    # products are only polled once
+    job_infos = _get_job_infos({
+        job['job_id'] for job in jobset['jobs']
+        if job['job_status'] in sds_statuses.WAITING
+    })
+    # Shared jobs only refine the stage durations once
+    recorded = set()
 
     for job in jobset['jobs']:
         job_logger = JobMetadataInjector(logger, job)
@@ -30,11 +112,14 @@ def handle_jobs(jobset):
             continue
 
         job_id = job['job_id']
-        try:
-            job_info = utils.mozart_client.get_job_by_id(job_id).get_info()
-        except Exception:  # pylint: disable=broad-exception-caught
-            job_logger.exception('Failed to get job info')
+        if job_id not in job_infos:
+            # Missing from the bulk lookup; poll the job directly
+            job_infos[job_id] = _get_job_info(job_id, job_logger)
+
+        job_info = job_infos[job_id]
+        if job_info is None:
             waiting = True
+            wait_estimates.append(DEFAULT_WAIT_SECONDS)
             continue
 
         job_status = job_info['status']
@@ -44,8 +129,14 @@ def handle_jobs(jobset):
         if job_status in sds_statuses.WAITING:
             job_logger.info('Waiting for job; status: %s', job_status)
             waiting = True
+            wait_estimates.append(_estimate_remaining(
+                job['stage'], job_status, job_info, job_logger
+            ))
         else:
             job_logger.info('Job finished; status: %s', job_status)
+            if job_status in sds_statuses.SUCCESS and job_id not in recorded:
+                recorded.add(job_id)
+                _record_durations(job['stage'], job_info, job_logger)
 
             job_logger.debug('Pulling metrics out')
             metrics = _extract_metrics(job_info)
@@ -62,13 +153,169 @@ def handle_jobs(jobset):
                 errors=['SDS threw an error. Please contact support']
             )
 
-    if waiting:
-        jobset['waiting'] = True
-    elif 'waiting' in jobset:
-        del jobset['waiting']
+    if _update_delete_task(jobset):
+        waiting = True
+        wait_estimates.append(WAIT_MIN_SECONDS)
 
-    output = validate_jobset(jobset)
-    return output
+    return waiting, wait_estimates
+
+
+def _long_poll_deadline(invocation_deadline):
+    if LONG_POLL_MAX_SECONDS <= 0:
+        return None
+
+    deadline = monotonic() + LONG_POLL_MAX_SECONDS
+    if invocation_deadline is not None:
+        deadline = min(
+            deadline, invocation_deadline - LONG_POLL_MARGIN_SECONDS
+        )
+
+    return deadline
+
+
+def _get_job_infos(job_ids):
+    if len(job_ids) == 0:
+        return {}
+
+    try:
+        return utils.get_job_infos(job_ids)
+    except Exception:  # pylint: disable=broad-exception-caught
+        # Each job falls back to being polled individually
+        logger.exception('Bulk job info lookup failed')
+        return {}
+
+
+def _get_job_info(job_id, job_logger):
+    try:
+        return utils.mozart_client.get_job_by_id(job_id).get_info()
+    except Exception:  # pylint: disable=broad-exception-caught
+        job_logger.exception('Failed to get job info')
+        return None
+
+
+def _estimate_remaining(stage, job_status, job_info, job_logger):
+    # Seconds until a waiting job is expected to finish, based upon how long
+    # it has been queued or running compared to the stage's history
+    durations = stage_durations.get(stage)
+    if durations is None:
+        return DEFAULT_WAIT_SECONDS
+
+    expected = durations['queued'] + durations['runtime']
+    elapsed = 0
+
+    # The estimate only tunes the poll interval, so unexpected job info
+    # falls back to the default rather than failing the poll
+    try:
+        times = job_info.get('job', {}).get('job_info', {})
+        if job_status == 'job-started' and \
+                times.get('time_start') is not None:
+            expected = durations['runtime']
+            elapsed = _now() - _parse_time(times['time_start'])
+        elif times.get('time_queued') is not None:
+            elapsed = _now() - _parse_time(times['time_queued'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        job_logger.warning('Unable to estimate job duration', exc_info=True)
+        return DEFAULT_WAIT_SECONDS
+
+    remaining = expected - elapsed
+    if remaining <= 0:
+        # Overdue; check back after a fraction of the expected duration
+        return expected * OVERDUE_WAIT_FRACTION
+
+    return remaining
+
+
+def _record_durations(stage, job_info, job_logger):
+    try:
+        times = job_info.get('job', {}).get('job_info', {})
+        if any(times.get(key) is None
+               for key in ('time_queued', 'time_start', 'time_end')):
+            return
+
+        time_queued = _parse_time(times['time_queued'])
+        time_start = _parse_time(times['time_start'])
+        time_end = _parse_time(times['time_end'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        job_logger.warning('Unable to record job durations', exc_info=True)
+        return
+    observed = {
+        'queued': time_start - time_queued,
+        'runtime': time_end - time_start
+    }
+
+    previous = stage_durations.get(stage, observed)
+    stage_durations[stage] = {
+        key: previous[key] + DURATION_SMOOTHING * (value - previous[key])
+        for key, value in observed.items()
+    }
+
+
+def _recommend_wait(wait_estimates):
+    # Checks back once the earliest job is expected to have finished
+    if len(wait_estimates) == 0:
+        wait_seconds = DEFAULT_WAIT_SECONDS
+    else:
+        wait_seconds = ceil(min(wait_estimates))
+
+    return max(WAIT_MIN_SECONDS, min(wait_seconds, WAIT_MAX_SECONDS))
+
+
+def _parse_time(value):
+    # The SDS reports UTC times with a 'Z' suffix and a varying number of
+    # fractional digits, neither of which python 3.9's fromisoformat accepts
+    match = ISO_TIME_PATTERN.fullmatch(value)
+    if match is None:
+        raise ValueError(f'Invalid time: {value}')
+
+    fraction = (match['fraction'] or '')[:6].ljust(6, '0')
+    offset = match['offset'] or '+00:00'
+    if offset == 'Z':
+        offset = '+00:00'
+
+    return datetime.fromisoformat(
+        f'{match["time"]}.{fraction}{offset}'
+    ).timestamp()
+
+
+def _now():
+    return datetime.now(timezone.utc).timestamp()
+
+
+def _update_delete_task(jobset):
+    # Drops the GRQ delete task once finished; returns whether it's pending
+    task_id = jobset.get('grq_delete_task')
+    if task_id is None:
+        return False
+
+    if _is_delete_pending(task_id):
+        return True
+
+    del jobset['grq_delete_task']
+    return False
+
+
+def _is_delete_pending(task_id):
+    try:
+        task = grq_es_client.tasks.get(task_id=task_id)
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception('Failed to get GRQ delete task: %s', task_id)
+        return True
+
+    if not task['completed']:
+        logger.info('Waiting for GRQ delete task: %s', task_id)
+        return True
+
+    response = task.get('response', {})
+    if len(response.get('failures', [])) > 0:
+        logger.error(
+            'GRQ delete task finished with failures: %s', response['failures']
+        )
+    else:
+        logger.info(
+            'GRQ delete task finished; deleted: %s', response.get('deleted')
+        )
+
+    return False
 
 
 def _extract_metrics(job):
@@ -8,6 +8,10 @@ resource "aws_lambda_function" "bootstrap" {
 
   filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
   source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
+
+  environment {
+    variables = local.lambda_environment
+  }
 }
 
 resource "aws_lambda_function" "notify_update" {
@@ -20,6 +24,10 @@ resource "aws_lambda_function" "notify_update" {
 
   filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
   source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
+
+  environment {
+    variables = local.lambda_environment
+  }
 }
 
 resource "aws_lambda_function" "preflight" {
@@ -33,6 +41,10 @@ resource "aws_lambda_function" "preflight" {
   filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
   source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
 
+  environment {
+    variables = local.lambda_environment
+  }
+
   vpc_config {
     security_group_ids = [aws_security_group.default.id]
     subnet_ids = data.aws_subnets.private.ids
@@ -50,12 +62,32 @@ resource "aws_lambda_function" "publish_data" {
   filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
   source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
 
+  environment {
+    variables = local.lambda_environment
+  }
+
   vpc_config {
     security_group_ids = [aws_security_group.default.id]
     subnet_ids = data.aws_subnets.private.ids
   }
 }
 
+resource "aws_lambda_function" "split_jobset" {
+  function_name = "${local.service_prefix}-split_jobset"
+  timeout = 30
+  handler = "podaac.swodlr_raster_create.split_jobset.lambda_handler"
+
+  role = aws_iam_role.lambda.arn
+  runtime = "python3.9"
+
+  filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
+  source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
+
+  environment {
+    variables = local.lambda_environment
+  }
+}
+
 resource "aws_lambda_function" "submit_evaluate" {
   function_name = "${local.service_prefix}-submit_evaluate"
   timeout = 30
@@ -67,6 +99,10 @@ resource "aws_lambda_function" "submit_evaluate" {
   filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
   source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
 
+  environment {
+    variables = local.lambda_environment
+  }
+
   vpc_config {
     security_group_ids = [aws_security_group.default.id]
     subnet_ids = data.aws_subnets.private.ids
@@ -84,6 +120,10 @@ resource "aws_lambda_function" "submit_raster" {
   filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
   source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
 
+  environment {
+    variables = local.lambda_environment
+  }
+
   vpc_config {
     security_group_ids = [aws_security_group.default.id]
     subnet_ids = data.aws_subnets.private.ids
@@ -92,7 +132,7 @@ resource "aws_lambda_function" "submit_raster" {
 
 resource "aws_lambda_function" "wait_for_complete" {
   function_name = "${local.service_prefix}-wait_for_complete"
-  timeout = 30
+  timeout = 30 + var.long_poll_max_seconds
   handler = "podaac.swodlr_raster_create.wait_for_complete.lambda_handler"
 
   role = aws_iam_role.lambda.arn
@@ -101,12 +141,53 @@ resource "aws_lambda_function" "wait_for_complete" {
   filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
   source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
 
+  environment {
+    variables = local.lambda_environment
+  }
+
   vpc_config {
     security_group_ids = [aws_security_group.default.id]
     subnet_ids = data.aws_subnets.private.ids
   }
 }
 
+resource "aws_lambda_function" "register_callback" {
+  function_name = "${local.service_prefix}-register_callback"
+  timeout = 30
+  handler = "podaac.swodlr_raster_create.register_callback.lambda_handler"
+
+  role = aws_iam_role.callbacks.arn
+  runtime = "python3.9"
+
+  filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
+  source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
+
+  environment {
+    variables = local.lambda_environment
+  }
+
+  vpc_config {
+    security_group_ids = [aws_security_group.default.id]
+    subnet_ids = data.aws_subnets.private.ids
+  }
+}
+
+resource "aws_lambda_function" "completion_listener" {
+  function_name = "${local.service_prefix}-completion_listener"
+  timeout = 30
+  handler = "podaac.swodlr_raster_create.completion_listener.lambda_handler"
+
+  role = aws_iam_role.callbacks.arn
+  runtime = "python3.9"
+
+  filename = "${path.module}/../dist/${local.name}-${local.version}.zip"
+  source_code_hash = filebase64sha256("${path.module}/../dist/${local.name}-${local.version}.zip")
+
+  environment {
+    variables = local.lambda_environment
+  }
+}
+
 # -- IAM --
 resource "aws_iam_policy" "ssm_parameters_read" {
   name_prefix = "SSMParametersReadOnlyAccess"
@@ -123,10 +204,29 @@ resource "aws_iam_policy" "ssm_parameters_read" {
       ]
       Effect   = "Allow"
       Resource = "arn:aws:ssm:${var.region}:${local.account_id}:parameter${local.service_path}/*"
+    }, {
+      Sid = "AllowParamCacheEncryption"
+      Action = [
+        "kms:Encrypt",
+        "kms:Decrypt"
+      ]
+      Effect   = "Allow"
+      Resource = aws_kms_key.param_cache.arn
     }]
   })
 }
 
+# -- KMS --
+resource "aws_kms_key" "param_cache" {
+  description = "Encrypts parameters cached in ${local.service_prefix} lambda storage"
+  deletion_window_in_days = 7
+}
+
+resource "aws_kms_alias" "param_cache" {
+  name = "alias/${local.service_prefix}-param-cache"
+  target_key_id = aws_kms_key.param_cache.key_id
+}
+
 resource "aws_iam_policy" "lambda_networking" {
   name_prefix = "LambdaNetworkAccess"
   path = "${local.service_path}/"
@@ -218,6 +318,66 @@ resource "aws_iam_role" "lambda" {
   })
 }
 
+resource "aws_iam_role" "callbacks" {
+  name_prefix = "callbacks"
+  path = "${local.service_path}/"
+
+  permissions_boundary = "arn:aws:iam::${local.account_id}:policy/NGAPShRoleBoundary"
+  managed_policy_arns = [
+    "arn:aws:iam::${local.account_id}:policy/NGAPProtAppInstanceMinimalPolicy",
+    aws_iam_policy.ssm_parameters_read.arn,
+    aws_iam_policy.lambda_networking.arn
+  ]
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Action = "sts:AssumeRole"
+      Effect = "Allow"
+      Principal = {
+        Service = "lambda.amazonaws.com"
+      }
+    }]
+  })
+
+  inline_policy {
+    name = "CallbacksPolicy"
+    policy = jsonencode({
+      Version = "2012-10-17"
+      Statement = [
+        {
+          Sid = ""
+          Action = [
+            "dynamodb:PutItem",
+            "dynamodb:UpdateItem",
+            "dynamodb:Query",
+            "dynamodb:DeleteItem"
+          ]
+          Effect   = "Allow"
+          Resource = aws_dynamodb_table.callbacks.arn
+        },
+        {
+          Sid = ""
+          Action = "states:SendTaskSuccess"
+          Effect   = "Allow"
+          // Built from the name to avoid a cycle with the state machine
+          Resource = "arn:aws:states:${var.region}:${local.account_id}:stateMachine:${local.service_prefix}"
+        },
+        {
+          Sid = ""
+          Action = [
+            "sqs:ReceiveMessage",
+            "sqs:DeleteMessage",
+            "sqs:GetQueueAttributes"
+          ]
+          Effect   = "Allow"
+          Resource = aws_sqs_queue.job_status.arn
+        }
+      ]
+    })
+  }
+}
+
 resource "aws_iam_role" "notify_update" {
   name_prefix = "lambda"
   path = "${local.service_path}/"
@@ -364,6 +524,20 @@ resource "aws_ssm_parameter" "sds_grq_es_path" {
   value = var.sds_grq_es_path
 }
 
+resource "aws_ssm_parameter" "sds_mozart_es_index" {
+  name = "${local.service_path}/sds_mozart_es_index"
+  type = "String"
+  overwrite = true
+  value = var.sds_mozart_es_index
+}
+
+resource "aws_ssm_parameter" "sds_mozart_es_path" {
+  name = "${local.service_path}/sds_mozart_es_path"
+  type = "String"
+  overwrite = true
+  value = var.sds_mozart_es_path
+}
+
 resource "aws_ssm_parameter" "sds_submit_max_attempts" {
   name = "${local.service_path}/sds_submit_max_attempts"
   type = "String"
@@ -371,6 +545,13 @@ resource "aws_ssm_parameter" "sds_submit_max_attempts" {
   value = var.sds_submit_max_attempts
 }
 
+resource "aws_ssm_parameter" "sds_submit_max_workers" {
+  name = "${local.service_path}/sds_submit_max_workers"
+  type = "String"
+  overwrite = true
+  value = var.sds_submit_max_workers
+}
+
 resource "aws_ssm_parameter" "sds_submit_timeout" {
   name = "${local.service_path}/sds_submit_timeout"
   type = "String"
@@ -378,6 +559,55 @@ resource "aws_ssm_parameter" "sds_submit_timeout" {
   value = var.sds_submit_timeout
 }
 
+resource "aws_ssm_parameter" "orbit_cache_ttl" {
+  name = "${local.service_path}/orbit_cache_ttl"
+  type = "String"
+  overwrite = true
+  value = var.orbit_cache_ttl
+}
+
+resource "aws_ssm_parameter" "job_type_cache_ttl" {
+  name = "${local.service_path}/job_type_cache_ttl"
+  type = "String"
+  overwrite = true
+  value = var.job_type_cache_ttl
+}
+
+resource "aws_ssm_parameter" "wait_min_seconds" {
+  name = "${local.service_path}/wait_min_seconds"
+  type = "String"
+  overwrite = true
+  value = var.wait_min_seconds
+}
+
+resource "aws_ssm_parameter" "wait_max_seconds" {
+  name = "${local.service_path}/wait_max_seconds"
+  type = "String"
+  overwrite = true
+  value = var.wait_max_seconds
+}
+
+resource "aws_ssm_parameter" "wait_stage_durations" {
+  name = "${local.service_path}/wait_stage_durations"
+  type = "String"
+  overwrite = true
+  value = jsonencode(var.wait_stage_durations)
+}
+
+resource "aws_ssm_parameter" "long_poll_max_seconds" {
+  name = "${local.service_path}/long_poll_max_seconds"
+  type = "String"
+  overwrite = true
+  value = var.long_poll_max_seconds
+}
+
+resource "aws_ssm_parameter" "preflight_max_workers" {
+  name = "${local.service_path}/preflight_max_workers"
+  type = "String"
+  overwrite = true
+  value = var.preflight_max_workers
+}
+
 resource "aws_ssm_parameter" "stepfunction_arn" {
   name  = "${local.service_path}/stepfunction_arn"
   type  = "String"
@@ -385,6 +615,20 @@ resource "aws_ssm_parameter" "stepfunction_arn" {
   value = aws_sfn_state_machine.raster_create.arn
 }
 
+resource "aws_ssm_parameter" "callback_table_name" {
+  name  = "${local.service_path}/callback_table_name"
+  type  = "String"
+  overwrite = true
+  value = aws_dynamodb_table.callbacks.name
+}
+
+resource "aws_ssm_parameter" "callback_ttl" {
+  name  = "${local.service_path}/callback_ttl"
+  type  = "String"
+  overwrite = true
+  value = var.callback_ttl
+}
+
 resource "aws_ssm_parameter" "update_max_attempts" {
   name  = "${local.service_path}/update_max_attempts"
   type  = "String"
@@ -42,6 +42,11 @@ locals {
 
   sds_ca_cert = file(var.sds_ca_cert_path)
 
+  lambda_environment = {
+    SWODLR_PARAM_CACHE_KEY_ID = aws_kms_key.param_cache.arn
+    SWODLR_PARAM_CACHE_TTL    = var.param_cache_ttl
+  }
+
   account_id = data.aws_caller_identity.current.account_id
 
   default_tags = length(var.default_tags) == 0 ? {
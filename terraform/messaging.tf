@@ -18,3 +18,48 @@ resource "aws_lambda_event_source_mapping" "product_create_queue" {
   function_name = aws_lambda_function.bootstrap.arn
   batch_size = 1  # Disable premature optimizations for now
 }
+
+# -- SDS Job Statuses --
+// HySDS job status notifications which resume the executions waiting on
+// each job; executions still poll the SDS on their timeouts without them
+resource "aws_sqs_queue" "job_status" {
+  name = "${local.service_prefix}-job-status-queue"
+  visibility_timeout_seconds = 180  # 6x the completion_listener's timeout
+}
+
+resource "aws_sqs_queue_policy" "job_status" {
+  count = var.sds_job_status_topic_arn == null ? 0 : 1
+  queue_url = aws_sqs_queue.job_status.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [{
+      Sid = ""
+      Action = "sqs:SendMessage"
+      Effect = "Allow"
+      Principal = {
+        Service = "sns.amazonaws.com"
+      }
+      Resource = aws_sqs_queue.job_status.arn
+      Condition = {
+        ArnEquals = {
+          "aws:SourceArn" = var.sds_job_status_topic_arn
+        }
+      }
+    }]
+  })
+}
+
+resource "aws_sns_topic_subscription" "job_status" {
+  count = var.sds_job_status_topic_arn == null ? 0 : 1
+  topic_arn = var.sds_job_status_topic_arn
+  protocol = "sqs"
+  endpoint = aws_sqs_queue.job_status.arn
+}
+
+resource "aws_lambda_event_source_mapping" "job_status_queue" {
+  event_source_arn = aws_sqs_queue.job_status.arn
+  function_name = aws_lambda_function.completion_listener.arn
+  batch_size = 10
+  function_response_types = ["ReportBatchItemFailures"]
+}
@@ -1,4 +1,42 @@
 # -- Step Function --
+locals {
+  // Executions can only be resumed early when HySDS job status notifications
+  // are subscribed to; otherwise they simply wait until the next poll
+  job_status_callbacks = var.sds_job_status_topic_arn != null
+
+  // The states which wait on each stage's jobs, keyed by the state polling
+  // them next
+  await_jobs_states = {
+    for next in [
+      "WaitForPreflightComplete",
+      "WaitForEvaluateComplete",
+      "WaitForRasterComplete"
+    ] : next => jsondecode(local.job_status_callbacks ? jsonencode({
+      Type = "Task"
+      Resource = "arn:aws:states:::lambda:invoke.waitForTaskToken"
+      Parameters = {
+        FunctionName = aws_lambda_function.register_callback.arn
+        Payload = {
+          "jobset.$" = "$"
+          "task_token.$" = "$$.Task.Token"
+        }
+      }
+      TimeoutSecondsPath = "$.wait_seconds"
+      ResultPath = null
+      Catch = [{
+        ErrorEquals = ["States.ALL"]
+        ResultPath = null
+        Next = next
+      }]
+      Next = next
+    }) : jsonencode({
+      Type = "Wait"
+      SecondsPath = "$.wait_seconds"
+      Next = next
+    }))
+  }
+}
+
 resource "aws_sfn_state_machine" "raster_create" {
   name = local.service_prefix
   role_arn = aws_iam_role.sfn.arn
@@ -12,6 +50,8 @@ resource "aws_sfn_state_machine" "raster_create" {
         Next = "WaitForPreflightComplete"
       }
 
+      // Ingest jobs are short and shared between scenes, so the whole
+      // jobset waits on them together before being split
       WaitForPreflightComplete = {
         Type = "Task"
         Resource = aws_lambda_function.wait_for_complete.arn
@@ -31,104 +71,111 @@ resource "aws_sfn_state_machine" "raster_create" {
               BooleanEquals = true
             }
           ]
-          Next = "TimeoutPreflight"
+          Next = "AwaitPreflightJobs"
         }]
-        Default = "SubmitEvaluate"
+        Default = "SplitJobset"
       }
 
-      TimeoutPreflight = {
-        Type = "Wait"
-        Seconds = 60
-        Next = "WaitForPreflightComplete"
-      }
+      AwaitPreflightJobs = local.await_jobs_states["WaitForPreflightComplete"]
 
-      SubmitEvaluate = {
+      SplitJobset = {
         Type = "Task"
-        Resource = aws_lambda_function.submit_evaluate.arn
-        Next = "WaitForEvaluateComplete"
-      }
+        Resource = aws_lambda_function.split_jobset.arn
+        Next = "ProcessScenes"
+      }
+
+      ProcessScenes = {
+        Type = "Map"
+        ItemsPath = "$.jobsets"
+        ItemProcessor = {
+          ProcessorConfig = {
+            Mode = "INLINE"
+          }
+          StartAt = "SubmitEvaluate"
+          States = {
+            SubmitEvaluate = {
+              Type = "Task"
+              Resource = aws_lambda_function.submit_evaluate.arn
+              Next = "WaitForEvaluateComplete"
+            }
 
-      WaitForEvaluateComplete = {
-        Type = "Task"
-        Resource = aws_lambda_function.wait_for_complete.arn
-        Next = "CheckEvaluateJobs"
-      }
+            WaitForEvaluateComplete = {
+              Type = "Task"
+              Resource = aws_lambda_function.wait_for_complete.arn
+              Next = "CheckEvaluateJobs"
+            }
 
-      CheckEvaluateJobs = {
-        Type = "Choice",
-        Choices = [{
-          And = [
-            {
-              Variable = "$.waiting"
-              IsPresent = true
-            },
-            {
-              Variable = "$.waiting"
-              BooleanEquals = true
+            CheckEvaluateJobs = {
+              Type = "Choice",
+              Choices = [{
+                And = [
+                  {
+                    Variable = "$.waiting"
+                    IsPresent = true
+                  },
+                  {
+                    Variable = "$.waiting"
+                    BooleanEquals = true
+                  }
+                ]
+                Next = "AwaitEvaluateJobs"
+              }]
+              Default = "NotifyEvaluateUpdate"
             }
-          ]
-          Next = "TimeoutEvaluate"
-        }]
-        Default = "NotifyEvaluateUpdate"
-      }
 
-      TimeoutEvaluate = {
-        Type = "Wait"
-        Seconds = 60
-        Next = "WaitForEvaluateComplete"
-      }
+            AwaitEvaluateJobs = local.await_jobs_states["WaitForEvaluateComplete"]
 
-      NotifyEvaluateUpdate = {
-        Type = "Task"
-        Resource = aws_lambda_function.notify_update.arn
-        Next = "SubmitRaster"
-      }
+            NotifyEvaluateUpdate = {
+              Type = "Task"
+              Resource = aws_lambda_function.notify_update.arn
+              Next = "SubmitRaster"
+            }
 
-      SubmitRaster = {
-        Type = "Task"
-        Resource = aws_lambda_function.submit_raster.arn
-        Next = "WaitForRasterComplete"
-      }
+            SubmitRaster = {
+              Type = "Task"
+              Resource = aws_lambda_function.submit_raster.arn
+              Next = "WaitForRasterComplete"
+            }
 
-      WaitForRasterComplete = {
-        Type = "Task"
-        Resource = aws_lambda_function.wait_for_complete.arn
-        Next = "CheckRasterJobs"
-      }
+            WaitForRasterComplete = {
+              Type = "Task"
+              Resource = aws_lambda_function.wait_for_complete.arn
+              Next = "CheckRasterJobs"
+            }
 
-      CheckRasterJobs = {
-        Type = "Choice",
-        Choices = [{
-          And = [
-            {
-              Variable = "$.waiting"
-              IsPresent = true
-            },
-            {
-              Variable = "$.waiting"
-              BooleanEquals = true
+            CheckRasterJobs = {
+              Type = "Choice",
+              Choices = [{
+                And = [
+                  {
+                    Variable = "$.waiting"
+                    IsPresent = true
+                  },
+                  {
+                    Variable = "$.waiting"
+                    BooleanEquals = true
+                  }
+                ]
+                Next = "AwaitRasterJobs"
+              }]
+              Default = "PublishData"
             }
-          ]
-          Next = "TimeoutRaster"
-        }]
-        Default = "PublishData"
-      }
 
-      TimeoutRaster = {
-        Type = "Wait"
-        Seconds = 60
-        Next = "WaitForRasterComplete"
-      }
+            AwaitRasterJobs = local.await_jobs_states["WaitForRasterComplete"]
 
-      PublishData = {
-        Type = "Task"
-        Resource = aws_lambda_function.publish_data.arn
-        Next = "NotifyRasterUpdate"
-      }
+            PublishData = {
+              Type = "Task"
+              Resource = aws_lambda_function.publish_data.arn
+              Next = "NotifyRasterUpdate"
+            }
 
-      NotifyRasterUpdate = {
-        Type = "Task"
-        Resource = aws_lambda_function.notify_update.arn
+            NotifyRasterUpdate = {
+              Type = "Task"
+              Resource = aws_lambda_function.notify_update.arn
+              End = true
+            }
+          }
+        }
         End = true
       }
     }
@@ -164,15 +211,43 @@ resource "aws_iam_role" "sfn" {
         Sid = ""
         Action = "lambda:InvokeFunction"
         Effect   = "Allow"
-        Resource = [
+        Resource = concat([
           aws_lambda_function.preflight.arn,
           aws_lambda_function.notify_update.arn,
           aws_lambda_function.publish_data.arn,
+          aws_lambda_function.split_jobset.arn,
           aws_lambda_function.submit_evaluate.arn,
           aws_lambda_function.submit_raster.arn,
           aws_lambda_function.wait_for_complete.arn
-        ]
+        ], local.job_status_callbacks ? [
+          aws_lambda_function.register_callback.arn
+        ] : [])
       }]
     })
   }
 }
+
+# -- Task Tokens --
+// Executions paused on SDS jobs, keyed by job ID and the waiting jobset's ID,
+// along with each jobset's pending jobs; see callbacks.py
+resource "aws_dynamodb_table" "callbacks" {
+  name = "${local.service_prefix}-callbacks"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key = "job_id"
+  range_key = "jobset_id"
+
+  attribute {
+    name = "job_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "jobset_id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires"
+    enabled = true
+  }
+}
@@ -80,16 +80,97 @@ variable "sds_grq_es_path" {
     default = "/grq_es"
 }
 
+variable "sds_mozart_es_index" {
+    type = string
+    default = "job_status-current"
+}
+
+variable "sds_mozart_es_path" {
+    type = string
+    default = "/mozart_es"
+}
+
 variable "sds_submit_max_attempts" {
     type = number
     default = 5
 }
 
+variable "sds_submit_max_workers" {
+    type = number
+    default = 4
+}
+
 variable "sds_submit_timeout" {
     type = number
     default = 20
 }
 
+variable "preflight_max_workers" {
+    type = number
+    default = 8
+}
+
+variable "orbit_cache_ttl" {
+    type = number
+    default = 300
+}
+
+variable "param_cache_ttl" {
+    type = number
+    default = 300
+}
+
+variable "job_type_cache_ttl" {
+    type = number
+    default = 3600
+}
+
+variable "wait_min_seconds" {
+    type = number
+    default = 5
+}
+
+variable "wait_max_seconds" {
+    type = number
+    default = 600
+}
+
+variable "wait_stage_durations" {
+    type = map(object({
+        queued = number
+        runtime = number
+    }))
+    default = {
+        preflight = { queued = 10, runtime = 60 }
+        submit_evaluate = { queued = 10, runtime = 120 }
+        submit_raster = { queued = 30, runtime = 900 }
+    }
+}
+
+variable "long_poll_max_seconds" {
+    type = number
+    default = 0
+
+    validation {
+        condition = var.long_poll_max_seconds >= 0 && var.long_poll_max_seconds <= 840
+        error_message = "The wait_for_complete lambda can't run for longer than 15 minutes"
+    }
+}
+
+variable "callback_ttl" {
+    type = number
+    default = 86400
+}
+
+// SNS topic which HySDS publishes job status changes to. Once it's set,
+// executions wait on task tokens and are resumed as their jobs finish, so
+// wait_min_seconds may be raised to poll the SDS less often; otherwise they
+// wait between polls with plain Wait states
+variable "sds_job_status_topic_arn" {
+    type = string
+    default = null
+}
+
 variable "update_max_attempts" {
     type = number
     default = 5
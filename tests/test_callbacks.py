@@ -0,0 +1,112 @@
+'''Tests for the callbacks module'''
+from unittest import TestCase
+from unittest.mock import MagicMock
+from podaac.swodlr_raster_create.callbacks import CallbackTable, JOBSET_KEY
+
+
+class ConditionalCheckFailed(Exception):
+    '''Stands in for the DynamoDB client's ConditionalCheckFailedException'''
+
+
+class TestCallbackTable(TestCase):
+    '''Tests for the CallbackTable class'''
+
+    def setUp(self):
+        self.dynamodb = MagicMock()
+        self.dynamodb.exceptions.ConditionalCheckFailedException = \
+            ConditionalCheckFailed
+        self.dynamodb.get_paginator.return_value.paginate.return_value = [
+            {'Items': [{
+                'jobset_id': {'S': 'jobset-a'},
+                'task_token': {'S': 'token'}
+            }]}
+        ]
+        self.stepfunctions = MagicMock()
+        self.callback_table = CallbackTable(
+            self.dynamodb, self.stepfunctions, 'callbacks', 3600
+        )
+
+    def test_register(self):
+        '''
+        Tests that the jobset's pending jobs are stored ahead of the token
+        stored against each job
+        '''
+        self.callback_table.register('token', 'jobset-a', ['job-a', 'job-b'])
+
+        items = [
+            call.kwargs['Item']
+            for call in self.dynamodb.put_item.call_args_list
+        ]
+        self.assertEqual(items[0]['job_id'], {'S': JOBSET_KEY})
+        self.assertEqual(items[0]['pending'], {'SS': ['job-a', 'job-b']})
+        self.assertEqual(
+            [item['job_id'] for item in items[1:]],
+            [{'S': 'job-a'}, {'S': 'job-b'}]
+        )
+        for item in items:
+            self.assertEqual(item['jobset_id'], {'S': 'jobset-a'})
+            self.assertEqual(item['task_token'], {'S': 'token'})
+
+    def test_resume_last_job(self):
+        '''
+        Tests that the execution is resumed once the last of its jobset's
+        pending jobs has finished and that its items are removed
+        '''
+        self.dynamodb.update_item.return_value = {'Attributes': {}}
+
+        self.assertEqual(self.callback_table.resume('job-a'), 1)
+
+        update = self.dynamodb.update_item.call_args.kwargs
+        self.assertEqual(update['Key']['job_id'], {'S': JOBSET_KEY})
+        self.assertEqual(
+            update['ExpressionAttributeValues'][':job_ids'], {'SS': ['job-a']}
+        )
+        self.stepfunctions.send_task_success.assert_called_once_with(
+            taskToken='token', output='{}'
+        )
+        self.assertEqual(
+            [
+                call.kwargs['Key']['job_id']
+                for call in self.dynamodb.delete_item.call_args_list
+            ],
+            [{'S': JOBSET_KEY}, {'S': 'job-a'}]
+        )
+
+    def test_resume_pending_jobs(self):
+        '''
+        Tests that the execution stays paused while its jobset is still
+        waiting on other jobs
+        '''
+        self.dynamodb.update_item.return_value = {'Attributes': {
+            'pending': {'SS': ['job-b']}
+        }}
+
+        self.assertEqual(self.callback_table.resume('job-a'), 0)
+
+        self.stepfunctions.send_task_success.assert_not_called()
+        self.dynamodb.delete_item.assert_called_once_with(
+            TableName='callbacks',
+            Key={'job_id': {'S': 'job-a'}, 'jobset_id': {'S': 'jobset-a'}}
+        )
+
+    def test_resume_failed_job(self):
+        '''
+        Tests that a job which didn't succeed resumes the execution straight
+        away without waiting on the jobset's other jobs
+        '''
+        self.assertEqual(self.callback_table.resume('job-a', False), 1)
+
+        self.dynamodb.update_item.assert_not_called()
+        self.stepfunctions.send_task_success.assert_called_once()
+
+    def test_resume_stale(self):
+        '''
+        Tests that tokens from an earlier wait and jobs which were already
+        marked as finished are ignored
+        '''
+        self.dynamodb.update_item.side_effect = ConditionalCheckFailed()
+
+        self.assertEqual(self.callback_table.resume('job-a'), 0)
+
+        self.stepfunctions.send_task_success.assert_not_called()
+        self.dynamodb.delete_item.assert_called_once()
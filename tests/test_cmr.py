@@ -0,0 +1,112 @@
+'''Tests for the cmr module'''
+from unittest import TestCase
+from unittest.mock import Mock, patch
+from requests import Response
+from podaac.swodlr_raster_create.cmr import CMRClient
+
+
+class TestCMRClient(TestCase):
+    '''Tests for the CMRClient class'''
+
+    def setUp(self):
+        self.client = CMRClient(
+            'https://cmr-graphql.test/', 'edl-test-token', pool_size=4
+        )
+
+    def test_session(self):
+        '''
+        Tests that the client's session authenticates every request and is
+        mounted with a pooled adapter which retries throttled and failed
+        requests
+        '''
+        session = self.client.session
+        self.assertEqual(
+            session.headers['Authorization'], 'Bearer edl-test-token'
+        )
+
+        adapter = session.get_adapter('https://cmr-graphql.test/')
+        # pylint: disable=protected-access
+        self.assertEqual(adapter._pool_maxsize, 4)
+        # pylint: enable=protected-access
+
+        retry = adapter.max_retries
+        self.assertEqual(retry.total, 3)
+        self.assertIn('POST', retry.allowed_methods)
+        for status in (429, 500, 502, 503, 504):
+            self.assertIn(status, retry.status_forcelist)
+
+    def test_query(self):
+        '''
+        Tests that a query is posted to the endpoint through the session and
+        that the response's data is returned
+        '''
+        with patch.object(self.client.session, 'post') as mock_post:
+            response = Mock(spec=Response)
+            response.ok = True
+            response.json.return_value = {'data': {'tiles_0': {'items': []}}}
+            mock_post.return_value = response
+
+            data = self.client.query('query {}', {'a': 1})
+
+        mock_post.assert_called_once_with(
+            'https://cmr-graphql.test/',
+            timeout=15,
+            json={'query': 'query {}', 'variables': {'a': 1}}
+        )
+        self.assertDictEqual(data, {'tiles_0': {'items': []}})
+
+    def test_query_errors(self):
+        '''
+        Tests that failed requests and GraphQL errors are raised rather than
+        returned as empty results
+        '''
+        with patch.object(self.client.session, 'post') as mock_post:
+            response = Mock(spec=Response)
+            response.ok = False
+            mock_post.return_value = response
+
+            with self.assertRaises(RuntimeError):
+                self.client.query('query {}', {})
+
+            response.ok = True
+            response.json.return_value = {'errors': [{'message': 'Bad'}]}
+
+            with self.assertRaises(RuntimeError):
+                self.client.query('query {}', {})
+
+    def test_iter_granules(self):
+        '''
+        Tests that granules are lazily retrieved page by page, following the
+        cursor until every matching granule has been yielded
+        '''
+        pages = [
+            {'count': 3, 'cursor': 'a', 'items': [1, 2]},
+            {'count': 3, 'cursor': 'b', 'items': [3]}
+        ]
+
+        with patch.object(self.client, 'query') as mock_query:
+            mock_query.side_effect = [{'granules': page} for page in pages]
+            granules = self.client.iter_granules({'limit': 2})
+
+            self.assertEqual(next(granules), 1)
+            mock_query.assert_called_once()
+            self.assertListEqual(list(granules), [2, 3])
+
+        self.assertEqual(mock_query.call_count, 2)
+        self.assertDictEqual(
+            mock_query.call_args_list[1].args[1],
+            {'params': {'limit': 2, 'cursor': 'a'}}
+        )
+
+    def test_iter_granules_first_page(self):
+        '''
+        Tests that iteration continues on from a page which has already been
+        retrieved without requesting it again
+        '''
+        with patch.object(self.client, 'query') as mock_query:
+            granules = list(self.client.iter_granules(
+                {'limit': 2}, {'count': 1, 'cursor': 'a', 'items': [1]}
+            ))
+
+        mock_query.assert_not_called()
+        self.assertListEqual(granules, [1])
@@ -0,0 +1,150 @@
+'''Tests for the completion_listener module'''
+import json
+from os import environ
+from unittest import TestCase
+from unittest.mock import patch
+
+with (
+    patch('boto3.client'),
+    patch.dict(environ, {
+        'SWODLR_ENV': 'dev',
+        'SWODLR_callback_ttl': '3600',
+        'SWODLR_callback_table_name': 'callbacks'
+    })
+):
+    from podaac.swodlr_raster_create import completion_listener
+
+
+class TaskTimedOut(Exception):
+    '''Stands in for the Step Functions client's TaskTimedOut error'''
+
+
+class ConditionalCheckFailed(Exception):
+    '''Stands in for the DynamoDB client's ConditionalCheckFailedException'''
+
+
+class TestCompletionListener(TestCase):
+    '''Tests for the completion_listener module'''
+    dynamodb = completion_listener.callback_table.dynamodb
+    stepfunctions = completion_listener.callback_table.stepfunctions
+
+    def setUp(self):
+        self.dynamodb.reset_mock()
+        self.stepfunctions.reset_mock()
+        self.stepfunctions.send_task_success.side_effect = None
+        self.dynamodb.exceptions.ConditionalCheckFailedException = \
+            ConditionalCheckFailed
+        # Each job is the last that its jobset is waiting on unless a test
+        # says otherwise
+        self.dynamodb.update_item.return_value = {'Attributes': {}}
+
+        exceptions = self.stepfunctions.exceptions
+        exceptions.TaskTimedOut = TaskTimedOut
+        exceptions.TaskDoesNotExist = type(
+            'TaskDoesNotExist', (Exception,), {}
+        )
+        exceptions.InvalidToken = type('InvalidToken', (Exception,), {})
+
+        self.paginate = self.dynamodb.get_paginator.return_value.paginate
+        self.paginate.side_effect = None
+        self.paginate.return_value = [{'Items': [{
+            'jobset_id': {'S': 'jobset-a'},
+            'task_token': {'S': 'token'}
+        }]}]
+
+    def test_resume(self):
+        '''
+        Tests that a SNS notification of a finished job resumes the execution
+        waiting on it alone and removes its token
+        '''
+        result = completion_listener.lambda_handler({'Records': [
+            self._record('1', 'job-a', 'job-completed', sns=True)
+        ]}, None)
+
+        self.assertEqual(result, {'batchItemFailures': []})
+        self.stepfunctions.send_task_success.assert_called_once_with(
+            taskToken='token', output='{}'
+        )
+        self.dynamodb.delete_item.assert_called_with(
+            TableName='callbacks',
+            Key={'job_id': {'S': 'job-a'}, 'jobset_id': {'S': 'jobset-a'}}
+        )
+
+    def test_pending_jobs(self):
+        '''
+        Tests that a finished job leaves the execution paused while its
+        jobset is still waiting on other jobs, whereas a failed job resumes
+        it straight away
+        '''
+        self.dynamodb.update_item.return_value = {'Attributes': {
+            'pending': {'SS': ['job-b']}
+        }}
+
+        result = completion_listener.lambda_handler({'Records': [
+            self._record('1', 'job-a', 'job-completed')
+        ]}, None)
+
+        self.assertEqual(result, {'batchItemFailures': []})
+        self.stepfunctions.send_task_success.assert_not_called()
+
+        result = completion_listener.lambda_handler({'Records': [
+            self._record('2', 'job-a', 'job-failed')
+        ]}, None)
+
+        self.assertEqual(result, {'batchItemFailures': []})
+        self.stepfunctions.send_task_success.assert_called_once()
+
+    def test_waiting(self):
+        '''
+        Tests that notifications of jobs which are still waiting and
+        malformed notifications are skipped over
+        '''
+        result = completion_listener.lambda_handler({'Records': [
+            self._record('1', 'job-a', 'job-started'),
+            {'messageId': '2', 'body': 'lorem ipsum'}
+        ]}, None)
+
+        self.assertEqual(result, {'batchItemFailures': []})
+        self.paginate.assert_not_called()
+        self.stepfunctions.send_task_success.assert_not_called()
+
+    def test_timed_out(self):
+        '''
+        Tests that tokens whose task has already timed out are still removed
+        '''
+        self.stepfunctions.send_task_success.side_effect = TaskTimedOut()
+
+        result = completion_listener.lambda_handler({'Records': [
+            self._record('1', 'job-a', 'job-failed')
+        ]}, None)
+
+        self.assertEqual(result, {'batchItemFailures': []})
+        self.dynamodb.delete_item.assert_called_with(
+            TableName='callbacks',
+            Key={'job_id': {'S': 'job-a'}, 'jobset_id': {'S': 'jobset-a'}}
+        )
+
+    def test_failure(self):
+        '''
+        Tests that each notification of a job whose executions couldn't be
+        resumed is reported back to SQS to be retried
+        '''
+        self.paginate.side_effect = RuntimeError()
+
+        result = completion_listener.lambda_handler({'Records': [
+            self._record('1', 'job-a', 'job-completed'),
+            self._record('2', 'job-a', 'job-completed', sns=True)
+        ]}, None)
+
+        self.assertEqual(result, {'batchItemFailures': [
+            {'itemIdentifier': '1'}, {'itemIdentifier': '2'}
+        ]})
+        self.stepfunctions.send_task_success.assert_not_called()
+
+    @staticmethod
+    def _record(message_id, job_id, status, sns=False):
+        body = json.dumps({'uuid': job_id, 'status': status})
+        if sns:
+            body = json.dumps({'Type': 'Notification', 'Message': body})
+
+        return {'messageId': message_id, 'body': body}
@@ -0,0 +1,121 @@
+'''Tests for the benchmarks' pipeline runner'''
+from pathlib import Path
+import re
+from unittest import TestCase
+
+from benchmarks.fakes import DEFAULT_LATENCIES, RASTER_JOB_NAME, JobProfile
+from benchmarks.pipeline import STATE_MACHINE, benchmark, iter_states
+
+
+class TestPipeline(TestCase):
+    '''Tests for the pipeline module'''
+    stepfunction_path = Path(__file__).parent.joinpath(
+        '..', 'terraform', 'stepfunction.tf'
+    )
+
+    def test_mirrors_state_machine(self):
+        '''
+        Tests that the runner's state machine has the same states and
+        transitions as the one deployed by terraform
+        '''
+        with self.stepfunction_path.open('r', encoding='utf-8') as f:
+            definition = f.read()
+
+        # The await states are generated as callback tasks, which the runner
+        # mirrors, or as plain Wait states polling after wait_seconds
+        awaits = re.findall(
+            r'^ *(\w+) = local\.await_jobs_states\["(\w+)"\]',
+            definition, re.MULTILINE
+        )
+        self.assertRegex(
+            definition, r'Type = "Wait"\n *SecondsPath = "\$\.wait_seconds"'
+        )
+
+        states = dict(re.findall(
+            r'^ *(\w+) = \{\n *Type = "(\w+)"', definition, re.MULTILINE
+        ))
+        states.update((name, 'Task') for name, _ in awaits)
+        self.assertEqual(states, {
+            name: state['Type'] for name, state in iter_states(STATE_MACHINE)
+        })
+
+        transitions = re.findall(
+            r'(Next|Default|StartAt) = "(\w+)"', definition
+        )
+        for _, next_state in awaits:
+            transitions.extend([('Next', next_state)] * 2)
+        expected = [('StartAt', STATE_MACHINE['StartAt'])]
+        for _, state in iter_states(STATE_MACHINE):
+            if 'ItemProcessor' in state:
+                expected.append(
+                    ('StartAt', state['ItemProcessor']['StartAt'])
+                )
+            expected.extend(
+                ('Next', choice['Next']) for choice in state.get('Choices', [])
+            )
+            expected.extend(
+                ('Next', catch['Next']) for catch in state.get('Catch', [])
+            )
+            for key in ('Default', 'Next'):
+                if key in state:
+                    expected.append((key, state[key]))
+        self.assertCountEqual(transitions, expected)
+
+        waits = re.findall(
+            r'^ *(\w+) = \{\n *Type = "Wait"\n'
+            r' *(Seconds|SecondsPath) = "?([^"\n]+)"?',
+            definition, re.MULTILINE
+        )
+        self.assertCountEqual(waits, [
+            (name, 'SecondsPath', state['SecondsPath'])
+            if 'SecondsPath' in state
+            else (name, 'Seconds', str(state['Seconds']))
+            for name, state in iter_states(STATE_MACHINE)
+            if state['Type'] == 'Wait'
+        ])
+
+        callback = re.search(
+            r'Type = "Task"\n *Resource = "([^"]+)"\n'
+            r'(?:.*\n)*? *TimeoutSecondsPath = "([^"]+)"',
+            definition
+        )
+        self.assertCountEqual([
+            (name, *callback.groups()) for name, _ in awaits
+        ], [
+            (name, state['Resource'], state['TimeoutSecondsPath'])
+            for name, state in iter_states(STATE_MACHINE)
+            if 'TimeoutSecondsPath' in state
+        ])
+
+        maps = re.findall(
+            r'^ *(\w+) = \{\n *Type = "Map"\n *ItemsPath = "([^"]+)"',
+            definition, re.MULTILINE
+        )
+        self.assertEqual(maps, [
+            (name, state['ItemsPath'])
+            for name, state in iter_states(STATE_MACHINE)
+            if state['Type'] == 'Map'
+        ])
+
+    def test_benchmark(self):
+        '''
+        Tests that every product of every execution makes it through the
+        pipeline to publication
+        '''
+        result = benchmark(
+            size=2, concurrency=2, executions=2,
+            latencies=dict.fromkeys(DEFAULT_LATENCIES, 0),
+            # Raster jobs finish well ahead of the expected stage duration
+            profiles={RASTER_JOB_NAME: JobProfile(queued=30, runtime=300)}
+        )
+
+        self.assertEqual(result['products'], 4)
+        self.assertEqual(result['published'], 4)
+        self.assertGreater(result['polls'], 0)
+        # Executions are resumed as their jobs finish rather than waiting
+        # out the stage's expected duration
+        self.assertGreater(result['resumed'], 0)
+        self.assertLess(result['makespan_seconds'], 70 + 130 + 930)
+        # Waits are skipped over rather than slept through
+        self.assertGreater(result['makespan_seconds'], 70 + 130 + 330)
+        self.assertLess(result['wall_seconds'], 60)
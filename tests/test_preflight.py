@@ -4,7 +4,7 @@ import json
 import os
 from pathlib import Path
 from unittest import TestCase
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 from uuid import uuid4
 from requests import Response
 
@@ -23,12 +23,13 @@ with (
         'SWODLR_sds_username': 'sds_username',
         'SWODLR_sds_password': 'sds_password',
         'SWODLR_sds_submit_max_attempts': '1',
-        'SWODLR_sds_submit_timeout': '0'
+        'SWODLR_sds_submit_timeout': '0',
+        'SWODLR_sds_submit_max_workers': '4',
+        'SWODLR_preflight_max_workers': '4',
+        'SWODLR_orbit_cache_ttl': '300'
     }),
     patch('boto3.client'),
     patch('boto3.resource'),
-    patch('otello.mozart.Mozart.get_job_type'),
-    patch('podaac.swodlr_common.utilities.BaseUtilities.get_latest_job_version'),  # pylint: disable-next=line-too-long # noqa: E501
     patch('podaac.swodlr_raster_create.utilities.utils.get_grq_es_client') as mock_es_client  # pylint: disable-next=line-too-long # noqa: E501
 ):
     from podaac.swodlr_raster_create import preflight
@@ -39,8 +40,14 @@ with (
             status='job-queued'
         )
 
+    def _mock_msearch(body):
+        return {'responses': [
+            {'hits': {'hits': []}} for _ in range(len(body) // 2)
+        ]}
+
     MockJob = namedtuple('MockJob', ['job_id', 'status'])
-    preflight.ingest_job_type.submit_job.side_effect = _mock_submit_job
+    ingest_job_type = MagicMock()
+    ingest_job_type.submit_job.side_effect = _mock_submit_job
 
 
 class TestPreflight(TestCase):
@@ -51,18 +58,33 @@ class TestPreflight(TestCase):
     with valid_sqs_path.open('r', encoding='utf-8') as f:
         valid_sqs = json.load(f)
 
+    def setUp(self):
+        get_patcher = patch.object(
+            preflight.utils, 'get_job_type', return_value=ingest_job_type
+        )
+        self.mock_get_job_type = get_patcher.start()
+        self.addCleanup(get_patcher.stop)
+
+        # Workers share the module's job type mock unless a test says not to
+        copy_patcher = patch.object(
+            preflight.utils, 'copy_job_type',
+            side_effect=lambda job_type: job_type
+        )
+        self.mock_copy_job_type = copy_patcher.start()
+        self.addCleanup(copy_patcher.stop)
+
     def test_no_action(self):
         '''
         Test the situation where GRQ and CMR are at the same state; there
         should be no action taken by preflight
         '''
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             # -- CMR Mock --
             mock_cmr_response = Mock(spec=Response)
             mock_cmr_response.status_code = 200
             mock_cmr_response.json.return_value = {
                 'data': {
-                    'tiles': {
+                    'tiles_0': {
                         'items': [{
                             'granuleUr': 'SWODLR_TEST_GRANULE_1',
                             'relatedUrls': [{
@@ -90,7 +112,7 @@ class TestPreflight(TestCase):
                             }]
                         }]
                     },
-                    'orbit': {
+                    'orbit_0': {
                         'items': [{
                             'granuleUr': 'SWODLR_TEST_GRANULE_5',
                             'relatedUrls': [{
@@ -152,7 +174,9 @@ class TestPreflight(TestCase):
                 }
             }
 
-            mock_es_client().search.side_effect = (mock_grq_tile_response, mock_grq_orbit_response)  # pylint: disable=line-too-long # noqa: E501
+            mock_es_client().msearch.return_value = {'responses': [
+                mock_grq_tile_response, mock_grq_orbit_response
+            ]}
 
             # Lambda handler call
             results = preflight.lambda_handler(self.valid_sqs, None)
@@ -162,13 +186,12 @@ class TestPreflight(TestCase):
             self.assertEqual(len(post_calls), 1)
             self.assertTupleEqual(post_calls[0].args, ('http://cmr-graphql.test/',))  # noqa: E501
             self.assertDictEqual(post_calls[0].kwargs, {
-                'headers': {'Authorization': 'Bearer edl-test-token'},
                 'timeout': 15,
                 'json': {
                     # pylint: disable-next=line-too-long
-                    'query': '\n    query($tileParams: GranulesInput, $orbitParams: GranulesInput) {\n        tiles: granules(params: $tileParams) {\n            items {\n                granuleUr\n                relatedUrls\n            }\n        }\n\n        orbit: granules(params: $orbitParams) {\n            items {\n                granuleUr\n                relatedUrls\n            }\n        }\n    }\n    ',  # noqa: E501
+                    'query': 'query($tiles_0: GranulesInput, $orbit_0: GranulesInput) {\n    tiles_0: granules(params: $tiles_0) {\n        count\n        cursor\n        items {\n            granuleUr\n            relatedUrls\n        }\n    }\n\n    orbit_0: granules(params: $orbit_0) {\n        count\n        cursor\n        items {\n            granuleUr\n            relatedUrls\n        }\n    }\n}',  # noqa: E501
                     'variables': {
-                        'tileParams': {
+                        'tiles_0': {
                             'collectionConceptIds': [
                                 'test-pixc-concept-id',
                                 'test-pixcvec-concept-id'
@@ -182,7 +205,7 @@ class TestPreflight(TestCase):
                             },
                             'limit': 100
                         },
-                        'orbitParams': {
+                        'orbit_0': {
                             'collectionConceptId': 'test-xdf-orbit-2.0-concept-id',  # pylint: disable=line-too-long # noqa: E501
                             'sortKey': '-end_date',
                             'limit': 1
@@ -191,14 +214,18 @@ class TestPreflight(TestCase):
                 }
             })
 
-            es_search_calls = mock_es_client().search.call_args_list
-            self.assertEqual(len(es_search_calls), 2)
-            self.assertDictEqual(es_search_calls[0].kwargs, {
-                'index': 'grq',
-                'body': {
+            self.assertEqual(
+                preflight.cmr_client.session.headers['Authorization'],
+                'Bearer edl-test-token'
+            )
+
+            mock_es_client().msearch.assert_called_once_with(body=[
+                {'index': 'grq'},
+                {
+                    'size': 100,
                     'query': {
                         'bool': {
-                            'must': [
+                            'filter': [
                                 {'term': {'dataset_type.keyword': 'SDP'}},
                                 {'terms': {'dataset.keyword': ['L2_HR_PIXC', 'L2_HR_PIXCVec']}},  # pylint: disable=line-too-long # noqa: E501
                                 {'term': {'metadata.CycleID': '001'}},
@@ -206,25 +233,28 @@ class TestPreflight(TestCase):
                                 {'terms': {'metadata.TileID': ['005', '006', '007', '008']}}  # pylint: disable=line-too-long # noqa: E501
                             ]
                         }
-                    }
+                    },
+                    '_source': ['metadata.id', 'metadata.ISL_urls'],
+                    'sort': [{'id.keyword': 'asc'}]
                 },
-                'size': 100
-            })
-            self.assertDictEqual(es_search_calls[1].kwargs, {
-                'index': 'grq',
-                'body': {
+                {'index': 'grq'},
+                {
+                    'size': 1,
                     'query': {
                         'bool': {
-                            'must': [
+                            'filter': [
                                 {'term': {'dataset_type.keyword': 'AUX'}},
                                 {'term': {'dataset.keyword': 'XDF_ORBIT_REV_FILE'}}  # noqa: E501
                             ]
                         }
                     },
-                    'sort': {'endtime': {'order': 'desc'}}
-                },
-                'size': 1
-            })
+                    '_source': ['metadata.id', 'metadata.ISL_urls'],
+                    'sort': [{'endtime': {'order': 'desc'}}]
+                }
+            ])
+
+            # Nothing to delete; no call should be made against GRQ
+            mock_es_client().delete_by_query.assert_not_called()
 
             # Results check
             self.assertDictEqual(results, {
@@ -251,16 +281,16 @@ class TestPreflight(TestCase):
         the entries on GRQ to ensure consistency
         '''
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             # -- CMR Mock --
             mock_cmr_response = Mock(spec=Response)
             mock_cmr_response.status_code = 200
             mock_cmr_response.json.return_value = {
                 'data': {
-                    'tiles': {
+                    'tiles_0': {
                         'items': []
                     },
-                    'orbit': {
+                    'orbit_0': {
                         'items': []
                     }
                 }
@@ -316,9 +346,12 @@ class TestPreflight(TestCase):
                 }
             }
 
-            mock_es_client().search.side_effect = [
+            mock_es_client().msearch.return_value = {'responses': [
                 mock_grq_tile_response, mock_grq_orbit_response
-            ]
+            ]}
+            mock_es_client().delete_by_query.return_value = {
+                'task': 'grq-node:1234'
+            }
 
             # Lambda handler call
             results = preflight.lambda_handler(self.valid_sqs, None)
@@ -328,13 +361,12 @@ class TestPreflight(TestCase):
             self.assertEqual(len(post_calls), 1)
             self.assertTupleEqual(post_calls[0].args, ('http://cmr-graphql.test/',))  # noqa: E501
             self.assertDictEqual(post_calls[0].kwargs, {
-                'headers': {'Authorization': 'Bearer edl-test-token'},
                 'timeout': 15,
                 'json': {
                     # pylint: disable-next=line-too-long
-                    'query': '\n    query($tileParams: GranulesInput, $orbitParams: GranulesInput) {\n        tiles: granules(params: $tileParams) {\n            items {\n                granuleUr\n                relatedUrls\n            }\n        }\n\n        orbit: granules(params: $orbitParams) {\n            items {\n                granuleUr\n                relatedUrls\n            }\n        }\n    }\n    ',  # noqa: E501
+                    'query': 'query($tiles_0: GranulesInput, $orbit_0: GranulesInput) {\n    tiles_0: granules(params: $tiles_0) {\n        count\n        cursor\n        items {\n            granuleUr\n            relatedUrls\n        }\n    }\n\n    orbit_0: granules(params: $orbit_0) {\n        count\n        cursor\n        items {\n            granuleUr\n            relatedUrls\n        }\n    }\n}',  # noqa: E501
                     'variables': {
-                        'tileParams': {
+                        'tiles_0': {
                             'collectionConceptIds': [
                                 'test-pixc-concept-id',
                                 'test-pixcvec-concept-id'
@@ -348,7 +380,7 @@ class TestPreflight(TestCase):
                             },
                             'limit': 100
                         },
-                        'orbitParams': {
+                        'orbit_0': {
                             'collectionConceptId': 'test-xdf-orbit-2.0-concept-id',  # pylint: disable=line-too-long # noqa: E501
                             'sortKey': '-end_date',
                             'limit': 1
@@ -357,14 +389,13 @@ class TestPreflight(TestCase):
                 }
             })
 
-            es_search_calls = mock_es_client().search.call_args_list
-            self.assertEqual(len(es_search_calls), 2)
-            self.assertDictEqual(es_search_calls[0].kwargs, {
-                'index': 'grq',
-                'body': {
+            mock_es_client().msearch.assert_called_once_with(body=[
+                {'index': 'grq'},
+                {
+                    'size': 100,
                     'query': {
                         'bool': {
-                            'must': [
+                            'filter': [
                                 {'term': {'dataset_type.keyword': 'SDP'}},
                                 {'terms': {'dataset.keyword': ['L2_HR_PIXC', 'L2_HR_PIXCVec']}},  # pylint: disable=line-too-long # noqa: E501
                                 {'term': {'metadata.CycleID': '001'}},
@@ -372,43 +403,46 @@ class TestPreflight(TestCase):
                                 {'terms': {'metadata.TileID': ['005', '006', '007', '008']}}  # pylint: disable=line-too-long # noqa: E501
                             ]
                         }
-                    }
+                    },
+                    '_source': ['metadata.id', 'metadata.ISL_urls'],
+                    'sort': [{'id.keyword': 'asc'}]
                 },
-                'size': 100
-            })
-
-            self.assertDictEqual(es_search_calls[1].kwargs, {
-                'index': 'grq',
-                'body': {
+                {'index': 'grq'},
+                {
+                    'size': 1,
                     'query': {
                         'bool': {
-                            'must': [
+                            'filter': [
                                 {'term': {'dataset_type.keyword': 'AUX'}},
                                 {'term': {'dataset.keyword': 'XDF_ORBIT_REV_FILE'}}  # noqa: E501
                             ]
                         }
                     },
-                    'sort': {'endtime': {'order': 'desc'}}
-                },
-                'size': 1
-            })
+                    '_source': ['metadata.id', 'metadata.ISL_urls'],
+                    'sort': [{'endtime': {'order': 'desc'}}]
+                }
+            ])
 
-            delete_calls = mock_es_client().delete_by_query.call_args_list
-            self.assertEqual(len(delete_calls), 1)
-            self.assertEqual(delete_calls[0].kwargs['index'], 'grq')
-            self.assertCountEqual(
-                delete_calls[0].kwargs['body']['query']['ids']['values'],
-                [
-                    'SWODLR_TEST_GRANULE_1',
-                    'SWODLR_TEST_GRANULE_2',
-                    'SWODLR_TEST_GRANULE_3',
-                    'SWODLR_TEST_GRANULE_4'
-                ]
+            mock_es_client().delete_by_query.assert_called_once_with(
+                index='grq',
+                body={
+                    'query': {
+                        'ids': {'values': [
+                            'SWODLR_TEST_GRANULE_1',
+                            'SWODLR_TEST_GRANULE_2',
+                            'SWODLR_TEST_GRANULE_3',
+                            'SWODLR_TEST_GRANULE_4'
+                        ]}
+                    }
+                },
+                wait_for_completion=False,
+                conflicts='proceed'
             )
 
             # Results check
             self.assertDictEqual(results, {
                 'jobs': [],
+                'grq_delete_task': 'grq-node:1234',
                 'inputs': {
                     'bd18530a-0383-44ec-8cec-4019892afc2e': {
                         'product_id': 'bd18530a-0383-44ec-8cec-4019892afc2e',
@@ -431,13 +465,13 @@ class TestPreflight(TestCase):
         ingest jobs against the new granules from CMR
         '''
 
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             # -- CMR Mock --
             mock_cmr_response = Mock(spec=Response)
             mock_cmr_response.status_code = 200
             mock_cmr_response.json.return_value = {
                 'data': {
-                    'tiles': {
+                    'tiles_0': {
                         'items': [{
                             'granuleUr': 'SWODLR_TEST_GRANULE_1',
                             'relatedUrls': [{
@@ -465,7 +499,7 @@ class TestPreflight(TestCase):
                             }]
                         }]
                     },
-                    'orbit': {
+                    'orbit_0': {
                         'items': [{
                             'granuleUr': 'SWODLR_TEST_GRANULE_5',
                             'relatedUrls': [{
@@ -483,9 +517,9 @@ class TestPreflight(TestCase):
             mock_grq_tile_response = {'hits': {'hits': []}}
             mock_grq_orbit_response = {'hits': {'hits': []}}
 
-            mock_es_client().search.side_effect = [
+            mock_es_client().msearch.return_value = {'responses': [
                 mock_grq_tile_response, mock_grq_orbit_response
-            ]
+            ]}
 
             # Lambda handler call
             results = preflight.lambda_handler(self.valid_sqs, None)
@@ -495,13 +529,12 @@ class TestPreflight(TestCase):
             self.assertEqual(len(post_calls), 1)
             self.assertTupleEqual(post_calls[0].args, ('http://cmr-graphql.test/',))  # noqa: E501
             self.assertDictEqual(post_calls[0].kwargs, {
-                'headers': {'Authorization': 'Bearer edl-test-token'},
                 'timeout': 15,
                 'json': {
                     # pylint: disable-next=line-too-long
-                    'query': '\n    query($tileParams: GranulesInput, $orbitParams: GranulesInput) {\n        tiles: granules(params: $tileParams) {\n            items {\n                granuleUr\n                relatedUrls\n            }\n        }\n\n        orbit: granules(params: $orbitParams) {\n            items {\n                granuleUr\n                relatedUrls\n            }\n        }\n    }\n    ',  # noqa: E501
+                    'query': 'query($tiles_0: GranulesInput, $orbit_0: GranulesInput) {\n    tiles_0: granules(params: $tiles_0) {\n        count\n        cursor\n        items {\n            granuleUr\n            relatedUrls\n        }\n    }\n\n    orbit_0: granules(params: $orbit_0) {\n        count\n        cursor\n        items {\n            granuleUr\n            relatedUrls\n        }\n    }\n}',  # noqa: E501
                     'variables': {
-                        'tileParams': {
+                        'tiles_0': {
                             'collectionConceptIds': [
                                 'test-pixc-concept-id',
                                 'test-pixcvec-concept-id'
@@ -515,7 +548,7 @@ class TestPreflight(TestCase):
                             },
                             'limit': 100
                         },
-                        'orbitParams': {
+                        'orbit_0': {
                             'collectionConceptId': 'test-xdf-orbit-2.0-concept-id',  # pylint: disable=line-too-long # noqa: E501
                             'sortKey': '-end_date',
                             'limit': 1
@@ -524,14 +557,13 @@ class TestPreflight(TestCase):
                 }
             })
 
-            es_search_calls = mock_es_client().search.call_args_list
-            self.assertEqual(len(es_search_calls), 2)
-            self.assertDictEqual(es_search_calls[0].kwargs, {
-                'index': 'grq',
-                'body': {
+            mock_es_client().msearch.assert_called_once_with(body=[
+                {'index': 'grq'},
+                {
+                    'size': 100,
                     'query': {
                         'bool': {
-                            'must': [
+                            'filter': [
                                 {'term': {'dataset_type.keyword': 'SDP'}},
                                 {'terms': {'dataset.keyword': ['L2_HR_PIXC', 'L2_HR_PIXCVec']}},  # pylint: disable=line-too-long # noqa: E501
                                 {'term': {'metadata.CycleID': '001'}},
@@ -539,28 +571,28 @@ class TestPreflight(TestCase):
                                 {'terms': {'metadata.TileID': ['005', '006', '007', '008']}}  # pylint: disable=line-too-long # noqa: E501
                             ]
                         }
-                    }
+                    },
+                    '_source': ['metadata.id', 'metadata.ISL_urls'],
+                    'sort': [{'id.keyword': 'asc'}]
                 },
-                'size': 100
-            })
-            self.assertDictEqual(es_search_calls[1].kwargs, {
-                'index': 'grq',
-                'body': {
+                {'index': 'grq'},
+                {
+                    'size': 1,
                     'query': {
                         'bool': {
-                            'must': [
+                            'filter': [
                                 {'term': {'dataset_type.keyword': 'AUX'}},
                                 {'term': {'dataset.keyword': 'XDF_ORBIT_REV_FILE'}}  # noqa: E501
                             ]
                         }
                     },
-                    'sort': {'endtime': {'order': 'desc'}}
-                },
-                'size': 1
-            })
+                    '_source': ['metadata.id', 'metadata.ISL_urls'],
+                    'sort': [{'endtime': {'order': 'desc'}}]
+                }
+            ])
 
             # pylint: disable-next=no-member
-            self.assertEqual(preflight.ingest_job_type.submit_job.call_count, 5)  # noqa: E501
+            self.assertEqual(ingest_job_type.submit_job.call_count, 5)  # noqa: E501
 
             # Results check
             self.assertDictEqual(results['inputs'], {
@@ -583,9 +615,379 @@ class TestPreflight(TestCase):
                 self.assertEqual(job['product_id'], 'bd18530a-0383-44ec-8cec-4019892afc2e')  # pylint: disable=line-too-long # noqa: E501
                 self.assertEqual(job['stage'], 'preflight')
 
+    def test_batched_cmr_query(self):
+        '''
+        Test that every record in an event is looked up against CMR with a
+        single aliased query and that the results are split back out to
+        their respective products
+        '''
+        event = self._gen_event(2)
+
+        with patch('requests.Session.post') as mock_post:
+            mock_cmr_response = Mock(spec=Response)
+            mock_cmr_response.status_code = 200
+            mock_cmr_response.json.return_value = {'data': {
+                f'{dataset}_{i}': {'items': [{
+                    'granuleUr': f'SWODLR_TEST_{dataset.upper()}_{i}',
+                    'relatedUrls': [{
+                        'type': 'GET DATA',
+                        'url': f's3://dummy-bucket/{dataset}_{i}.nc'
+                    }]
+                }]}
+                for dataset in ('tiles', 'orbit') for i in range(2)
+            }}
+            mock_post.return_value = mock_cmr_response
+
+            mock_es_client().msearch.side_effect = _mock_msearch
+
+            results = preflight.lambda_handler(event, None)
+
+        mock_post.assert_called_once()
+        variables = mock_post.call_args.kwargs['json']['variables']
+        self.assertCountEqual(variables, ['tiles_0', 'tiles_1', 'orbit_0'])
+        self.assertEqual(variables['tiles_0']['cycle'], 1)
+        self.assertEqual(variables['tiles_1']['cycle'], 11)
+
+        # pylint: disable-next=no-member
+        tags = [call.kwargs['tag'] for call in ingest_job_type.submit_job.call_args_list]  # noqa: E501
+        # Orbit file shared between products is only ingested once
+        self.assertCountEqual(tags, [
+            'ingest_file_otello__SWODLR_TEST_TILES_0',
+            'ingest_file_otello__SWODLR_TEST_TILES_1',
+            'ingest_file_otello__SWODLR_TEST_ORBIT_0'
+        ])
+
+        jobs = {}
+        for job in results['jobs']:
+            jobs.setdefault(job['product_id'], []).append(job['job_id'])
+
+        self.assertEqual(len(jobs['product-0']), 2)
+        self.assertEqual(len(jobs['product-1']), 2)
+
+        shared_jobs = set(jobs['product-0']) & set(jobs['product-1'])
+        self.assertEqual(len(shared_jobs), 1)
+
+    def test_chunked_cmr_query(self):
+        '''
+        Test that a batched CMR query is split across multiple requests once
+        the request grows past the maximum size
+        '''
+        event = self._gen_event(3)
+
+        with (
+            patch('requests.Session.post') as mock_post,
+            patch.object(preflight, 'CMR_MAX_REQUEST_SIZE', 1)
+        ):
+            def cmr_response(*_args, **kwargs):
+                response = Mock(spec=Response)
+                response.status_code = 200
+                response.json.return_value = {'data': {
+                    alias: {'items': []}
+                    for alias in kwargs['json']['variables']
+                }}
+                return response
+
+            mock_post.side_effect = cmr_response
+            mock_es_client().msearch.side_effect = _mock_msearch
+
+            results = preflight.lambda_handler(event, None)
+
+        self.assertEqual(mock_post.call_count, 3)
+        aliases = sorted(
+            sorted(call.kwargs['json']['variables'])
+            for call in mock_post.call_args_list
+        )
+        # Orbit lookups only need to be carried by one of the requests
+        self.assertListEqual(aliases, [
+            ['orbit_0', 'tiles_0'], ['tiles_0'], ['tiles_0']
+        ])
+
+        self.assertEqual(len(results['inputs']), 3)
+        self.assertListEqual(results['jobs'], [])
+
+    def test_paginated_tiles(self):
+        '''
+        Test that tile results which overflow the first page of the batched
+        CMR query are followed with CMR's cursor rather than dropped
+        '''
+        def granule(i):
+            return {
+                'granuleUr': f'SWODLR_TEST_GRANULE_{i}',
+                'relatedUrls': [{
+                    'type': 'GET DATA',
+                    'url': f's3://dummy-bucket/test_{i}.nc'
+                }]
+            }
+
+        with patch('requests.Session.post') as mock_post:
+            first_page = Mock(spec=Response)
+            first_page.status_code = 200
+            first_page.json.return_value = {'data': {
+                'tiles_0': {
+                    'count': 3,
+                    'cursor': 'cursor-1',
+                    'items': [granule(1), granule(2)]
+                },
+                'orbit_0': {'count': 1, 'cursor': None, 'items': []}
+            }}
+
+            second_page = Mock(spec=Response)
+            second_page.status_code = 200
+            second_page.json.return_value = {'data': {
+                'granules': {
+                    'count': 3,
+                    'cursor': 'cursor-2',
+                    'items': [granule(3)]
+                }
+            }}
+
+            mock_post.side_effect = [first_page, second_page]
+            mock_es_client().msearch.side_effect = _mock_msearch
+
+            results = preflight.lambda_handler(self.valid_sqs, None)
+
+        self.assertEqual(mock_post.call_count, 2)
+        page_params = mock_post.call_args_list[1].kwargs['json']['variables']
+        self.assertEqual(page_params['params']['cursor'], 'cursor-1')
+        self.assertEqual(page_params['params']['cycle'], 1)
+
+        self.assertEqual(len(results['jobs']), 3)
+
+    def test_paginated_grq(self):
+        '''
+        Test that GRQ results which fill the multi-search's page are paged
+        through with search_after rather than being truncated
+        '''
+        def hit(i):
+            return {
+                '_source': {'metadata': {
+                    'id': f'SWODLR_TEST_GRANULE_{i}',
+                    'ISL_urls': f's3://dummy-bucket/test_{i}.nc'
+                }},
+                'sort': [f'SWODLR_TEST_GRANULE_{i}']
+            }
+
+        with (
+            patch('requests.Session.post') as mock_post,
+            patch.object(preflight, 'GRQ_PAGE_SIZE', 2)
+        ):
+            mock_cmr_response = Mock(spec=Response)
+            mock_cmr_response.status_code = 200
+            mock_cmr_response.json.return_value = {'data': {
+                'tiles_0': {'items': []},
+                'orbit_0': {'items': []}
+            }}
+            mock_post.return_value = mock_cmr_response
+
+            mock_es_client().msearch.return_value = {'responses': [
+                {'hits': {'hits': [hit(1), hit(2)]}},
+                {'hits': {'hits': []}}
+            ]}
+            mock_es_client().search.return_value = {
+                'hits': {'hits': [hit(3)]}
+            }
+
+            preflight.lambda_handler(self.valid_sqs, None)
+
+        mock_es_client().search.assert_called_once()
+        body = mock_es_client().search.call_args.kwargs['body']
+        self.assertListEqual(body['search_after'], ['SWODLR_TEST_GRANULE_2'])
+        self.assertEqual(body['size'], 2)
+
+        # Every page of granules should be scheduled for deletion
+        delete_body = mock_es_client().delete_by_query.call_args.kwargs['body']
+        self.assertListEqual(delete_body['query']['ids']['values'], [
+            'SWODLR_TEST_GRANULE_1',
+            'SWODLR_TEST_GRANULE_2',
+            'SWODLR_TEST_GRANULE_3'
+        ])
+
+    def test_orbit_cache(self):
+        '''
+        Test that the latest orbit file lookups are cached across
+        invocations and that the cache is invalidated once preflight ingests
+        a new orbit file
+        '''
+        granule = {
+            'granuleUr': 'SWODLR_TEST_ORBIT',
+            'relatedUrls': [{
+                'type': 'GET DATA',
+                'url': 's3://dummy-bucket/orbit.nc'
+            }]
+        }
+        grq_orbit_hit = {'_source': {'metadata': {
+            'id': 'SWODLR_TEST_ORBIT',
+            'ISL_urls': 's3://dummy-bucket/orbit.nc'
+        }}}
+
+        with patch('requests.Session.post') as mock_post:
+            def cmr_response(*_args, **kwargs):
+                response = Mock(spec=Response)
+                response.status_code = 200
+                response.json.return_value = {'data': {
+                    alias: {
+                        'items': [granule] if alias.startswith('orbit') else []
+                    }
+                    for alias in kwargs['json']['variables']
+                }}
+                return response
+
+            def grq_response(body):
+                responses = _mock_msearch(body)
+                if body[-1] == preflight.GRQ_ORBIT_QUERY:
+                    responses['responses'][-1]['hits']['hits'].append(
+                        grq_orbit_hit
+                    )
+                return responses
+
+            mock_post.side_effect = cmr_response
+            mock_es_client().msearch.side_effect = grq_response
+
+            for _ in range(2):
+                results = preflight.lambda_handler(self.valid_sqs, None)
+                self.assertListEqual(results['jobs'], [])
+
+            # Second invocation should be served by the orbit cache
+            self.assertListEqual(
+                sorted(mock_post.call_args_list[1].kwargs['json']['variables']),  # noqa: E501
+                ['tiles_0']
+            )
+            self.assertEqual(
+                len(mock_es_client().msearch.call_args_list[1].kwargs['body']),
+                2
+            )
+
+            # Orbit file missing from GRQ; cache is invalidated on ingest
+            preflight.orbit_cache.clear()
+            grq_orbit_hit['_source']['metadata']['id'] = 'SWODLR_OLD_ORBIT'
+            results = preflight.lambda_handler(self.valid_sqs, None)
+
+        self.assertEqual(len(results['jobs']), 1)
+        self.assertIsNone(preflight.orbit_cache.get(
+            'test-xdf-orbit-2.0-concept-id'
+        ))
+
+    def test_concurrent_ingest(self):
+        '''
+        Test that ingest jobs are submitted through per-worker copies of the
+        job type so that input parameters never leak between submissions
+        '''
+        copies = []
+
+        def copy_job_type(_job_type):
+            job_type = MagicMock()
+            job_type.submit_job.side_effect = _mock_submit_job
+            copies.append(job_type)
+            return job_type
+
+        self.mock_copy_job_type.side_effect = copy_job_type
+
+        with patch('requests.Session.post') as mock_post:
+            mock_cmr_response = Mock(spec=Response)
+            mock_cmr_response.status_code = 200
+            mock_cmr_response.json.return_value = {'data': {
+                'tiles_0': {'items': [{
+                    'granuleUr': f'SWODLR_TEST_GRANULE_{i}',
+                    'relatedUrls': [{
+                        'type': 'GET DATA',
+                        'url': f's3://dummy-bucket/test_{i}.nc'
+                    }]
+                } for i in range(8)]},
+                'orbit_0': {'items': []}
+            }}
+            mock_post.return_value = mock_cmr_response
+            mock_es_client().msearch.side_effect = _mock_msearch
+
+            results = preflight.lambda_handler(self.valid_sqs, None)
+
+        # pylint: disable=no-member
+        ingest_job_type.set_input_params.assert_not_called()
+        ingest_job_type.submit_job.assert_not_called()
+        # pylint: enable=no-member
+
+        self.assertGreaterEqual(len(copies), 1)
+        self.assertLessEqual(len(copies), preflight.SUBMIT_MAX_WORKERS)
+
+        params = {}
+        for job_type in copies:
+            for call in job_type.submit_job.call_args_list:
+                granule = call.kwargs['tag'].rsplit('__', 1)[1]
+                params[granule] = job_type.set_input_params.call_args_list[
+                    job_type.submit_job.call_args_list.index(call)
+                ].args[0]
+
+        self.assertEqual(len(params), 8)
+        for granule, job_params in params.items():
+            i = granule.rsplit('_', 1)[1]
+            self.assertEqual(job_params['data_url'], f's3://dummy-bucket/test_{i}.nc')  # noqa: E501
+
+        self.assertEqual(len(results['jobs']), 8)
+
+    def test_lookup_failure(self):
+        '''
+        Test the situation where a granule lookup fails; preflight should
+        attribute the failure to the product being looked up and reraise
+        '''
+        with (
+            patch('requests.Session.post') as mock_post,
+            self.assertLogs(preflight.logger, 'ERROR') as logs,
+            self.assertRaises(RuntimeError)
+        ):
+            mock_post.side_effect = RuntimeError('CMR unreachable')
+            mock_es_client().msearch.side_effect = _mock_msearch
+
+            preflight.lambda_handler(self.valid_sqs, None)
+
+        self.assertIn('bd18530a-0383-44ec-8cec-4019892afc2e', logs.output[0])
+        # pylint: disable-next=no-member
+        ingest_job_type.submit_job.assert_not_called()
+
+    def test_grq_search_error(self):
+        '''
+        Test the situation where one of the GRQ multi-search queries fails;
+        preflight should raise rather than treat the granules as missing,
+        naming the product whose search failed
+        '''
+        with (
+            patch('requests.Session.post') as mock_post,
+            self.assertRaises(RuntimeError) as raised
+        ):
+            mock_cmr_response = Mock(spec=Response)
+            mock_cmr_response.status_code = 200
+            mock_cmr_response.json.return_value = {'data': {
+                'tiles_0': {'items': []},
+                'orbit_0': {'items': []}
+            }}
+            mock_post.return_value = mock_cmr_response
+
+            mock_es_client().msearch.return_value = {'responses': [
+                {'error': {'type': 'search_phase_execution_exception'}},
+                {'hits': {'hits': []}}
+            ]}
+
+            preflight.lambda_handler(self.valid_sqs, None)
+
+        self.assertIn(
+            'bd18530a-0383-44ec-8cec-4019892afc2e', str(raised.exception)
+        )
+        mock_es_client().delete_by_query.assert_not_called()
+
+    def _gen_event(self, count):
+        template = json.loads(self.valid_sqs['Records'][0]['body'])
+        records = []
+
+        for i in range(count):
+            body = dict(template, product_id=f'product-{i}', cycle=i * 10 + 1)
+            records.append({'body': json.dumps(body)})
+
+        return {'Records': records}
+
     def tearDown(self):
         # pylint: disable=no-member
-        preflight.ingest_job_type.set_input_params.reset_mock()
-        preflight.ingest_job_type.submit_job.reset_mock()
+        ingest_job_type.set_input_params.reset_mock()
+        ingest_job_type.submit_job.reset_mock()
         mock_es_client.reset_mock()
+        mock_es_client().msearch.side_effect = None
+        mock_es_client().search.return_value = {'hits': {'hits': []}}
+        preflight.orbit_cache.clear()
         # pylint: enable=no-member
@@ -0,0 +1,156 @@
+'''Tests for the register_callback module'''
+from copy import deepcopy
+import json
+from os import environ
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+with (
+    patch('boto3.client'),
+    patch.dict(environ, {
+        'SWODLR_ENV': 'dev',
+        'SWODLR_callback_table_name': 'callbacks',
+        'SWODLR_callback_ttl': '3600'
+    })
+):
+    from podaac.swodlr_raster_create import register_callback
+
+
+class TestRegisterCallback(TestCase):
+    '''Tests for the register_callback module'''
+    data_path = Path(__file__).parent.joinpath('data')
+    waiting_jobset_path = data_path.joinpath('waiting_jobset.json')
+    with waiting_jobset_path.open('r', encoding='utf-8') as f:
+        waiting_jobset = json.load(f)
+    success_jobset_path = data_path.joinpath('success_jobset.json')
+    with success_jobset_path.open('r', encoding='utf-8') as f:
+        success_jobset = json.load(f)
+
+    dynamodb = register_callback.callback_table.dynamodb
+    stepfunctions = register_callback.callback_table.stepfunctions
+
+    def setUp(self):
+        self.dynamodb.reset_mock()
+        self.stepfunctions.reset_mock()
+        self.dynamodb.put_item.side_effect = None
+        self.dynamodb.update_item.return_value = {'Attributes': {}}
+
+    def test_register(self):
+        '''
+        Tests that the task token is stored against each waiting job and that
+        the execution is left paused while the jobs are still running
+        '''
+        job_id = self.waiting_jobset['jobs'][0]['job_id']
+
+        with patch.object(
+            register_callback.utils, 'get_job_infos',
+            return_value={job_id: {'status': 'job-started'}}
+        ):
+            register_callback.lambda_handler({
+                'jobset': deepcopy(self.waiting_jobset),
+                'task_token': 'token'
+            }, None)
+
+        self.assertEqual(self.dynamodb.put_item.call_count, 2)
+        item = self.dynamodb.put_item.call_args.kwargs['Item']
+        self.assertEqual(
+            self.dynamodb.put_item.call_args.kwargs['TableName'], 'callbacks'
+        )
+        self.assertEqual(item['job_id'], {'S': job_id})
+        self.assertEqual(item['jobset_id'], {
+            'S': self.waiting_jobset['jobs'][0]['product_id']
+        })
+        self.assertEqual(item['task_token'], {'S': 'token'})
+        self.assertIn('N', item['expires'])
+        self.stepfunctions.send_task_success.assert_not_called()
+
+    def test_finished_before_registration(self):
+        '''
+        Tests that jobs which finished before the token was stored are marked
+        as finished, since their notifications were missed, resuming the
+        execution once none of its jobs are pending
+        '''
+        job_id = self.waiting_jobset['jobs'][0]['job_id']
+
+        with patch.object(
+            register_callback.utils, 'get_job_infos',
+            return_value={job_id: {'status': 'job-completed'}}
+        ):
+            register_callback.lambda_handler({
+                'jobset': deepcopy(self.waiting_jobset),
+                'task_token': 'token'
+            }, None)
+
+        update = self.dynamodb.update_item.call_args.kwargs
+        self.assertEqual(
+            update['ExpressionAttributeValues'][':job_ids'], {'SS': [job_id]}
+        )
+        self.stepfunctions.send_task_success.assert_called_once_with(
+            taskToken='token', output='{}'
+        )
+
+        # Jobs which are still pending keep the execution paused
+        self.stepfunctions.reset_mock()
+        self.dynamodb.update_item.return_value = {'Attributes': {
+            'pending': {'SS': ['other-job']}
+        }}
+
+        with patch.object(
+            register_callback.utils, 'get_job_infos',
+            return_value={job_id: {'status': 'job-completed'}}
+        ):
+            register_callback.lambda_handler({
+                'jobset': deepcopy(self.waiting_jobset),
+                'task_token': 'token'
+            }, None)
+
+        self.stepfunctions.send_task_success.assert_not_called()
+
+    def test_register_failure(self):
+        '''
+        Tests that a failure to store the task token is logged rather than
+        raised, leaving the task's timeout to resume the execution
+        '''
+        self.dynamodb.put_item.side_effect = RuntimeError()
+
+        with patch.object(
+            register_callback.utils, 'get_job_infos'
+        ) as mock_get_job_infos:
+            register_callback.lambda_handler({
+                'jobset': deepcopy(self.waiting_jobset),
+                'task_token': 'token'
+            }, None)
+
+        mock_get_job_infos.assert_not_called()
+        self.stepfunctions.send_task_success.assert_not_called()
+
+    def test_invalid_jobset(self):
+        '''
+        Tests that an invalid jobset is logged rather than raised, leaving
+        the task's timeout to resume the execution
+        '''
+        register_callback.lambda_handler({
+            'jobset': {'lorem': 'ipsum'},
+            'task_token': 'token'
+        }, None)
+
+        self.dynamodb.put_item.assert_not_called()
+        self.stepfunctions.send_task_success.assert_not_called()
+
+    def test_no_waiting_jobs(self):
+        '''
+        Tests that no token is stored when none of the jobs are waiting,
+        leaving the task's timeout to resume the execution
+        '''
+        with patch.object(
+            register_callback.utils, 'get_job_infos'
+        ) as mock_get_job_infos:
+            register_callback.lambda_handler({
+                'jobset': deepcopy(self.success_jobset),
+                'task_token': 'token'
+            }, None)
+
+        self.dynamodb.put_item.assert_not_called()
+        mock_get_job_infos.assert_not_called()
+        self.stepfunctions.send_task_success.assert_not_called()
@@ -0,0 +1,63 @@
+'''Tests for the split_jobset module'''
+from copy import deepcopy
+import json
+from os import environ
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+with (
+    patch('boto3.client'),
+    patch.dict(environ, {
+        'SWODLR_ENV': 'dev'
+    })
+):
+    from podaac.swodlr_raster_create import split_jobset
+
+
+class TestSplitJobset(TestCase):
+    '''Tests for the split_jobset module'''
+    data_path = Path(__file__).parent.joinpath('data')
+    waiting_jobset_path = data_path.joinpath('waiting_jobset.json')
+    with waiting_jobset_path.open('r', encoding='utf-8') as f:
+        waiting_jobset = json.load(f)
+
+    def test_split(self):
+        '''
+        Tests that products are grouped into a jobset per scene carrying their
+        own jobs, including products without any jobs, and that the GRQ
+        delete task is carried by every scene
+        '''
+        jobset = deepcopy(self.waiting_jobset)
+        template_job = jobset['jobs'][0]
+        template_input = jobset['inputs'][template_job['product_id']]
+
+        scenes = {'product-a': 1, 'product-b': 2, 'product-c': 1}
+        jobset['inputs'] = {
+            product_id: {
+                **template_input, 'product_id': product_id, 'scene': scene
+            }
+            for product_id, scene in scenes.items()
+        }
+        jobset['jobs'] = [
+            {**template_job, 'product_id': 'product-a', 'job_id': 'ingest-1'},
+            {**template_job, 'product_id': 'product-a', 'job_id': 'ingest-2'},
+            {**template_job, 'product_id': 'product-b', 'job_id': 'ingest-2'}
+        ]
+        jobset['grq_delete_task'] = 'grq-node:1234'
+
+        result = split_jobset.lambda_handler(jobset, None)
+
+        jobsets = result['jobsets']
+        self.assertEqual(len(jobsets), 2)
+        self.assertEqual(
+            [list(jobset_['inputs']) for jobset_ in jobsets],
+            [['product-a', 'product-c'], ['product-b']]
+        )
+        self.assertEqual(
+            [[job['job_id'] for job in jobset_['jobs']]
+             for jobset_ in jobsets],
+            [['ingest-1', 'ingest-2'], ['ingest-2']]
+        )
+        for jobset_ in jobsets:
+            self.assertEqual(jobset_['grq_delete_task'], 'grq-node:1234')
@@ -1,15 +1,15 @@
 '''Tests the submit_evaluate module'''
+from copy import deepcopy
 import json
 import os
 from pathlib import Path
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
+from requests import RequestException
 
 with (
     patch('boto3.client'),
     patch('boto3.resource'),
-    patch('podaac.swodlr_common.utilities.BaseUtilities.get_latest_job_version'),  # noqa: E501
-    patch('otello.mozart.Mozart.get_job_type'),
     patch('podaac.swodlr_raster_create.utilities.utils.get_grq_es_client') as mock_es_client,  # pylint: disable=line-too-long # noqa: E501
     patch.dict(os.environ, {
         'SWODLR_ENV': 'dev',
@@ -17,6 +17,7 @@ with (
         'SWODLR_sds_password': 'sds_password',
         'SWODLR_sds_submit_max_attempts': '1',
         'SWODLR_sds_submit_timeout': '0',
+        'SWODLR_sds_submit_max_workers': '4',
         'SWODLR_sds_host': 'http://sds-host.test/',
         'SWODLR_sds_grq_es_path': '/grq_es',
         'SWODLR_sds_grq_es_index': 'grq'
@@ -24,6 +25,8 @@ with (
 ):
     from podaac.swodlr_raster_create import submit_evaluate
 
+    raster_eval_job_type = MagicMock()
+
 
 class TestSubmitEvaluate(TestCase):
     '''Tests for the submit_evaluate module'''
@@ -32,6 +35,21 @@ class TestSubmitEvaluate(TestCase):
     with success_jobset_path.open('r', encoding='utf-8') as f:
         success_jobset = json.load(f)
 
+    def setUp(self):
+        patcher = patch.object(
+            submit_evaluate.utils, 'get_worker_job_type',
+            return_value=raster_eval_job_type
+        )
+        self.mock_get_worker_job_type = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # No scene has been evaluated unless a test says otherwise
+        datasets_patcher = patch.object(
+            submit_evaluate.utils, 'get_datasets', return_value={}
+        )
+        self.mock_get_datasets = datasets_patcher.start()
+        self.addCleanup(datasets_patcher.stop)
+
     def test_successful_submit(self):
         '''
         Test to check that the submit_evaluate module will submit a job to the
@@ -41,21 +59,24 @@ class TestSubmitEvaluate(TestCase):
         # Setup mocks
         mock_es_client().search.return_value = {'hits': {'hits': [
             MagicMock()]}}
-        submit_evaluate.raster_eval_job_type.submit_job.return_value = \
+        raster_eval_job_type.submit_job.return_value = \
             MagicMock(job_id='72c4b5a0-f772-4311-b78d-d0d947b5db11')
 
         # Lambda call
         results = submit_evaluate.lambda_handler(self.success_jobset, None)
 
         # Assertion checks
-        mock_es_client().search.assert_called_once_with(
+        self.mock_get_datasets.assert_called_once_with([
+            'L2_HR_Raster_001_002_003-state-config'
+        ])
+        mock_es_client().search.assert_called_with(
             # pylint: disable=duplicate-code
             index='grq',
-            size=10,
             body={
+                'size': 1,
                 'query': {
                     'bool': {
-                        'must': [
+                        'filter': [
                             {'term': {'dataset_type.keyword': 'SDP'}},
                             {'term': {'dataset.keyword': 'L2_HR_PIXC'}},
                             {'term': {'metadata.CycleID': '001'}},
@@ -66,7 +87,7 @@ class TestSubmitEvaluate(TestCase):
                 }
             }
         )
-        submit_evaluate.raster_eval_job_type.submit_job.assert_called_once()  # pylint: disable=no-member # noqa: E501
+        raster_eval_job_type.submit_job.assert_called_once()
         # Results check
         self.assertDictEqual(results, {
             'jobs': [{
@@ -104,14 +125,17 @@ class TestSubmitEvaluate(TestCase):
         results = submit_evaluate.lambda_handler(self.success_jobset, None)
 
         # Assertion checks
-        mock_es_client().search.assert_called_once_with(
+        self.mock_get_datasets.assert_called_once_with([
+            'L2_HR_Raster_001_002_003-state-config'
+        ])
+        mock_es_client().search.assert_called_with(
             # pylint: disable=duplicate-code
             index='grq',
-            size=10,
             body={
+                'size': 1,
                 'query': {
                     'bool': {
-                        'must': [
+                        'filter': [
                             {'term': {'dataset_type.keyword': 'SDP'}},
                             {'term': {'dataset.keyword': 'L2_HR_PIXC'}},
                             {'term': {'metadata.CycleID': '001'}},
@@ -122,7 +146,7 @@ class TestSubmitEvaluate(TestCase):
                 }
             }
         )
-        submit_evaluate.raster_eval_job_type.submit_job.assert_not_called()  # pylint: disable=no-member # noqa: E501
+        raster_eval_job_type.submit_job.assert_not_called()
 
         # Results check
         self.assertDictEqual(results, {
@@ -147,7 +171,180 @@ class TestSubmitEvaluate(TestCase):
             }
         })
 
+    def test_concurrent_submit(self):
+        '''
+        Tests that inputs are processed concurrently, that a failing
+        submission only fails its own product and that jobs are output in the
+        order of the inputs
+        '''
+        template = self.success_jobset['inputs'][
+            '24168643-1002-45f5-a059-0b5266bc28f3'
+        ]
+        inputs = {
+            f'product-{i}': {**template, 'product_id': f'product-{i}',
+                             'scene': i + 1}
+            for i in range(6)
+        }
+
+        def search(index, body):  # pylint: disable=unused-argument
+            tile = body['query']['bool']['filter'][4]['terms'][
+                'metadata.TileID'][0]
+            return {'hits': {'hits': [{'_source': {'tile': tile}}]}}
+
+        def get_worker_job_type(job_name):
+            self.assertEqual(job_name, submit_evaluate.RASTER_EVAL_JOB_NAME)
+            job_type = MagicMock()
+
+            def submit_job(tag):  # pylint: disable=unused-argument
+                dataset = job_type.set_input_dataset.call_args.args[0]
+                if dataset['tile'] == '005':
+                    raise RuntimeError('SDS unavailable')
+                return MagicMock(job_id=f'job-{dataset["tile"]}')
+
+            job_type.submit_job.side_effect = submit_job
+            return job_type
+
+        mock_es_client().search.side_effect = search
+        self.mock_get_worker_job_type.side_effect = get_worker_job_type
+
+        results = submit_evaluate.lambda_handler(
+            {'jobs': [], 'inputs': inputs}, None
+        )
+
+        self.assertEqual(
+            [job['product_id'] for job in results['jobs']], list(inputs)
+        )
+
+        for i, job in enumerate(results['jobs']):
+            if i == 2:
+                self.assertEqual(job['job_status'], 'job-failed')
+                self.assertEqual(job['errors'], ['SDS failed to accept job'])
+            else:
+                self.assertEqual(job['job_status'], 'job-queued')
+                self.assertEqual(job['job_id'], f'job-{i * 2 + 1:03}')
+
+    def test_shared_scene_submit(self):
+        '''
+        Tests that products of the same scene share a single evaluate job
+        while products of other scenes get their own
+        '''
+        template = self.success_jobset['inputs'][
+            '24168643-1002-45f5-a059-0b5266bc28f3'
+        ]
+        inputs = {
+            'product-utm': {**template, 'product_id': 'product-utm'},
+            'product-geo': {
+                **template, 'product_id': 'product-geo',
+                'output_sampling_grid_type': 'GEO', 'raster_resolution': 3
+            },
+            'product-other': {
+                **template, 'product_id': 'product-other', 'scene': 4
+            }
+        }
+
+        mock_es_client().search.return_value = {'hits': {'hits': [
+            MagicMock()]}}
+        raster_eval_job_type.submit_job.side_effect = [
+            MagicMock(job_id='job-1'), MagicMock(job_id='job-2')
+        ]
+
+        results = submit_evaluate.lambda_handler(
+            {'jobs': [], 'inputs': inputs}, None
+        )
+
+        self.mock_get_datasets.assert_called_once()
+        self.assertEqual(mock_es_client().search.call_count, 2)
+        self.assertEqual(raster_eval_job_type.submit_job.call_count, 2)
+        self.assertEqual(
+            [job['product_id'] for job in results['jobs']], list(inputs)
+        )
+
+        job_ids = [job['job_id'] for job in results['jobs']]
+        self.assertEqual(job_ids[0], job_ids[1])
+        self.assertNotEqual(job_ids[0], job_ids[2])
+        for job in results['jobs']:
+            self.assertEqual(job['job_status'], 'job-queued')
+            self.assertEqual(job['stage'], 'submit_evaluate')
+
+    def test_existing_state_config(self):
+        '''
+        Tests that scenes which already have a state config skip evaluation
+        with their products marked as completed, unless a product forces the
+        scene to be evaluated again
+        '''
+        template = self.success_jobset['inputs'][
+            '24168643-1002-45f5-a059-0b5266bc28f3'
+        ]
+        inputs = {
+            'product-evaluated': {
+                **template, 'product_id': 'product-evaluated'
+            },
+            'product-new': {
+                **template, 'product_id': 'product-new', 'scene': 4
+            }
+        }
+
+        self.mock_get_datasets.return_value = {
+            'L2_HR_Raster_001_002_003-state-config': {
+                'id': 'L2_HR_Raster_001_002_003-state-config'
+            }
+        }
+        mock_es_client().search.return_value = {'hits': {'hits': [
+            MagicMock()]}}
+        raster_eval_job_type.submit_job.return_value = MagicMock(job_id='job')
+
+        results = submit_evaluate.lambda_handler(
+            {'jobs': [], 'inputs': deepcopy(inputs)}, None
+        )
+
+        self.assertEqual(results['jobs'], [
+            {
+                'stage': 'submit_evaluate',
+                'product_id': 'product-evaluated',
+                'job_status': 'job-completed'
+            },
+            {
+                'stage': 'submit_evaluate',
+                'product_id': 'product-new',
+                'job_id': 'job',
+                'job_status': 'job-queued'
+            }
+        ])
+        raster_eval_job_type.submit_job.assert_called_once()
+
+        # Forcing evaluation skips the lookup entirely
+        self.mock_get_datasets.reset_mock()
+        mock_es_client().search.reset_mock()
+        raster_eval_job_type.submit_job.reset_mock()
+        for input_ in inputs.values():
+            input_['force_reevaluate'] = True
+
+        results = submit_evaluate.lambda_handler(
+            {'jobs': [], 'inputs': inputs}, None
+        )
+
+        self.mock_get_datasets.assert_not_called()
+        self.assertEqual(mock_es_client().search.call_count, 2)
+        self.assertEqual(raster_eval_job_type.submit_job.call_count, 2)
+        for job in results['jobs']:
+            self.assertEqual(job['job_status'], 'job-queued')
+
+    def test_failed_state_config_lookup(self):
+        '''
+        Tests that every scene is evaluated when the state config lookup fails
+        '''
+        self.mock_get_datasets.side_effect = RequestException()
+        mock_es_client().search.return_value = {'hits': {'hits': [
+            MagicMock()]}}
+        raster_eval_job_type.submit_job.return_value = MagicMock(job_id='job')
+
+        results = submit_evaluate.lambda_handler(self.success_jobset, None)
+
+        raster_eval_job_type.submit_job.assert_called_once()
+        self.assertEqual(results['jobs'][0]['job_status'], 'job-queued')
+
     def tearDown(self):
         # pylint: disable-next=no-member
-        submit_evaluate.raster_eval_job_type.reset_mock()
+        raster_eval_job_type.reset_mock(return_value=True, side_effect=True)
         mock_es_client.reset_mock()
+        mock_es_client().search.side_effect = None
@@ -4,15 +4,15 @@ import json
 from os import environ
 from pathlib import Path
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from uuid import uuid4
 
+from requests import RequestException
+
 # pylint: disable=duplicate-code
 with (
     patch('boto3.client'),
     patch('boto3.resource'),
-    patch('podaac.swodlr_common.utilities.BaseUtilities.get_latest_job_version'),  # noqa: E501
-    patch('otello.mozart.Mozart.get_job_type'),
     # pylint: disable=duplicate-code
     patch.dict(environ, {
         'SWODLR_ENV': 'dev',
@@ -20,13 +20,15 @@ with (
         'SWODLR_sds_password': 'sds_password',
         'SWODLR_sds_host': 'http://sds-host.test/',
         'SWODLR_sds_submit_max_attempts': '1',
-        'SWODLR_sds_submit_timeout': '0'
+        'SWODLR_sds_submit_timeout': '0',
+        'SWODLR_sds_submit_max_workers': '4'
     })
 ):
     from podaac.swodlr_raster_create import submit_raster
 
     MockJob = namedtuple('MockJob', ['job_id', 'status'])
-    submit_raster.raster_job_type.submit_job.side_effect = \
+    raster_job_type = MagicMock()
+    raster_job_type.submit_job.side_effect = \
         lambda tag: MockJob(
             job_id=str(uuid4()),
             status='job-queued'
@@ -43,6 +45,14 @@ class TestSubmitRaster(TestCase):
     with success_jobset_path.open('r', encoding='utf-8') as f:
         success_jobset = json.load(f)
 
+    def setUp(self):
+        patcher = patch.object(
+            submit_raster.utils, 'get_worker_job_type',
+            return_value=raster_job_type
+        )
+        self.mock_get_worker_job_type = patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_failed_submit(self):
         '''
         Test that the module passes through failed jobs in a jobset unchanged
@@ -62,12 +72,12 @@ class TestSubmitRaster(TestCase):
         dummy_dataset_id = 'L2_HR_Raster_001_002_003-state-config'
         dummy_dataset = {'id': dummy_dataset_id}
 
-        def search_dataset_mock(name, _wildcard):
+        def get_datasets_mock(dataset_ids):
             self.assertEqual(
-                name, dummy_dataset_id,
-                'Wrong dataset name passed in'
+                list(dataset_ids), [dummy_dataset_id],
+                'Wrong dataset names passed in'
             )
-            return dummy_dataset
+            return {dummy_dataset_id: dummy_dataset}
 
         with (
             patch.dict(environ, {
@@ -76,12 +86,14 @@ class TestSubmitRaster(TestCase):
                 'SWODLR_sds_grq_es_index': 'grq'
             }),
             patch(
-                'podaac.swodlr_raster_create.utilities.Utilities.search_datasets'  # noqa: E501
-            ) as search_ds_mock
+                'podaac.swodlr_raster_create.utilities.Utilities.get_datasets'
+            ) as get_datasets_mock_
         ):
-            search_ds_mock.side_effect = search_dataset_mock
+            get_datasets_mock_.side_effect = get_datasets_mock
             results = submit_raster.lambda_handler(self.success_jobset, None)
 
+        get_datasets_mock_.assert_called_once()
+
         input_job = self.success_jobset['jobs'][0]
         self.assertEqual(len(results['jobs']), 1)
 
@@ -96,10 +108,10 @@ class TestSubmitRaster(TestCase):
 
         # Check Otello calls performed
         # pylint: disable=no-member
-        submit_raster.raster_job_type.submit_job.assert_called_once()
-        input_dataset_call = submit_raster.raster_job_type.set_input_dataset \
+        raster_job_type.submit_job.assert_called_once()
+        input_dataset_call = raster_job_type.set_input_dataset \
             .call_args_list[0]
-        input_params_call = submit_raster.raster_job_type.set_input_params \
+        input_params_call = raster_job_type.set_input_params \
             .call_args_list[0]
         # pylint: enable=no-member
 
@@ -110,9 +122,85 @@ class TestSubmitRaster(TestCase):
         self.assertEqual(input_params['output_sampling_grid_type'], 'utm')
         self.assertEqual(input_params['output_granule_extent_flag'], 1)
 
+    def test_mixed_submit(self):
+        '''
+        Tests that failed evaluate jobs pass through unchanged alongside the
+        submitted raster jobs and that jobs are output in the order of the
+        input jobs
+        '''
+        template = self.success_jobset['inputs'][
+            self.success_jobset['jobs'][0]['product_id']
+        ]
+        inputs = {
+            f'product-{i}': {**template, 'product_id': f'product-{i}',
+                             'scene': i + 1}
+            for i in range(6)
+        }
+        jobs = [
+            {'product_id': product_id, 'stage': 'submit_evaluate',
+             'job_id': f'eval-{product_id}',
+             'job_status': 'job-failed' if i in (1, 4) else 'job-completed'}
+            for i, product_id in enumerate(inputs)
+        ]
+
+        with patch(
+            'podaac.swodlr_raster_create.utilities.Utilities.get_datasets',
+            side_effect=lambda ids: {id_: {'id': id_} for id_ in ids}
+        ):
+            results = submit_raster.lambda_handler(
+                {'jobs': jobs, 'inputs': inputs}, None
+            )
+
+        self.assertEqual(
+            [job['product_id'] for job in results['jobs']], list(inputs)
+        )
+        # pylint: disable-next=no-member
+        self.assertEqual(raster_job_type.submit_job.call_count, 4)
+
+        for i, job in enumerate(results['jobs']):
+            if i in (1, 4):
+                self.assertEqual(job, jobs[i])
+            else:
+                self.assertEqual(job['stage'], 'submit_raster')
+                self.assertEqual(job['job_status'], 'job-queued')
+
+    def test_missing_state_config(self):
+        '''
+        Tests that a job whose state config isn't found fails without a raster
+        job being submitted
+        '''
+        with patch(
+            'podaac.swodlr_raster_create.utilities.Utilities.get_datasets',
+            return_value={}
+        ):
+            results = submit_raster.lambda_handler(self.success_jobset, None)
+
+        job = results['jobs'][0]
+        self.assertEqual(job['job_status'], 'job-failed')
+        self.assertEqual(
+            job['errors'],
+            ['Unable to find state config from submit_evaluate stage']
+        )
+        raster_job_type.submit_job.assert_not_called()  # noqa: E501 # pylint: disable=no-member
+
+    def test_failed_state_config_lookup(self):
+        '''
+        Tests that every job fails when the state config lookup fails
+        '''
+        with patch(
+            'podaac.swodlr_raster_create.utilities.Utilities.get_datasets',
+            side_effect=RequestException()
+        ):
+            results = submit_raster.lambda_handler(self.success_jobset, None)
+
+        job = results['jobs'][0]
+        self.assertEqual(job['job_status'], 'job-failed')
+        self.assertEqual(job['errors'], ['ES request failed'])
+        raster_job_type.submit_job.assert_not_called()  # noqa: E501 # pylint: disable=no-member
+
     def tearDown(self):
         # pylint: disable=no-member
-        submit_raster.raster_job_type.set_input_dataset.reset_mock()
-        submit_raster.raster_job_type.set_input_params.reset_mock()
-        submit_raster.raster_job_type.submit_job.reset_mock()
+        raster_job_type.set_input_dataset.reset_mock()
+        raster_job_type.set_input_params.reset_mock()
+        raster_job_type.submit_job.reset_mock()
         # pylint: enable=no-member
@@ -0,0 +1,432 @@
+'''Tests for the utilities module'''
+from contextlib import contextmanager
+from copy import deepcopy
+from importlib.util import module_from_spec, spec_from_file_location
+import json
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest import TestCase
+from unittest.mock import Mock, PropertyMock, patch
+import fastjsonschema
+from requests import RequestException
+
+with (
+    patch('boto3.client'),
+    patch('boto3.resource'),
+    patch.dict(os.environ, {
+        'SWODLR_ENV': 'dev'
+    })
+):
+    from podaac.swodlr_raster_create.cache import FileCache
+    from podaac.swodlr_raster_create.compile_validators import \
+        compile_validators
+    from podaac.swodlr_raster_create.utilities import Utilities
+
+
+class FakeJobType:  # pylint: disable=too-few-public-methods
+    '''Stand-in for an otello job type'''
+
+    def __init__(self, name, session):
+        self.name = name
+        self.session = session
+        self.initialized = False
+        self.hysds_io = None
+
+    def initialize(self):
+        '''Fetches the job type's spec'''
+        self.initialized = True
+        self.hysds_io = {'params': [{'name': 'input', 'from': 'submitter'}]}
+
+
+class TestUtilities(TestCase):
+    '''Tests for the Utilities class'''
+    data_path = Path(__file__).parent.joinpath('data')
+    schemas_path = Path(__file__).parent.joinpath(
+        '..', 'podaac', 'swodlr_raster_create', 'schemas'
+    )
+
+    def setUp(self):
+        tmp_dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(tmp_dir.cleanup)
+
+        patchers = [
+            patch.dict(os.environ, {'SWODLR_ENV': 'dev'}),
+            patch.object(FileCache, 'DIRECTORY', Path(tmp_dir.name)),
+            patch.object(
+                Utilities, 'get_latest_job_version',
+                side_effect=lambda name: f'{name}:1.0'
+            )
+        ]
+
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = patch.object(
+            Utilities, 'mozart_client', new_callable=PropertyMock
+        )
+        self.mock_mozart_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _gen_utils(self):
+        utils = Utilities()
+        mozart_client = Mock()
+        mozart_client.get_job_type.side_effect = lambda name: FakeJobType(
+            name, utils._get_sds_session()  # pylint: disable=protected-access
+        )
+        self.mock_mozart_client.return_value = mozart_client
+        return utils, mozart_client
+
+    def test_get_job_type(self):
+        '''
+        Tests that a job type is resolved and initialized once and then served
+        from memory
+        '''
+        utils, mozart_client = self._gen_utils()
+
+        job_type = utils.get_job_type('job-TEST')
+        self.assertTrue(job_type.initialized)
+        self.assertIs(utils.get_job_type('job-TEST'), job_type)
+        mozart_client.get_job_type.assert_called_once()
+
+    def test_get_job_type_file_cache(self):
+        '''
+        Tests that a fresh process rebuilds an initialized job type from the
+        spec cached in /tmp without initializing it against Mozart, using its
+        own SDS session
+        '''
+        utils, _ = self._gen_utils()
+        utils.get_job_type('job-TEST')
+
+        utils, mozart_client = self._gen_utils()
+        with patch.object(FakeJobType, 'initialize') as mock_initialize:
+            job_type = utils.get_job_type('job-TEST')
+
+        mock_initialize.assert_not_called()
+        mozart_client.get_job_type.assert_called_once_with('job-TEST:1.0')
+        self.assertEqual(job_type.name, 'job-TEST:1.0')
+        self.assertTrue(job_type.initialized)
+        self.assertEqual(job_type.hysds_io, {
+            'params': [{'name': 'input', 'from': 'submitter'}]
+        })
+        # pylint: disable-next=protected-access
+        self.assertIs(job_type.session, utils._get_sds_session())
+
+        cached = json.loads(FileCache('job_types', 60).get('job-TEST'))
+        self.assertNotIn('session', cached['spec'])
+
+    def test_get_job_type_stale_file_cache(self):
+        '''
+        Tests that a spec cached by another version of otello is ignored and
+        the job type initialized afresh
+        '''
+        FileCache('job_types', 60).set('job-TEST', json.dumps({
+            'version': 'job-TEST:1.0',
+            'spec': {'removed_attribute': True}
+        }).encode('utf-8'))
+
+        utils, _ = self._gen_utils()
+        job_type = utils.get_job_type('job-TEST')
+
+        self.assertTrue(job_type.initialized)
+        self.assertFalse(hasattr(job_type, 'removed_attribute'))
+
+    def test_copy_job_type(self):
+        '''
+        Tests that copies of a job type are independent but share the session
+        '''
+        utils, _ = self._gen_utils()
+        job_type = utils.get_job_type('job-TEST')
+        copy = utils.copy_job_type(job_type)
+
+        self.assertIsNot(copy, job_type)
+        self.assertIs(copy.session, job_type.session)
+
+    def test_get_worker_job_type(self):
+        '''
+        Tests that each thread reuses its own copy of a job type and that
+        copies are remade once the cached job type is refreshed
+        '''
+        utils, _ = self._gen_utils()
+        job_type = utils.get_job_type('job-TEST')
+
+        copy = utils.get_worker_job_type('job-TEST')
+        self.assertIsNot(copy, job_type)
+        self.assertIs(utils.get_worker_job_type('job-TEST'), copy)
+
+        thread_copies = []
+        thread = Thread(target=lambda: thread_copies.append(
+            utils.get_worker_job_type('job-TEST')
+        ))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(thread_copies[0], copy)
+        self.assertIs(thread_copies[0].session, job_type.session)
+
+        with patch.object(
+            utils, 'get_job_type', return_value=FakeJobType('job-TEST', None)
+        ):
+            self.assertIsNot(utils.get_worker_job_type('job-TEST'), copy)
+
+    def test_get_datasets(self):
+        '''
+        Tests that datasets are retrieved by id with a single terms query
+        '''
+        utils = Utilities()
+        session = Mock()
+        session.get.return_value.json.return_value = {'hits': {'hits': [
+            {'_source': {'id': 'dataset-1'}},
+            {'_source': {'id': 'dataset-2'}}
+        ]}}
+
+        with (
+            patch.dict(os.environ, {
+                'SWODLR_sds_host': 'http://sds.test/',
+                'SWODLR_sds_grq_es_path': '/grq_es',
+                'SWODLR_sds_grq_es_index': 'grq'
+            }),
+            patch.object(utils, '_get_sds_session', return_value=session)
+        ):
+            datasets = utils.get_datasets(
+                ['dataset-2', 'dataset-1', 'dataset-3', 'dataset-1']
+            )
+
+        self.assertEqual(datasets, {
+            'dataset-1': {'id': 'dataset-1'},
+            'dataset-2': {'id': 'dataset-2'}
+        })
+        session.get.assert_called_once()
+        self.assertEqual(
+            session.get.call_args.args[0], 'http://sds.test/grq_es/grq/_search'
+        )
+        self.assertEqual(
+            session.get.call_args.kwargs['json']['query']['bool']['filter'],
+            [{'terms': {
+                'id.keyword': ['dataset-1', 'dataset-2', 'dataset-3']
+            }}]
+        )
+        # Copies of a dataset in other indices can't crowd out other ids
+        self.assertEqual(
+            session.get.call_args.kwargs['json']['collapse'],
+            {'field': 'id.keyword'}
+        )
+
+    def test_get_datasets_error(self):
+        '''
+        Tests that an error response from GRQ raises a RequestException
+        rather than a KeyError
+        '''
+        utils = Utilities()
+        session = Mock()
+        session.get.return_value.json.return_value = {
+            'error': {'type': 'search_phase_execution_exception'}
+        }
+
+        with (
+            patch.dict(os.environ, {
+                'SWODLR_sds_host': 'http://sds.test/',
+                'SWODLR_sds_grq_es_path': '/grq_es',
+                'SWODLR_sds_grq_es_index': 'grq'
+            }),
+            patch.object(utils, '_get_sds_session', return_value=session),
+            self.assertRaisesRegex(
+                RequestException, 'search_phase_execution_exception'
+            )
+        ):
+            utils.get_datasets(['dataset-1'])
+
+        session.get.return_value.raise_for_status.assert_called_once()
+
+    def test_get_job_infos(self):
+        '''
+        Tests that job infos are retrieved from Mozart's job status index by
+        id with a single request
+        '''
+        utils = Utilities()
+        session = Mock()
+        session.get.return_value.json.return_value = {'hits': {'hits': [
+            {'_id': 'job-1', '_source': {'status': 'job-started'}}
+        ]}}
+
+        with (
+            patch.dict(os.environ, {
+                'SWODLR_sds_host': 'http://sds.test/',
+                'SWODLR_sds_mozart_es_path': '/mozart_es',
+                'SWODLR_sds_mozart_es_index': 'job_status-current'
+            }),
+            patch.object(utils, '_get_sds_session', return_value=session)
+        ):
+            job_infos = utils.get_job_infos(['job-2', 'job-1'])
+
+        self.assertEqual(job_infos, {'job-1': {'status': 'job-started'}})
+        session.get.assert_called_once_with(
+            'http://sds.test/mozart_es/job_status-current/_search',
+            json={'size': 2, 'query': {'ids': {'values': ['job-1', 'job-2']}}}
+        )
+
+    def test_get_job_infos_error(self):
+        '''
+        Tests that an error response from Mozart raises a RequestException
+        carrying the error rather than a KeyError
+        '''
+        utils = Utilities()
+        session = Mock()
+        session.get.return_value.json.return_value = {
+            'error': {'type': 'index_not_found_exception'}
+        }
+
+        with (
+            patch.dict(os.environ, {
+                'SWODLR_sds_host': 'http://sds.test/',
+                'SWODLR_sds_mozart_es_path': '/mozart_es',
+                'SWODLR_sds_mozart_es_index': 'job_status-current'
+            }),
+            patch.object(utils, '_get_sds_session', return_value=session),
+            self.assertRaisesRegex(
+                RequestException, 'index_not_found_exception'
+            )
+        ):
+            utils.get_job_infos(['job-1'])
+
+        session.get.return_value.raise_for_status.assert_called_once()
+
+    def test_get_param(self):
+        '''
+        Tests that every parameter under the service's path is prefetched in
+        one paginated sweep rather than fetched individually, and that
+        parameters missing from the path raise
+        '''
+        with self._patch_aws() as (ssm, _):
+            utils = Utilities()
+            self.assertEqual(utils.get_param('sds_host'), 'http://sds.test/')
+            self.assertEqual(utils.get_param('sds_username'), 'username')
+            with self.assertRaises(KeyError):
+                utils.get_param('missing')
+
+        ssm.get_paginator.assert_called_once_with('get_parameters_by_path')
+        ssm.get_paginator().paginate.assert_called_once_with(
+            Path='/service/swodlr/raster-create/', WithDecryption=True
+        )
+
+    def test_get_param_file_cache(self):
+        '''
+        Tests that a fresh process loads encrypted parameters from /tmp
+        without consulting SSM
+        '''
+        with self._patch_aws() as (ssm, kms):
+            Utilities().get_param('sds_host')
+            ssm.reset_mock()
+
+            self.assertEqual(
+                Utilities().get_param('sds_username'), 'username'
+            )
+
+        ssm.get_paginator.assert_not_called()
+        self.assertEqual(
+            kms.encrypt.call_args.kwargs['EncryptionContext'],
+            {'path': '/service/swodlr/raster-create/'}
+        )
+        kms.decrypt.assert_called_once()
+
+        cached = next(FileCache.DIRECTORY.joinpath('params').iterdir())
+        self.assertNotIn(b'username', cached.read_bytes())
+
+    @contextmanager
+    def _patch_aws(self):
+        ssm = Mock()
+        ssm.get_paginator().paginate.return_value = [
+            {'Parameters': [{
+                'Name': '/service/swodlr/raster-create/sds_host',
+                'Value': 'http://sds.test/'
+            }]},
+            {'Parameters': [{
+                'Name': '/service/swodlr/raster-create/sds_username',
+                'Value': 'username'
+            }]}
+        ]
+        ssm.get_paginator.reset_mock()
+
+        # Stand-in for KMS which reverses the plaintext
+        kms = Mock()
+        kms.encrypt.side_effect = lambda Plaintext, **_: {
+            'CiphertextBlob': Plaintext[::-1]
+        }
+        kms.decrypt.side_effect = lambda CiphertextBlob, **_: {
+            'Plaintext': CiphertextBlob[::-1]
+        }
+
+        clients = {'ssm': ssm, 'kms': kms}
+        with (
+            patch.dict(os.environ, {
+                'SWODLR_ENV': 'prod',
+                'SWODLR_PARAM_CACHE_KEY_ID': 'test-key-id'
+            }),
+            patch(
+                'podaac.swodlr_raster_create.utilities.boto3.client',
+                side_effect=lambda name, *_args, **_kwargs: clients[name]
+            )
+        ):
+            yield ssm, kms
+
+    def test_load_json_schema_generated(self):
+        '''
+        Tests that a generated validator module is preferred over compiling
+        the schema at runtime
+        '''
+        utils, _ = self._gen_utils()
+        validators = Mock()
+
+        with patch(
+            'podaac.swodlr_raster_create.utilities.import_module',
+            return_value=validators
+        ) as mock_import_module:
+            validate = utils.load_json_schema('input')
+
+        mock_import_module.assert_called_once_with(
+            'podaac.swodlr_raster_create.validators.input'
+        )
+        self.assertIs(validate, validators.validate)
+
+    def test_compile_validators(self):
+        '''
+        Tests that generated validators behave identically to validators
+        compiled at runtime, including defaults and error messages
+        '''
+        with TemporaryDirectory() as tmp_dir:
+            output_path = Path(tmp_dir, 'validators')
+            self.assertIn('input', compile_validators(output_path))
+
+            spec = spec_from_file_location(
+                'input', output_path.joinpath('input.py')
+            )
+            generated = module_from_spec(spec)
+            spec.loader.exec_module(generated)
+
+        with self.schemas_path.joinpath('input.json') \
+                .open('r', encoding='utf-8') as f:
+            compiled = fastjsonschema.compile(json.load(f))
+
+        inputs = []
+        for name in ('valid_sqs.json', 'invalid_sqs.json'):
+            with self.data_path.joinpath(name).open('r', encoding='utf-8') \
+                    as f:
+                inputs.extend(
+                    json.loads(record['body'])
+                    for record in json.load(f)['Records']
+                )
+
+        for data in inputs:
+            self.assertEqual(
+                self._validate(generated.validate, deepcopy(data)),
+                self._validate(compiled, deepcopy(data))
+            )
+
+    @staticmethod
+    def _validate(validate, data):
+        try:
+            return validate(data)
+        except fastjsonschema.JsonSchemaValueException as ex:
+            return ex.message
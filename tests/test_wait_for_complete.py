@@ -1,10 +1,27 @@
 '''Tests for the wait_for_complete module'''
 from copy import deepcopy
+from datetime import datetime, timezone
 import json
+from os import environ
 from pathlib import Path
 from unittest import TestCase
-from unittest.mock import patch
-from podaac.swodlr_raster_create import wait_for_complete
+from unittest.mock import MagicMock, patch
+
+with (
+    patch('podaac.swodlr_raster_create.utilities.utils.get_grq_es_client') as mock_es_client,  # pylint: disable=line-too-long # noqa: E501
+    patch.dict(environ, {
+        'SWODLR_ENV': 'dev',
+        'SWODLR_wait_min_seconds': '5',
+        'SWODLR_wait_max_seconds': '600',
+        'SWODLR_wait_stage_durations': json.dumps({
+            'preflight': {'queued': 10, 'runtime': 60},
+            'submit_evaluate': {'queued': 10, 'runtime': 120},
+            'submit_raster': {'queued': 30, 'runtime': 900}
+        }),
+        'SWODLR_long_poll_max_seconds': '0'
+    })
+):
+    from podaac.swodlr_raster_create import wait_for_complete
 
 
 class TestWaitForComplete(TestCase):
@@ -14,6 +31,14 @@ class TestWaitForComplete(TestCase):
     with waiting_jobset_path.open('r', encoding='utf-8') as f:
         waiting_jobset = json.load(f)
 
+    def setUp(self):
+        # Jobs are missing from the bulk lookup unless a test says otherwise
+        patcher = patch.object(
+            wait_for_complete.utils, 'get_job_infos', return_value={}
+        )
+        self.mock_get_job_infos = patcher.start()
+        self.addCleanup(patcher.stop)
+
     def test_skip(self):
         '''
         Tests that the module will update the job status via the SDS and set
@@ -76,3 +101,298 @@ class TestWaitForComplete(TestCase):
         self.assertEqual(result_job['job_status'], test_status)
         self.assertEqual(result_job['traceback'], test_traceback)
         self.assertEqual(result_job['errors'], ['SDS threw an error. Please contact support'])  # pylint: disable=line-too-long # noqa: E501
+
+    def test_shared_job(self):
+        '''
+        Tests that a job shared between products is only polled once with
+        its status applied to every product
+        '''
+        jobset = deepcopy(self.waiting_jobset)
+        job = jobset['jobs'][0]
+        jobset['jobs'].append({**job, 'product_id': 'shared-product'})
+        jobset['inputs']['shared-product'] = {
+            **jobset['inputs'][job['product_id']],
+            'product_id': 'shared-product'
+        }
+
+        with (
+            patch('otello.mozart.Mozart.get_job_by_id') as mock
+        ):
+            mock().get_info.return_value = {'status': 'job-started'}
+            result = wait_for_complete.lambda_handler(jobset, None)
+
+        mock().get_info.assert_called_once()
+        self.assertEqual(
+            [job['job_status'] for job in result['jobs']],
+            ['job-started', 'job-started']
+        )
+        self.assertTrue(result['waiting'])
+
+    def test_shared_job_durations(self):
+        '''
+        Tests that a finished job shared between products only refines its
+        stage's durations once
+        '''
+        jobset = deepcopy(self.waiting_jobset)
+        job = {**jobset['jobs'][0], 'stage': 'submit_raster'}
+        jobset['jobs'] = [
+            {**job, 'product_id': f'product-{i}'} for i in range(3)
+        ]
+        jobset['inputs'] = {
+            f'product-{i}': {
+                **jobset['inputs'][job['product_id']],
+                'product_id': f'product-{i}'
+            }
+            for i in range(3)
+        }
+        self.mock_get_job_infos.return_value = {job['job_id']: {
+            'status': 'job-completed', 'tags': [], 'job': {'job_info': {
+                'time_queued': '2024-01-01T00:00:00.000000Z',
+                'time_start': '2024-01-01T00:01:00.000000Z',
+                'time_end': '2024-01-01T00:06:00.000000Z'
+            }}
+        }}
+        durations = {'submit_raster': {'queued': 60, 'runtime': 900}}
+
+        with patch.dict(wait_for_complete.stage_durations, durations):
+            wait_for_complete.lambda_handler(jobset, None)
+            history = wait_for_complete.stage_durations['submit_raster']
+
+        self.assertEqual(history, {'queued': 60, 'runtime': 780})
+
+    def test_bulk_job_infos(self):
+        '''
+        Tests that every waiting job is looked up with one bulk request and
+        that only jobs missing from its result are polled individually
+        '''
+        jobset = deepcopy(self.waiting_jobset)
+        job = jobset['jobs'][0]
+        jobset['jobs'].append({
+            **job, 'product_id': 'other-product', 'job_id': 'other-job'
+        })
+        jobset['jobs'].append({
+            **job, 'product_id': 'done-product', 'job_id': 'done-job',
+            'job_status': 'job-completed'
+        })
+        for product_id in ('other-product', 'done-product'):
+            jobset['inputs'][product_id] = {
+                **jobset['inputs'][job['product_id']],
+                'product_id': product_id
+            }
+
+        self.mock_get_job_infos.return_value = {
+            job['job_id']: {
+                'status': 'job-completed',
+                'tags': [],
+                'job': {'job_info': {'time_queued': 1}}
+            }
+        }
+
+        with (
+            patch('otello.mozart.Mozart.get_job_by_id') as mock
+        ):
+            mock().get_info.return_value = {'status': 'job-started'}
+            mock.reset_mock()
+            result = wait_for_complete.lambda_handler(jobset, None)
+
+        self.mock_get_job_infos.assert_called_once_with(
+            {job['job_id'], 'other-job'}
+        )
+        mock.assert_called_once_with('other-job')
+        self.assertEqual(
+            [job['job_status'] for job in result['jobs']],
+            ['job-completed', 'job-started', 'job-completed']
+        )
+        self.assertTrue(result['waiting'])
+
+    def test_wait_seconds(self):
+        '''
+        Tests that the recommended wait is the time until the earliest job is
+        expected to finish, that overdue jobs are checked back on sooner and
+        that finished jobs refine the stage's durations
+        '''
+        jobset = deepcopy(self.waiting_jobset)
+        job = jobset['jobs'][0]
+        jobset['jobs'] = [
+            {**job, 'product_id': f'product-{i}', 'job_id': f'job-{i}',
+             'stage': 'submit_raster'}
+            for i in range(3)
+        ]
+        jobset['inputs'] = {
+            f'product-{i}': {
+                **jobset['inputs'][job['product_id']],
+                'product_id': f'product-{i}'
+            }
+            for i in range(3)
+        }
+
+        def job_info(status, **times):
+            return {'status': status, 'tags': [], 'job': {'job_info': times}}
+
+        self.mock_get_job_infos.return_value = {
+            'job-0': job_info(
+                'job-started', time_queued='2024-01-01T00:00:00.000000Z',
+                time_start='2024-01-01T00:01:00.000000Z'
+            ),
+            'job-1': job_info(
+                'job-queued', time_queued='2024-01-01T00:09:00.000000Z'
+            ),
+            'job-2': job_info(
+                'job-completed', time_queued='2024-01-01T00:00:00.000000Z',
+                time_start='2024-01-01T00:01:00.000000Z',
+                time_end='2024-01-01T00:06:00.000000Z'
+            )
+        }
+        now = datetime(2024, 1, 1, 0, 10, tzinfo=timezone.utc).timestamp()
+        durations = {'submit_raster': {'queued': 60, 'runtime': 900}}
+
+        with (
+            patch.object(wait_for_complete, '_now', return_value=now),
+            patch.dict(wait_for_complete.stage_durations, durations)
+        ):
+            result = wait_for_complete.lambda_handler(jobset, None)
+            history = wait_for_complete.stage_durations['submit_raster']
+
+        # job-0 has run for 540s of 900s; job-1 has queued for 60s of 960s
+        self.assertTrue(result['waiting'])
+        self.assertEqual(result['wait_seconds'], 360)
+        self.assertEqual(history, {'queued': 60, 'runtime': 780})
+
+        self.mock_get_job_infos.return_value['job-0'] = job_info(
+            'job-started', time_start='2023-12-31T23:54:00.000000Z'
+        )
+        with (
+            patch.object(wait_for_complete, '_now', return_value=now),
+            patch.dict(wait_for_complete.stage_durations, durations)
+        ):
+            result = wait_for_complete.lambda_handler(result, None)
+
+        # job-0 is overdue by 1 minute
+        self.assertEqual(result['wait_seconds'], 90)
+
+    def test_job_times(self):
+        '''
+        Tests that the SDS's times are parsed regardless of their precision
+        and that times which can't be parsed fall back to the default wait
+        rather than failing the poll
+        '''
+        jobset = deepcopy(self.waiting_jobset)
+        job_id = jobset['jobs'][0]['job_id']
+        now = datetime(2024, 1, 1, 0, 10, tzinfo=timezone.utc).timestamp()
+        durations = {jobset['jobs'][0]['stage']: {
+            'queued': 60, 'runtime': 900
+        }}
+
+        for time_start, wait_seconds in (
+            ('2024-01-01T00:05:00.12Z', 600),
+            ('2024-01-01T00:05:00.1234567Z', 600),
+            ('2024-01-01T00:05:00Z', 600),
+            ('lorem ipsum', wait_for_complete.DEFAULT_WAIT_SECONDS),
+            (1704067500, wait_for_complete.DEFAULT_WAIT_SECONDS)
+        ):
+            self.mock_get_job_infos.return_value = {job_id: {
+                'status': 'job-started', 'tags': [],
+                'job': {'job_info': {'time_start': time_start}}
+            }}
+
+            with (
+                patch.object(wait_for_complete, '_now', return_value=now),
+                patch.dict(wait_for_complete.stage_durations, durations)
+            ):
+                result = wait_for_complete.lambda_handler(
+                    deepcopy(jobset), None
+                )
+
+            self.assertTrue(result['waiting'])
+            self.assertEqual(result['wait_seconds'], wait_seconds)
+
+    def _long_poll(self, jobset, remaining_millis, statuses):
+        # Runs the handler with long polling enabled on a fake clock, with
+        # each poll of the job returning the next status; returns the result
+        # and the seconds slept
+        clock = [0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(seconds)
+            clock[0] += seconds
+
+        statuses = iter(statuses)
+        self.mock_get_job_infos.side_effect = lambda job_ids: {
+            job_id: {
+                'status': next(statuses), 'tags': [], 'job': {'job_info': {}}
+            }
+            for job_id in job_ids
+        }
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = remaining_millis
+
+        with (
+            patch.object(wait_for_complete, 'LONG_POLL_MAX_SECONDS', 60),
+            patch.object(wait_for_complete, 'sleep', side_effect=sleep),
+            patch.object(
+                wait_for_complete, 'monotonic', side_effect=lambda: clock[0]
+            )
+        ):
+            result = wait_for_complete.lambda_handler(jobset, context)
+
+        return result, slept
+
+    def test_long_poll(self):
+        '''
+        Tests that long polling re-polls the waiting jobs with exponential
+        backoff and returns as soon as they've finished
+        '''
+        result, slept = self._long_poll(
+            deepcopy(self.waiting_jobset), 30000,
+            ['job-queued', 'job-started', 'job-started', 'job-failed']
+        )
+
+        self.assertEqual(slept, [1, 2, 4])
+        self.assertEqual(self.mock_get_job_infos.call_count, 4)
+        self.assertEqual(result['jobs'][0]['job_status'], 'job-failed')
+        self.assertNotIn('waiting', result)
+
+    def test_long_poll_deadline(self):
+        '''
+        Tests that long polling returns the jobset as waiting ahead of the
+        lambda's timeout
+        '''
+        result, slept = self._long_poll(
+            deepcopy(self.waiting_jobset), 12000,
+            ['job-started'] * 10
+        )
+
+        # 12s remaining less the 5s margin
+        self.assertEqual(slept, [1, 2, 4])
+        self.assertEqual(sum(slept), 7)
+        self.assertEqual(result['jobs'][0]['job_status'], 'job-started')
+        self.assertTrue(result['waiting'])
+
+    def test_delete_task(self):
+        '''
+        Tests that the module keeps the jobset waiting while the GRQ delete
+        task started by preflight is running and drops the task once the
+        delete has finished
+        '''
+        jobset = deepcopy(self.waiting_jobset)
+        jobset['jobs'][0]['job_status'] = 'job-completed'
+        jobset['grq_delete_task'] = 'grq-node:1234'
+
+        mock_es_client().tasks.get.return_value = {'completed': False}
+        result = wait_for_complete.lambda_handler(deepcopy(jobset), None)
+
+        self.assertTrue(result['waiting'])
+        self.assertEqual(result['grq_delete_task'], 'grq-node:1234')
+
+        mock_es_client().tasks.get.return_value = {
+            'completed': True,
+            'response': {'deleted': 4, 'failures': []}
+        }
+        result = wait_for_complete.lambda_handler(result, None)
+
+        mock_es_client().tasks.get.assert_called_with(
+            task_id='grq-node:1234'
+        )
+        self.assertNotIn('waiting', result)
+        self.assertNotIn('grq_delete_task', result)